@@ -1,45 +1,276 @@
 """
 Custom middleware for the application
+
+All layers are plain ASGI callables rather than BaseHTTPMiddleware: no extra
+task or body-stream wrapping per request, and streaming responses pass
+through untouched.
 """
-from fastapi import Request
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
 from app.core.logging_config import log
 from app.core.exceptions import MoodifyException
+from app.core.resilience import applied_degradations, latency_budget, request_deadline, request_degradations
+from app.core.metrics import metrics
+from app.core.tracing import RequestTrace, request_trace, slow_traces
 from app.config import settings
+from typing import Optional, Tuple
+import asyncio
+import random
 import time
 
-class ErrorHandlingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+class ErrorHandlingMiddleware:
+    """
+    Turn exceptions that escape the routes into JSON error responses
+    
+    If the response has already started (e.g. an SSE stream failed midway)
+    the status can no longer change, so the error is logged and the body is
+    closed cleanly instead.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        response_started = False
+        response_done = False
+        
+        async def tracked_send(message):
+            nonlocal response_started, response_done
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_done = True
+            await send(message)
+        
         try:
-            return await call_next(request)
-        except MoodifyException as e:
-            log.error(f"Moodify exception: {e.message}")
-            return JSONResponse(
-                status_code=e.status_code,
-                content={"error": e.message, "type": type(e).__name__}
-            )
+            await self.app(scope, receive, tracked_send)
         except Exception as e:
-            log.error(f"Unhandled exception: {str(e)}")
-            return JSONResponse(
-                status_code=500,
-                content={"error": "Internal server error", "detail": str(e)}
-            )
+            if isinstance(e, MoodifyException):
+                log.error(f"Moodify exception: {e.message}")
+                response = JSONResponse(
+                    status_code=e.status_code,
+                    content={"error": e.message, "type": type(e).__name__}
+                )
+            else:
+                log.error(f"Unhandled exception: {str(e)}")
+                response = JSONResponse(
+                    status_code=500,
+                    content={"error": "Internal server error", "detail": str(e)}
+                )
+            if not response_started:
+                await response(scope, receive, send)
+            elif not response_done:
+                metrics.increment("responses_failed_midstream")
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+class LoggingMiddleware:
+    """
+    Sampled access log with monotonic timing
+    
+    One line per logged request, written when the response body finishes.
+    Server errors and requests slower than ACCESS_LOG_SLOW_MS are always
+    logged; the rest at ACCESS_LOG_SAMPLE_RATE.
+    """
+    
+    def __init__(self, app, sample_rate: Optional[float] = None, slow_ms: Optional[float] = None):
+        self.app = app
+        self.sample_rate = settings.ACCESS_LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.slow_seconds = (settings.ACCESS_LOG_SLOW_MS if slow_ms is None else slow_ms) / 1000
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        status = 500
+        
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                self._log(scope, status, time.perf_counter() - start)
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, timed_send)
+        except BaseException:
+            self._log(scope, status, time.perf_counter() - start)
+            raise
+    
+    def _log(self, scope, status: int, duration: float):
+        if status < 500 and duration < self.slow_seconds and random.random() >= self.sample_rate:
+            return
+        log.info(f"{scope['method']} {scope['path']} Status: {status} Duration: {duration * 1000:.1f}ms")
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        log.info(f"Request: {request.method} {request.url.path}")
-        response = await call_next(request)
-        duration = time.time() - start_time
-        log.info(f"Response: {request.method} Status: {response.status_code} Duration: {duration:.2f}s")
-        return response
+class TracingMiddleware:
+    """
+    Per-request stage trace: Server-Timing header and the slow-request recorder
+    
+    Stages finished before the response starts (all of them for JSON
+    responses, those before the first event for streams) are reported in
+    Server-Timing. With SLOW_TRACE_RECORDER_ENABLED the finished trace is
+    offered to the recorder behind /debug/traces.
+    """
+    
+    def __init__(
+        self,
+        app,
+        server_timing: Optional[bool] = None,
+        record_slow: Optional[bool] = None
+    ):
+        self.app = app
+        self.server_timing = settings.SERVER_TIMING_ENABLED if server_timing is None else server_timing
+        self.record_slow = settings.SLOW_TRACE_RECORDER_ENABLED if record_slow is None else record_slow
+        # Browsers only expose Server-Timing to allowed cross-origin pages
+        origins = "*" if settings.DEBUG else ", ".join(settings.allowed_origins_list)
+        self.timing_allow_origin = origins.encode("latin-1")
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (self.server_timing or self.record_slow):
+            await self.app(scope, receive, send)
+            return
+        
+        trace = RequestTrace(scope["method"], scope["path"])
+        token = request_trace.set(trace)
+        status = None
+        
+        async def timing_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"server-timing", trace.server_timing().encode("latin-1")),
+                        (b"timing-allow-origin", self.timing_allow_origin),
+                    ]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, timing_send)
+        finally:
+            request_trace.reset(token)
+            if self.record_slow:
+                trace.finish(status)
+                slow_traces.offer(trace)
+
+class DeadlineMiddleware:
+    """Sets the request's latency budget and reports applied degradations in X-Degradations"""
+    
+    def __init__(self, app):
+        self.app = app
+        self.timeout_header = settings.REQUEST_TIMEOUT_HEADER.lower().encode("latin-1")
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        timeout = next((value.decode("latin-1") for name, value in scope["headers"] if name == self.timeout_header), None)
+        # Stages and upstream calls made for this request are capped by its latency budget
+        token = request_deadline.set(time.monotonic() + latency_budget(scope["path"], timeout))
+        degradations = request_degradations.set([])
+        
+        async def tagged_send(message):
+            if message["type"] == "http.response.start":
+                applied = applied_degradations()
+                if applied:
+                    # Streams only report what was applied before their first byte
+                    message["headers"] = [*message.get("headers", []), (b"x-degradations", ",".join(applied).encode())]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, tagged_send)
+        finally:
+            request_deadline.reset(token)
+            request_degradations.reset(degradations)
+
+class DisconnectMiddleware:
+    """
+    Cancel a request's handler as soon as its client disconnects
+    
+    Once the request body has been read, a watcher waits for the
+    http.disconnect message and cancels the handler task. Cancellation runs
+    through the pipeline (stages stop, temp files are cleaned up), drops
+    queued inference jobs and stops LLM calls and streams nobody will read.
+    Pure ASGI, so it can watch `receive` while the handler runs.
+    """
+    
+    def __init__(self, app, prefixes: Tuple[str, ...] = ("/chat", "/audio", "/image")):
+        self.app = app
+        self.prefixes = prefixes
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefixes):
+            await self.app(scope, receive, send)
+            return
+        
+        disconnected = asyncio.Event()
+        response_started = False
+        response_done = False
+        handler: Optional[asyncio.Task] = None
+        watcher: Optional[asyncio.Task] = None
+        
+        async def watch():
+            message = await receive()
+            while message["type"] != "http.disconnect":
+                message = await receive()
+            disconnected.set()
+            if not response_done and handler is not None and not handler.done():
+                log.info(f"Client disconnected, cancelling {scope['method']} {scope['path']}")
+                metrics.increment("cancelled_requests")
+                handler.cancel()
+        
+        async def wrapped_receive():
+            nonlocal watcher
+            if watcher is not None:
+                # The watcher owns `receive` now; relay its disconnect
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+            elif not message.get("more_body", False):
+                watcher = asyncio.create_task(watch())
+            return message
+        
+        async def wrapped_send(message):
+            nonlocal response_started, response_done
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_done = True
+            await send(message)
+        
+        handler = asyncio.create_task(self.app(scope, wrapped_receive, wrapped_send))
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if not disconnected.is_set() or response_done:
+                raise
+            if not response_started:
+                # Nobody will read it, but outer layers expect a response (499 = client closed request)
+                await send({"type": "http.response.start", "status": 499, "headers": []})
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            if watcher is not None:
+                watcher.cancel()
 
 def setup_middleware(app):
     # 1. Add Logging and Error Handling FIRST
+    if settings.CANCEL_ON_DISCONNECT:
+        app.add_middleware(DisconnectMiddleware)
+    app.add_middleware(DeadlineMiddleware)
     app.add_middleware(LoggingMiddleware)
     app.add_middleware(ErrorHandlingMiddleware)
+    # Outside error handling so JSON error responses carry Server-Timing too
+    app.add_middleware(TracingMiddleware)
     
     # 2. Add CORS LAST (This makes it the 'outer' layer)
     # This ensures even 500 errors get the CORS headers so the browser doesn't block them
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
 from app.services.audio_emotion_service import audio_emotion_service
+from app.services.emotion_handles import emotion_handles
+from app.models.ml_models.emotion_vector import EmotionVector
+from app.core.rate_limiter import pipeline_priority
+from app.core.exceptions import MoodifyException
 from app.utils.file_handlers import validate_audio_file, save_upload_file, delete_file
 import os
 import logging
+from typing import Any, Dict, Optional
 
 # Logger setup
 logger = logging.getLogger(__name__)
@@ -10,7 +15,14 @@ logger = logging.getLogger(__name__)
 # Prefix ko '/audio' rakha hai taaki frontend ki request (404 error) fix ho jaye
 router = APIRouter(prefix="/audio", tags=["audio"])
 
-@router.post("/detect-emotion")
+def _with_handle(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Label ko handle ke saath store karo - /chat/* dobara upload kiye bina reuse kar sakte hain"""
+    vector = EmotionVector.from_dict(result["emotion"]["probabilities"], source="local")
+    result["emotion"]["handle"] = emotion_handles.put(vector, "audio")
+    return result
+
+# Whisper + LLM pipeline, isliye text chat ke peeche queue hota hai
+@router.post("/detect-emotion", dependencies=[Depends(pipeline_priority)])
 async def detect_emotion_from_audio(
     audio: UploadFile = File(..., description="Audio file for mood detection")
 ):
@@ -31,7 +43,7 @@ async def detect_emotion_from_audio(
         # Isme humne Groq syntax pehle hi fix kar diya hai
         result = await audio_emotion_service.detect_emotion_and_respond(audio_path)
         
-        return result
+        return _with_handle(result)
         
     except Exception as e:
         logger.error(f"Error processing audio request: {str(e)}")
@@ -42,4 +54,30 @@ async def detect_emotion_from_audio(
         # 4. Clean up: Delete the temporary file to save space
         if audio_path and os.path.exists(audio_path):
             delete_file(audio_path)
-            logger.info(f"Temporary file deleted: {audio_path}")
\ No newline at end of file
+            logger.info(f"Temporary file deleted: {audio_path}")
+
+# Pure local: wav2vec2 + voice features (+ optional client transcript), koi upstream call nahi
+@router.post("/emotion")
+async def local_emotion_from_audio(
+    audio: UploadFile = File(..., description="Audio file for mood detection"),
+    transcript: Optional[str] = Form(None, description="Optional transcript (e.g. browser speech recognition)")
+):
+    """
+    Label the emotion in a clip without calling any upstream API.
+    Returns the label, probabilities, the signals used and stage timings.
+    """
+    audio_path = None
+    try:
+        validate_audio_file(audio)
+        audio_path = await save_upload_file(audio, file_type="audio")
+        return _with_handle(await audio_emotion_service.detect_emotion_local(audio_path, transcript))
+        
+    except MoodifyException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        logger.error(f"Error labeling audio emotion: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to label audio: {str(e)}")
+        
+    finally:
+        if audio_path and os.path.exists(audio_path):
+            delete_file(audio_path)
@@ -1,234 +1,641 @@
 """
 Chat endpoints - main functionality
+
+Every route is a stage graph run by app.core.pipeline: ingest (validate +
+read), decode (save to disk for the models), detection, fusion, session
+loading, generation, recording the turn and cleanup. Independent stages
+run concurrently, detection results are cached by media content, and a
+failing stage cancels the rest of the graph.
 """
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from typing import Optional
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
 from app.services.audio_emotion_service import audio_emotion_service
 from app.services.face_emotion_service import face_emotion_service
 from app.services.emotion_fusion_service import emotion_fusion_service
 from app.services.response_generator import response_generator
+from app.services.speculative_replies import Speculation, speculative_responder
+from app.services.session_store import session_store
+from app.services.emotion_handles import emotion_handles
 from app.models.schemas.chat import (
     AudioChatResponse, ImageChatResponse, MultimodalChatResponse,
     ChatRequest, ChatResponse
 )
-from app.models.schemas.emotion import EmotionResponse, EmotionFusionResponse
-from app.core.exceptions import EmotionDetectionError
+from app.models.ml_models.emotion_vector import EmotionVector, FusedEmotion
+from app.core.exceptions import EmotionDetectionError, EmotionHandleError, MoodifyException
+from app.core.pipeline import Pipeline, PipelineRun, Stage, stage_cache
 from app.utils.file_handlers import (
     validate_audio_file, validate_image_file,
-    save_upload_file, delete_file
+    save_upload_bytes, delete_file
 )
+from app.utils.sse import format_sse, SSE_HEADERS
 from app.core.logging_config import log
+from app.core.timing import StageTimer
+from app.core.rate_limiter import pipeline_priority
+from app.core.resilience import applied_degradations, note_degradation, short_on_time
+from app.config import settings
+import hashlib
 import json
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# Audio/image pipelines queue behind interactive text chat for Groq budget
+PIPELINE = [Depends(pipeline_priority)]
+
+CNN_UNAVAILABLE_DETAIL = (
+    "Face emotion detection is currently unavailable. CNN model not loaded. "
+    "Please use audio emotion detection instead."
+)
+
+
+def _parse_history(conversation_history: Optional[str]) -> Optional[List[Dict]]:
+    """Parse the legacy JSON conversation history form field"""
+    if not conversation_history:
+        return None
+    try:
+        history = json.loads(conversation_history)
+    except (json.JSONDecodeError, TypeError):
+        log.warning("Failed to parse conversation history")
+        return None
+    if not isinstance(history, list):
+        log.warning("Ignoring conversation history that is not a list")
+        return None
+    return [m for m in history if isinstance(m, dict) and "role" in m and "content" in m]
+
+
+async def _load_session(
+    session_id: Optional[str],
+    conversation_history: Optional[Any] = None
+) -> Tuple[str, Optional[List[Dict]]]:
+    """
+    Resolve the session and its stored history
+    
+    Legacy clients that still upload history get it used for this turn
+    when the session has none of its own.
+    """
+    session_id = session_store.resolve(session_id)
+    history = await session_store.get_history(session_id)
+    if not history:
+        if isinstance(conversation_history, str):
+            history = _parse_history(conversation_history)
+        else:
+            history = conversation_history
+    return session_id, history or None
+
+
+async def _record_turn(
+    session_id: str,
+    emotion: str,
+    message: Optional[str],
+    chat_response: ChatResponse
+):
+    """Append this exchange to the session and tag the response with its id and degradations"""
+    chat_response.session_id = session_id
+    chat_response.degradations = applied_degradations()
+    try:
+        # Raw message only: the synthesized prompt is not something the user said
+        await session_store.append_turn(session_id, message, chat_response.message, emotion)
+    except Exception as e:
+        log.warning(f"Failed to store session turn: {str(e)}")
+
+
+def _from_handle(handle: Optional[str], kind: Optional[str]) -> Optional[EmotionVector]:
+    """Stored detection result for a handle (None without one; 404/400 if unusable)"""
+    if not handle:
+        return None
+    try:
+        return emotion_handles.get(handle, kind)
+    except EmotionHandleError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+
+def _require_media(upload: Optional[UploadFile], handle: Optional[str], kind: str):
+    """400 unless either the file or a handle for it was sent"""
+    if upload is None and not handle:
+        raise HTTPException(status_code=400, detail=f"Send the {kind} file or its emotion handle")
+
+
+# ---------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------
+
+class _Media(NamedTuple):
+    """Ingested upload, or the stored result a handle points to"""
+    known: Optional[EmotionVector]
+    content: Optional[bytes]
+    filename: Optional[str]
+    digest: Optional[str]
+
 
-@router.post("/audio", response_model=AudioChatResponse)
+def _ingest_stage(kind: str, handle_kind: str, validate: Callable[[UploadFile], Any]) -> Stage:
+    """Validate and read the `kind` upload (or resolve `<kind>_handle`)"""
+    async def ingest(run: PipelineRun) -> _Media:
+        upload, handle = run.get(kind), run.get(f"{kind}_handle")
+        _require_media(upload, handle, kind)
+        known = _from_handle(handle, handle_kind)
+        if known is not None:
+            return _Media(known, None, None, None)
+        validate(upload)
+        content = await upload.read()
+        digest = hashlib.sha256(content).hexdigest() if stage_cache.enabled else None
+        return _Media(None, content, upload.filename, digest)
+    
+    return Stage(f"ingest_{kind}", ingest)
+
+
+def _save_stage(
+    kind: str,
+    detection: str,
+    after: Sequence[str] = (),
+    when: Optional[Callable[[PipelineRun], bool]] = None
+) -> Stage:
+    """Decode step: write the upload to disk for the model loaders (skipped on a cache hit)"""
+    async def save(run: PipelineRun) -> str:
+        media = run[f"ingest_{kind}"]
+        return await save_upload_bytes(media.content, media.filename, file_type=kind)
+    
+    def needed(run: PipelineRun) -> bool:
+        media = run[f"ingest_{kind}"]
+        if media.known is not None or stage_cache.contains(detection, media.digest):
+            return False
+        return when is None or when(run)
+    
+    return Stage(f"save_{kind}", save, after=(f"ingest_{kind}", *after), when=needed)
+
+
+async def _saved_path(run: PipelineRun, kind: str) -> str:
+    """Saved upload path; saves now if decode was skipped for a cache entry that has since expired"""
+    path = run[f"save_{kind}"]
+    if path is None:
+        media = run[f"ingest_{kind}"]
+        path = run.results[f"save_{kind}"] = await save_upload_bytes(media.content, media.filename, file_type=kind)
+    return path
+
+
+def _media_digest(kind: str) -> Callable[[PipelineRun], Optional[str]]:
+    return lambda run: run[f"ingest_{kind}"].digest
+
+
+async def _detect_audio(run: PipelineRun) -> EmotionVector:
+    media = run["ingest_audio"]
+    if media.known is not None:
+        return media.known
+    return await audio_emotion_service.detect_emotion(await _saved_path(run, "audio"))
+
+
+def _face_stage(required: bool, after: Sequence[str] = (), when: Optional[Callable[[PipelineRun], bool]] = None) -> Stage:
+    """
+    Face detection (or the handle's stored result)
+    
+    required=True maps an unavailable CNN to 503 and refuses to start past
+    the request deadline; otherwise the stage yields None and fusion falls
+    back to audio only.
+    """
+    async def detect(run: PipelineRun) -> Optional[EmotionVector]:
+        media = run["ingest_image"]
+        if media.known is not None:
+            return media.known
+        try:
+            return await face_emotion_service.detect_emotion(await _saved_path(run, "image"))
+        except EmotionDetectionError as e:
+            if required:
+                raise HTTPException(status_code=503, detail=CNN_UNAVAILABLE_DETAIL)
+            # Fall back to audio-only if CNN unavailable
+            log.warning(f"Face detection unavailable, using audio only: {str(e)}")
+            return None
+    
+    return Stage(
+        "face_detection", detect,
+        after=("ingest_image", "save_image", *after),
+        when=when,
+        cache_key=_media_digest("image"),
+        needs_budget=required
+    )
+
+
+async def _session(run: PipelineRun) -> Tuple[str, Optional[List[Dict]]]:
+    return await _load_session(run.get("session_id"), run.get("conversation_history"))
+
+
+def _generate_stage(emotion_of: Callable[[PipelineRun], str], after: Sequence[str]) -> Stage:
+    """LLM reply for the final emotion (a speculated stream is reused when present)"""
+    async def generate(run: PipelineRun) -> ChatResponse:
+        session_id, history = run["session"]
+        speculation = run.get("speculate")
+        if speculation is not None:
+            return await speculation.response(emotion_of(run))
+        return await response_generator.generate_response(
+            emotion=emotion_of(run),
+            user_message=run.get("message"),
+            conversation_history=history,
+            session_id=session_id
+        )
+    
+    return Stage("llm", generate, after=("session", *after))
+
+
+def _record_stage(emotion_of: Callable[[PipelineRun], str]) -> Stage:
+    async def record(run: PipelineRun):
+        session_id, _ = run["session"]
+        await _record_turn(session_id, emotion_of(run), run.get("message"), run["llm"])
+    
+    return Stage("record", record, after=("llm",), timed=False)
+
+
+async def _cleanup(run: PipelineRun):
+    """Delete saved uploads; a failed run also drops its speculative streams"""
+    for stage in ("save_audio", "save_image"):
+        path = run.results.get(stage)
+        if path:
+            delete_file(path)
+    speculation = run.results.get("speculate")
+    if run.error is not None and speculation is not None:
+        speculation.cancel()
+
+
+CLEANUP = Stage("cleanup", _cleanup, cleanup=True)
+
+
+# ---------------------------------------------------------------------------
+# Graphs
+# ---------------------------------------------------------------------------
+
+def _text_emotion(run: PipelineRun) -> str:
+    return run["emotion"]
+
+
+async def _resolve_text_emotion(run: PipelineRun) -> str:
+    """Handle result, then emotion_context, then neutral"""
+    known = _from_handle(run.get("emotion_handle"), kind=None)
+    if known is not None:
+        return known.emotion
+    return run.get("emotion_context") or "neutral"
+
+
+def _audio_emotion(run: PipelineRun) -> str:
+    return run["audio_detection"].emotion
+
+
+def _face_emotion(run: PipelineRun) -> str:
+    return run["face_detection"].emotion
+
+
+def _fused_emotion(run: PipelineRun) -> str:
+    return run["fusion"].emotion
+
+
+def _consults_face(run: PipelineRun) -> bool:
+    return run.get("face_gate") is None
+
+
+def _face_gate_stage(cascade: bool) -> Stage:
+    """
+    Decide whether the face branch runs; the result is why it is skipped (None = run it)
+    
+    A stored face result (handle) costs nothing, so it is always fused.
+    Otherwise the face is skipped when the request deadline is too close
+    for it ("deadline") and, with the cascade, when audio alone is
+    confident enough ("cascade").
+    """
+    async def gate(run: PipelineRun) -> Optional[str]:
+        if run["ingest_image"].known is not None:
+            return None
+        if short_on_time(settings.DEADLINE_SKIP_FACE_SECONDS):
+            note_degradation("face_skipped")
+            return "deadline"
+        if cascade and not emotion_fusion_service.should_consult_face(run["audio_detection"]):
+            return "cascade"
+        return None
+    
+    after = ("ingest_image", "audio_detection") if cascade else ("ingest_image",)
+    return Stage("face_gate", gate, after=after, timed=False)
+
+
+async def _speculate(run: PipelineRun) -> Optional[Speculation]:
+    """SPECULATIVE_REPLIES_ENABLED: start replies from the audio result"""
+    session_id, history = run["session"]
+    return speculative_responder.start(
+        run["audio_detection"],
+        run.get("message"),
+        history,
+        session_id,
+        settled=not _consults_face(run)
+    )
+
+
+async def _fuse(run: PipelineRun) -> FusedEmotion:
+    audio_emotion, face_emotion = run["audio_detection"], run["face_detection"]
+    if face_emotion is not None:
+        return await emotion_fusion_service.fuse_emotions(
+            audio_emotion=audio_emotion,
+            face_emotion=face_emotion
+        )
+    # Use audio emotion only
+    if _consults_face(run):
+        fallback_method, face_status = "audio_only_cnn_unavailable", "unavailable"
+    else:
+        fallback_method, face_status = f"{run['face_gate']}_face_skipped", "skipped"
+    return emotion_fusion_service.audio_only(
+        audio_emotion,
+        fusion_method=fallback_method,
+        face_status=face_status
+    )
+
+
+AUDIO_DETECTION = Stage(
+    "audio_detection", _detect_audio,
+    after=("ingest_audio", "save_audio"),
+    cache_key=_media_digest("audio"),
+    needs_budget=True
+)
+
+TEXT_CHAT = Pipeline("text_chat", [
+    Stage("emotion", _resolve_text_emotion, timed=False),
+    Stage("session", _session),
+    _generate_stage(_text_emotion, after=("emotion",)),
+    _record_stage(_text_emotion),
+])
+
+AUDIO_CHAT = Pipeline("audio_chat", [
+    _ingest_stage("audio", "audio", validate_audio_file),
+    _save_stage("audio", "audio_detection"),
+    AUDIO_DETECTION,
+    Stage("session", _session),
+    _generate_stage(_audio_emotion, after=("audio_detection",)),
+    _record_stage(_audio_emotion),
+    CLEANUP,
+], cache=stage_cache)
+
+IMAGE_CHAT = Pipeline("image_chat", [
+    _ingest_stage("image", "face", validate_image_file),
+    _save_stage("image", "face_detection"),
+    _face_stage(required=True),
+    Stage("session", _session),
+    _generate_stage(_face_emotion, after=("face_detection",)),
+    _record_stage(_face_emotion),
+    CLEANUP,
+], cache=stage_cache)
+
+
+def _multimodal_graph(cascade: bool) -> Pipeline:
+    """
+    Audio + face detection, fusion and reply
+    
+    With the cascade, the face branch waits for the audio result and only
+    runs when audio is ambiguous; without it, both branches (upload +
+    detection) run concurrently and fusion waits for the slower one.
+    Either way the face branch is dropped when the deadline is too close.
+    """
+    face_after = ("face_gate",)
+    face_when = _consults_face
+    stages = [
+        _face_gate_stage(cascade),
+        _ingest_stage("audio", "audio", validate_audio_file),
+        _ingest_stage("image", "face", validate_image_file),
+        _save_stage("audio", "audio_detection"),
+        AUDIO_DETECTION,
+        _save_stage("image", "face_detection", after=face_after, when=face_when),
+        _face_stage(required=False, after=face_after, when=face_when),
+        Stage("session", _session),
+        Stage("speculate", _speculate, after=("audio_detection", "session", *face_after), timed=False),
+        Stage("fusion", _fuse, after=("audio_detection", "face_detection", *face_after)),
+        _generate_stage(_fused_emotion, after=("fusion", "speculate")),
+        _record_stage(_fused_emotion),
+        CLEANUP,
+    ]
+    return Pipeline("multimodal_chat" if not cascade else "multimodal_chat_cascade", stages, cache=stage_cache)
+
+
+MULTIMODAL_CHAT = {cascade: _multimodal_graph(cascade) for cascade in (True, False)}
+
+
+async def _execute(
+    pipeline: Pipeline,
+    inputs: Dict[str, Any],
+    timer: Optional[StageTimer] = None,
+    targets: Optional[Sequence[str]] = None
+) -> PipelineRun:
+    """Run a chat graph, mapping failures to HTTP errors"""
+    try:
+        return await pipeline.run(inputs, timer, targets)
+    except HTTPException:
+        raise
+    except MoodifyException as e:
+        log.error(f"{pipeline.name} failed: {e.message}")
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        log.error(f"{pipeline.name} failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _modality_label(run: PipelineRun, stage: str, kind: str, label: str) -> Optional[str]:
+    """How a detection stage was served: ran, from a handle, from the cache, or not at all"""
+    if stage not in run.results or stage in run.skipped:
+        return None
+    if run[f"ingest_{kind}"].known is not None:
+        return f"{label}_handle"
+    if stage in run.cached:
+        return f"{label}_cached"
+    return label
+
+
+def _stages_run(run: PipelineRun) -> List[str]:
+    """Pipeline stages that actually ran, in pipeline order"""
+    stages = [
+        _modality_label(run, "audio_detection", "audio", "audio"),
+        _modality_label(run, "face_detection", "image", "face"),
+        "fusion" if run["fusion"].face is not None else None,
+        "llm" if "llm" in run.ran else None,
+    ]
+    return [stage for stage in stages if stage]
+
+
+async def _stream_chat_events(
+    emotion_payload: Any,
+    emotion: str,
+    message: Optional[str],
+    session_id: str,
+    history: Optional[List[Dict]],
+    timer: Optional[StageTimer] = None,
+    speculation: Optional[Speculation] = None
+) -> AsyncIterator[str]:
+    """
+    SSE event sequence shared by the streaming chat endpoints
+    
+    Events: `emotion` (detection result, sent immediately), `token` (LLM
+    deltas), `fallback` (replaces partial text if the stream fails), and
+    `done` (final ChatResponse plus timings). With a speculation, its
+    matching candidate stream is replayed instead of starting a new one.
+    """
+    try:
+        yield format_sse("emotion", emotion_payload)
+        
+        if speculation is not None:
+            events = speculation.resolve(emotion)
+        else:
+            events = response_generator.stream_response(
+                emotion=emotion,
+                user_message=message,
+                conversation_history=history,
+                session_id=session_id
+            )
+        
+        first_token_at = None
+        async for event, payload in events:
+            if event == "token":
+                if first_token_at is None and timer is not None:
+                    first_token_at = timer.total_ms()
+                yield format_sse("token", {"text": payload})
+            elif event == "fallback":
+                yield format_sse("fallback", {"message": payload})
+            else:
+                await _record_turn(session_id, emotion, message, payload)
+                summary = {"chat_response": payload.model_dump()}
+                if timer is not None:
+                    summary["timings"] = {**timer.as_dict(), "first_token": first_token_at}
+                if speculation is not None:
+                    summary["speculation"] = speculation.outcome
+                yield format_sse("done", summary)
+    finally:
+        # Closed before the emotion was final: stop the candidate streams too
+        if speculation is not None:
+            speculation.abandon()
+
+
+def _event_stream(events: AsyncIterator[str]) -> StreamingResponse:
+    """Wrap an SSE event iterator in a streaming response"""
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def _stream_run(run: PipelineRun, emotion_payload: Any, emotion: str) -> StreamingResponse:
+    """SSE response for a graph run up to (not including) generation"""
+    session_id, history = run["session"]
+    return _event_stream(_stream_chat_events(
+        emotion_payload,
+        emotion,
+        run.get("message"),
+        session_id,
+        history,
+        run.timer,
+        run.get("speculate")
+    ))
+
+
+# ---------------------------------------------------------------------------
+# Routes
+# ---------------------------------------------------------------------------
+
+@router.post("/audio", response_model=AudioChatResponse, dependencies=PIPELINE)
 async def chat_with_audio(
-    audio: UploadFile = File(..., description="Audio file for emotion detection"),
+    audio: Optional[UploadFile] = File(None, description="Audio file for emotion detection"),
+    audio_handle: Optional[str] = Form(None, description="Handle from /audio/detect-emotion or /audio/emotion instead of the file"),
     message: Optional[str] = Form(None, description="Optional text message"),
-    conversation_history: Optional[str] = Form(None, description="JSON string of conversation history")
+    session_id: Optional[str] = Form(None, description="Conversation session id from a previous response"),
+    conversation_history: Optional[str] = Form(None, description="Deprecated: JSON string of conversation history")
 ):
     """
     Chat with audio emotion detection
     
     - **audio**: Audio file (wav, mp3, ogg, webm, m4a)
+    - **audio_handle**: Result handle from an audio detection endpoint (instead of the file)
     - **message**: Optional text message from user
-    - **conversation_history**: Optional JSON string of previous messages
+    - **session_id**: Optional session id returned by a previous response
+    - **conversation_history**: Deprecated; previous messages as a JSON string
     
     Returns emotion detection + AI response
     """
-    audio_path = None
-    try:
-        log.info(f"Audio chat request: {audio.filename}")
-        
-        # Validate and save audio
-        validate_audio_file(audio)
-        audio_path = await save_upload_file(audio, file_type="audio")
-        
-        # Detect emotion from audio
-        emotion_result = await audio_emotion_service.detect_emotion(audio_path)
-        
-        # Parse conversation history
-        history = None
-        if conversation_history:
-            try:
-                history = json.loads(conversation_history)
-            except:
-                log.warning("Failed to parse conversation history")
-        
-        # Generate response
-        chat_response = await response_generator.generate_response(
-            emotion=emotion_result.emotion,
-            user_message=message,
-            conversation_history=history
-        )
-        
-        return AudioChatResponse(
-            emotion=emotion_result,
-            chat_response=chat_response
-        )
-        
-    except Exception as e:
-        log.error(f"Audio chat failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-    
-    finally:
-        if audio_path:
-            delete_file(audio_path)
+    log.info(f"Audio chat request: {audio.filename if audio else audio_handle}")
+    run = await _execute(AUDIO_CHAT, {
+        "audio": audio,
+        "audio_handle": audio_handle,
+        "message": message,
+        "session_id": session_id,
+        "conversation_history": conversation_history,
+    })
+    return AudioChatResponse(
+        emotion=run["audio_detection"].to_response(),
+        chat_response=run["llm"]
+    )
 
 
-@router.post("/image", response_model=ImageChatResponse)
+@router.post("/image", response_model=ImageChatResponse, dependencies=PIPELINE)
 async def chat_with_image(
     image: UploadFile = File(..., description="Image file for face emotion detection"),
     message: Optional[str] = Form(None, description="Optional text message"),
-    conversation_history: Optional[str] = Form(None, description="JSON string of conversation history")
+    session_id: Optional[str] = Form(None, description="Conversation session id from a previous response"),
+    conversation_history: Optional[str] = Form(None, description="Deprecated: JSON string of conversation history")
 ):
     """
     Chat with face emotion detection (confirmation/fallback)
     
     - **image**: Image file with face (jpg, jpeg, png)
     - **message**: Optional text message from user
-    - **conversation_history**: Optional JSON string of previous messages
+    - **session_id**: Optional session id returned by a previous response
+    - **conversation_history**: Deprecated; previous messages as a JSON string
     
     Returns emotion detection + AI response
     
-    Note: Requires CNN model to be loaded. Returns error if CNN is unavailable.
+    Note: Requires CNN model to be loaded. Returns 503 if CNN is unavailable.
     """
-    image_path = None
-    try:
-        log.info(f"Image chat request: {image.filename}")
-        
-        # Validate and save image
-        validate_image_file(image)
-        image_path = await save_upload_file(image, file_type="image")
-        
-        # Detect emotion from face
-        try:
-            emotion_result = await face_emotion_service.detect_emotion(image_path)
-        except EmotionDetectionError as e:
-            raise HTTPException(
-                status_code=503,
-                detail="Face emotion detection is currently unavailable. CNN model not loaded. Please use audio emotion detection instead."
-            )
-        
-        # Parse conversation history
-        history = None
-        if conversation_history:
-            try:
-                history = json.loads(conversation_history)
-            except:
-                log.warning("Failed to parse conversation history")
-        
-        # Generate response
-        chat_response = await response_generator.generate_response(
-            emotion=emotion_result.emotion,
-            user_message=message,
-            conversation_history=history
-        )
-        
-        return ImageChatResponse(
-            emotion=emotion_result,
-            chat_response=chat_response
-        )
-        
-    except Exception as e:
-        log.error(f"Image chat failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-    
-    finally:
-        if image_path:
-            delete_file(image_path)
+    log.info(f"Image chat request: {image.filename}")
+    run = await _execute(IMAGE_CHAT, {
+        "image": image,
+        "message": message,
+        "session_id": session_id,
+        "conversation_history": conversation_history,
+    })
+    return ImageChatResponse(
+        emotion=run["face_detection"].to_response(),
+        chat_response=run["llm"]
+    )
 
 
-@router.post("/multimodal", response_model=MultimodalChatResponse)
+@router.post("/multimodal", response_model=MultimodalChatResponse, dependencies=PIPELINE)
 async def chat_with_audio_and_image(
-    audio: UploadFile = File(..., description="Audio file for emotion detection"),
-    image: UploadFile = File(..., description="Image file for face emotion detection"),
+    audio: Optional[UploadFile] = File(None, description="Audio file for emotion detection"),
+    image: Optional[UploadFile] = File(None, description="Image file for face emotion detection"),
+    audio_handle: Optional[str] = Form(None, description="Audio result handle instead of the audio file"),
+    image_handle: Optional[str] = Form(None, description="Face result handle from /image/detect-emotion instead of the image"),
     message: Optional[str] = Form(None, description="Optional text message"),
-    conversation_history: Optional[str] = Form(None, description="JSON string of conversation history")
+    session_id: Optional[str] = Form(None, description="Conversation session id from a previous response"),
+    conversation_history: Optional[str] = Form(None, description="Deprecated: JSON string of conversation history")
 ):
     """
     Chat with both audio and face emotion detection (highest confidence)
     
     - **audio**: Audio file (wav, mp3, ogg, webm, m4a)
     - **image**: Image file with face (jpg, jpeg, png)
+    - **audio_handle** / **image_handle**: Result handles from the detection endpoints (instead of the files)
     - **message**: Optional text message from user
-    - **conversation_history**: Optional JSON string of previous messages
+    - **session_id**: Optional session id returned by a previous response
+    - **conversation_history**: Deprecated; previous messages as a JSON string
+    
+    Returns fused emotion detection + AI response with a per-stage timing breakdown
     
-    Returns fused emotion detection + AI response
+    With EMOTION_CASCADE_ENABLED, face detection only runs when audio confidence
+    is below AUDIO_CONFIDENCE_THRESHOLD; otherwise audio and face branches
+    (upload + detection) run concurrently.
     
     Note: If CNN is unavailable, falls back to audio-only detection.
     """
-    audio_path = None
-    image_path = None
-    try:
-        log.info(f"Multimodal chat request: {audio.filename}, {image.filename}")
-        
-        # Validate and save both files
-        validate_audio_file(audio)
-        validate_image_file(image)
-        audio_path = await save_upload_file(audio, file_type="audio")
-        image_path = await save_upload_file(image, file_type="image")
-        
-        # Detect emotions from both sources
-        audio_emotion = await audio_emotion_service.detect_emotion(audio_path)
-        
-        # Try to get face emotion, fall back to audio-only if CNN unavailable
-        try:
-            face_emotion = await face_emotion_service.detect_emotion(image_path)
-            
-            # Fuse emotions
-            fused_emotion = await emotion_fusion_service.fuse_emotions(
-                audio_emotion=audio_emotion,
-                face_emotion=face_emotion
-            )
-        except EmotionDetectionError as e:
-            log.warning(f"Face detection unavailable, using audio only: {str(e)}")
-            # Use audio emotion only
-            fused_emotion = EmotionFusionResponse(
-                final_emotion=audio_emotion.emotion,
-                confidence=audio_emotion.confidence,
-                audio_emotion=audio_emotion,
-                face_emotion=EmotionResponse(
-                    emotion="unavailable",
-                    confidence=0.0,
-                    probabilities={},
-                    needs_confirmation=False,
-                    source="face"
-                ),
-                fusion_method="audio_only_cnn_unavailable"
-            )
-        
-        # Parse conversation history
-        history = None
-        if conversation_history:
-            try:
-                history = json.loads(conversation_history)
-            except:
-                log.warning("Failed to parse conversation history")
-        
-        # Generate response based on fused emotion
-        chat_response = await response_generator.generate_response(
-            emotion=fused_emotion.final_emotion,
-            user_message=message,
-            conversation_history=history
-        )
-        
-        return MultimodalChatResponse(
-            emotion=fused_emotion,
-            chat_response=chat_response
-        )
-        
-    except Exception as e:
-        log.error(f"Multimodal chat failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-    
-    finally:
-        if audio_path:
-            delete_file(audio_path)
-        if image_path:
-            delete_file(image_path)
+    log.info(f"Multimodal chat request: {audio.filename if audio else audio_handle}, {image.filename if image else image_handle}")
+    run = await _execute(MULTIMODAL_CHAT[settings.EMOTION_CASCADE_ENABLED], {
+        "audio": audio,
+        "image": image,
+        "audio_handle": audio_handle,
+        "image_handle": image_handle,
+        "message": message,
+        "session_id": session_id,
+        "conversation_history": conversation_history,
+    })
+    speculation = run["speculate"]
+    return MultimodalChatResponse(
+        emotion=run["fusion"].to_response(),
+        chat_response=run["llm"],
+        stages_run=_stages_run(run),
+        timings=run.timer.as_dict(),
+        speculation=speculation.outcome if speculation is not None else None
+    )
 
 
 @router.post("/text", response_model=ChatResponse)
@@ -238,25 +645,97 @@ async def chat_with_text(request: ChatRequest):
     
     - **message**: Text message from user
     - **emotion_context**: Optional emotion context from previous detection
-    - **conversation_history**: Optional previous messages
+    - **emotion_handle**: Optional result handle from a detection endpoint (overrides emotion_context)
+    - **session_id**: Optional session id returned by a previous response
+    - **conversation_history**: Deprecated; optional previous messages
     
     Returns AI response
     """
-    try:
-        log.info("Text-only chat request")
-        
-        # Use provided emotion context or default to neutral
-        emotion = request.emotion_context or "neutral"
-        
-        # Generate response
-        chat_response = await response_generator.generate_response(
-            emotion=emotion,
-            user_message=request.message,
-            conversation_history=request.conversation_history
-        )
-        
-        return chat_response
-        
-    except Exception as e:
-        log.error(f"Text chat failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    log.info("Text-only chat request")
+    run = await _execute(TEXT_CHAT, request.model_dump())
+    return run["llm"]
+
+
+# Streaming (Server-Sent Events) variants. The graph runs up to generation
+# before the stream opens so errors still map to HTTP status codes; the
+# detected emotion is the first event, followed by LLM tokens as they arrive.
+
+@router.post("/audio/stream", dependencies=PIPELINE)
+async def chat_with_audio_stream(
+    audio: Optional[UploadFile] = File(None, description="Audio file for emotion detection"),
+    audio_handle: Optional[str] = Form(None, description="Handle from /audio/detect-emotion or /audio/emotion instead of the file"),
+    message: Optional[str] = Form(None, description="Optional text message"),
+    session_id: Optional[str] = Form(None, description="Conversation session id from a previous response"),
+    conversation_history: Optional[str] = Form(None, description="Deprecated: JSON string of conversation history")
+):
+    """Streaming variant of /chat/audio (text/event-stream)"""
+    log.info(f"Audio chat stream request: {audio.filename if audio else audio_handle}")
+    run = await _execute(AUDIO_CHAT, {
+        "audio": audio,
+        "audio_handle": audio_handle,
+        "message": message,
+        "session_id": session_id,
+        "conversation_history": conversation_history,
+    }, targets=("audio_detection", "session"))
+    emotion_result = run["audio_detection"]
+    return _stream_run(run, emotion_result.to_response(), emotion_result.emotion)
+
+
+@router.post("/image/stream", dependencies=PIPELINE)
+async def chat_with_image_stream(
+    image: UploadFile = File(..., description="Image file for face emotion detection"),
+    message: Optional[str] = Form(None, description="Optional text message"),
+    session_id: Optional[str] = Form(None, description="Conversation session id from a previous response"),
+    conversation_history: Optional[str] = Form(None, description="Deprecated: JSON string of conversation history")
+):
+    """Streaming variant of /chat/image (text/event-stream)"""
+    log.info(f"Image chat stream request: {image.filename}")
+    run = await _execute(IMAGE_CHAT, {
+        "image": image,
+        "message": message,
+        "session_id": session_id,
+        "conversation_history": conversation_history,
+    }, targets=("face_detection", "session"))
+    emotion_result = run["face_detection"]
+    return _stream_run(run, emotion_result.to_response(), emotion_result.emotion)
+
+
+@router.post("/multimodal/stream", dependencies=PIPELINE)
+async def chat_with_audio_and_image_stream(
+    audio: Optional[UploadFile] = File(None, description="Audio file for emotion detection"),
+    image: Optional[UploadFile] = File(None, description="Image file for face emotion detection"),
+    audio_handle: Optional[str] = Form(None, description="Audio result handle instead of the audio file"),
+    image_handle: Optional[str] = Form(None, description="Face result handle from /image/detect-emotion instead of the image"),
+    message: Optional[str] = Form(None, description="Optional text message"),
+    session_id: Optional[str] = Form(None, description="Conversation session id from a previous response"),
+    conversation_history: Optional[str] = Form(None, description="Deprecated: JSON string of conversation history")
+):
+    """Streaming variant of /chat/multimodal (text/event-stream)"""
+    log.info(f"Multimodal chat stream request: {audio.filename if audio else audio_handle}, {image.filename if image else image_handle}")
+    run = await _execute(MULTIMODAL_CHAT[settings.EMOTION_CASCADE_ENABLED], {
+        "audio": audio,
+        "image": image,
+        "audio_handle": audio_handle,
+        "image_handle": image_handle,
+        "message": message,
+        "session_id": session_id,
+        "conversation_history": conversation_history,
+    }, targets=("fusion", "session", "speculate"))
+    fused_emotion = run["fusion"]
+    return _stream_run(run, fused_emotion.to_response(), fused_emotion.emotion)
+
+
+@router.post("/text/stream")
+async def chat_with_text_stream(request: ChatRequest):
+    """Streaming variant of /chat/text (text/event-stream)"""
+    log.info("Text-only chat stream request")
+    run = await _execute(TEXT_CHAT, request.model_dump(), StageTimer(), targets=("emotion", "session"))
+    source = "handle" if request.emotion_handle else "context"
+    return _stream_run(run, {"emotion": run["emotion"], "source": source}, run["emotion"])
+
+
+@router.delete("/session/{session_id}")
+async def delete_session(session_id: str):
+    """Forget a conversation session"""
+    await session_store.delete(session_id)
+    return {"deleted": True, "session_id": session_id}
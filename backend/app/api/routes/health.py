@@ -4,6 +4,13 @@ Health check and status endpoints
 from fastapi import APIRouter
 from app.models.ml_models.model_loader import model_manager
 from app.core.logging_config import log
+from app.core.metrics import metrics
+from app.core.resilience import resilience_stats
+from app.core.rate_limiter import rate_limit_stats
+from app.services.groq_service import groq_service
+from app.services.speculative_replies import speculative_responder
+from app.services.emotion_handles import emotion_handles
+from app.core.pipeline import stage_cache
 
 router = APIRouter(prefix="/health", tags=["health"])
 
@@ -50,3 +57,26 @@ async def readiness_check():
             
     except Exception as e:
         return {"ready": False, "message": str(e)}
+
+
+@router.get("/metrics")
+async def metrics_snapshot():
+    """Operational counters (cascade branches, fusion methods, cache hit rate, breaker state, ...)"""
+    counters = metrics.snapshot()
+    return {
+        "counters": counters,
+        # Work dropped before finishing: client disconnects, stages cancelled by a failing sibling
+        # (abandoned = already running on a thread, result discarded)
+        "cancelled_work": {
+            name: count for name, count in counters.items()
+            if name.startswith(("cancelled_", "abandoned_"))
+        },
+        "llm_cache": groq_service.cache.stats(),
+        "reply_pool": groq_service.pool.stats(),
+        "upstream": resilience_stats(),
+        "rate_limits": rate_limit_stats(),
+        "model_routing": groq_service.router.stats(),
+        "speculation": speculative_responder.stats(),
+        "emotion_handles": emotion_handles.stats(),
+        "pipeline_cache": stage_cache.stats()
+    }
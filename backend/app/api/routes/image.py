@@ -3,6 +3,7 @@ Image/Face emotion detection endpoints
 """
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from app.services.face_emotion_service import face_emotion_service
+from app.services.emotion_handles import emotion_handles
 from app.models.schemas.emotion import EmotionResponse
 from app.core.exceptions import EmotionDetectionError
 from app.utils.file_handlers import (
@@ -22,7 +23,8 @@ async def detect_emotion_from_image(
     
     - **image**: Image file containing a face (jpg, jpeg, png)
     
-    Returns detected emotion with confidence score
+    Returns detected emotion with confidence score and a result handle
+    for /chat/multimodal (image_handle)
     
     Note: Requires CNN model to be loaded. Returns 503 if CNN is unavailable.
     """
@@ -39,7 +41,10 @@ async def detect_emotion_from_image(
         # Detect emotion
         emotion_result = await face_emotion_service.detect_emotion(image_path)
         
-        return emotion_result
+        # Chat endpoints accept the handle instead of re-uploading the image
+        response = emotion_result.to_response()
+        response.handle = emotion_handles.put(emotion_result, "face")
+        return response
         
     except EmotionDetectionError as e:
         # CNN not available
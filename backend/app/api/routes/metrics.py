@@ -0,0 +1,48 @@
+"""
+Prometheus scrape and request trace endpoints
+"""
+from typing import Dict
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.config import settings
+from app.models.ml_models.model_loader import model_manager
+from app.core.metrics import metrics
+from app.core.executors import executor_queue_depths
+from app.core.rate_limiter import rate_limit_stats
+from app.core.resilience import resilience_stats
+from app.core.tracing import slow_traces
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _gauges() -> Dict[str, float]:
+    """Point-in-time values read on every scrape"""
+    gauges = {
+        "audio_model_ready": model_manager.audio_loader.is_loaded(),
+        "cnn_model_ready": model_manager.is_cnn_available(),
+    }
+    for pool, depth in executor_queue_depths().items():
+        gauges[f"{pool}_queue_depth"] = depth
+    for limiter, stats in rate_limit_stats().items():
+        gauges[f"{limiter}_queue_depth"] = stats["queued"]
+    for caller, stats in resilience_stats().items():
+        gauges[f"{caller}_breaker_open"] = stats["breaker"] == "open"
+    return gauges
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage latency histograms, counters and gauges in the Prometheus text format"""
+    return PlainTextResponse(metrics.prometheus(_gauges()), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/debug/traces")
+async def slowest_traces():
+    """Stage spans of the slowest recent requests (SLOW_TRACE_RECORDER_ENABLED)"""
+    return {
+        "enabled": settings.SLOW_TRACE_RECORDER_ENABLED,
+        "window_seconds": slow_traces.window_seconds,
+        "traces": slow_traces.snapshot()
+    }
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import List, Tuple
 import os
 
 class Settings(BaseSettings):
@@ -15,6 +15,8 @@ class Settings(BaseSettings):
     ENVIRONMENT: str = "development"
     DEBUG: bool = True
     LOG_LEVEL: str = "INFO"
+    ACCESS_LOG_SAMPLE_RATE: float = 0.1
+    ACCESS_LOG_SLOW_MS: float = 2000
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     
@@ -26,10 +28,128 @@ class Settings(BaseSettings):
     AUDIO_CONFIDENCE_THRESHOLD: float = 0.70
     FACE_CONFIDENCE_THRESHOLD: float = 0.65
     REQUEST_FACE_CONFIRMATION: bool = True
+    EMOTION_CASCADE_ENABLED: bool = True
+    FUSION_AUDIO_WEIGHT: float = 0.6
+    FUSION_FACE_WEIGHT: float = 0.4
+    FUSION_DOMINANCE_MARGIN: float = 0.3
     TEMP_FILE_CLEANUP_HOURS: int = 1
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:5173"
     TEMP_DIR: str = "./storage/temp"
-    
+
+    # LLM response cache
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_KEYS: int = 512
+    LLM_CACHE_VARIANTS: int = 3
+    LLM_CACHE_TTL_SECONDS: int = 3600
+
+    # Request coalescing (identical in-flight calls share one upstream request)
+    LLM_COALESCE_ENABLED: bool = True
+    TRANSCRIPTION_COALESCE_ENABLED: bool = True
+
+    # Pre-generated reply pools (no-message / quick replies)
+    REPLY_POOL_ENABLED: bool = True
+    REPLY_POOL_SIZE: int = 8
+    REPLY_POOL_LOW_WATERMARK: int = 3
+    REPLY_POOL_MAX_USES: int = 3
+    REPLY_POOL_MAX_AGE_SECONDS: int = 3600
+    REPLY_POOL_TOKEN_BUDGET: int = 20000
+    REPLY_POOL_BUDGET_WINDOW_SECONDS: int = 3600
+    REPLY_POOL_REPLY_TOKENS: int = 100
+    REPLY_POOL_IDLE_SECONDS: float = 2.0
+    REPLY_POOL_REFRESH_SECONDS: int = 600
+
+    # Chat pipeline stage cache (detection results keyed by media content hash)
+    PIPELINE_CACHE_ENABLED: bool = True
+    PIPELINE_CACHE_MAX_ENTRIES: int = 1000
+    PIPELINE_CACHE_TTL_SECONDS: int = 300
+
+    # Emotion result handles (detection endpoints -> chat endpoints, no re-upload)
+    EMOTION_HANDLE_TTL_SECONDS: int = 300
+    EMOTION_HANDLE_MAX: int = 5000
+
+    # Speculative replies: stream the reply for the audio model's top emotions
+    # while face detection / fusion finish, keep the one that matches
+    SPECULATIVE_REPLIES_ENABLED: bool = False
+    SPECULATIVE_TOP_K: int = 2
+    SPECULATIVE_MIN_PROBABILITY: float = 0.15
+    SPECULATIVE_MAX_QUEUE_DEPTH: int = 1
+
+    # Local voice emotion labeling (wav2vec2 + transcript lexicon + acoustic arousal)
+    LOCAL_EMOTION_MODEL_WEIGHT: float = 0.6
+    LOCAL_EMOTION_TEXT_WEIGHT: float = 0.3
+    LOCAL_EMOTION_ACOUSTIC_WEIGHT: float = 0.1
+
+    # LLM provider ("groq" or "openai_compatible", e.g. scripts/llm_standin_server.py)
+    LLM_PROVIDER: str = "groq"
+    LLM_BASE_URL: str = ""
+    LLM_API_KEY: str = ""
+    LLM_CHAT_MODEL: str = "llama-3.1-70b-versatile"
+    LLM_TRANSCRIPTION_MODEL: str = "whisper-large-v3"
+
+    # Model tier routing (large = LLM_CHAT_MODEL, fast = LLM_FAST_MODEL)
+    LLM_ROUTING_ENABLED: bool = True
+    LLM_FAST_MODEL: str = "llama-3.1-8b-instant"
+    LLM_ROUTER_LATENCY_SLO_SECONDS: float = 3.0
+    LLM_ROUTER_QUEUE_THRESHOLD: int = 4
+    LLM_ROUTER_LONG_MESSAGE_TOKENS: int = 400
+    LLM_ROUTER_WINDOW: int = 30
+    LLM_ROUTER_MIN_SAMPLES: int = 5
+    LLM_ROUTER_PROBE_EVERY: int = 10
+    LLM_ROUTER_DEADLINE_MARGIN: float = 1.2
+
+    # Upstream resilience (deadlines, hedging, circuit breaker)
+    REQUEST_LATENCY_BUDGET_SECONDS: float = 20.0
+    GROQ_TIMEOUT_SECONDS: float = 15.0
+    GROQ_HEDGE_ENABLED: bool = True
+    GROQ_HEDGE_PERCENTILE: float = 95.0
+    GROQ_HEDGE_MIN_SAMPLES: int = 20
+    GROQ_HEDGE_MIN_DELAY_MS: int = 200
+    GROQ_BREAKER_FAILURES: int = 5
+    GROQ_BREAKER_RESET_SECONDS: int = 30
+
+    # Request deadlines (timeout header or per-route default) and the degradations they trigger
+    REQUEST_TIMEOUT_HEADER: str = "X-Request-Timeout-Ms"
+    REQUEST_MAX_LATENCY_BUDGET_SECONDS: float = 60.0
+    ROUTE_LATENCY_BUDGETS: str = "/chat/text=10,/chat/audio=20,/chat/image=15,/chat/multimodal=25,/audio=15,/image=10"
+    DEADLINE_SKIP_FACE_SECONDS: float = 6.0
+    DEADLINE_SHORT_REPLY_SECONDS: float = 4.0
+    DEADLINE_FALLBACK_REPLY_SECONDS: float = 1.0
+
+    # Cancel a request's in-flight inference and LLM work when its client disconnects
+    CANCEL_ON_DISCONNECT: bool = True
+
+    # Server-Timing response header and the slowest-requests trace recorder (/debug/traces)
+    SERVER_TIMING_ENABLED: bool = True
+    SLOW_TRACE_RECORDER_ENABLED: bool = False
+    SLOW_TRACE_COUNT: int = 20
+    SLOW_TRACE_WINDOW_SECONDS: float = 600
+
+    # Client-side Groq rate limiting (match your account's limits)
+    GROQ_RPM: int = 30
+    GROQ_TPM: int = 6000
+    WHISPER_RPM: int = 20
+    GROQ_MAX_RETRIES: int = 0
+    GROQ_QUEUE_MAX_WAIT_INTERACTIVE_SECONDS: float = 5.0
+    GROQ_QUEUE_MAX_WAIT_PIPELINE_SECONDS: float = 10.0
+    GROQ_QUEUE_MAX_WAIT_BACKGROUND_SECONDS: float = 60.0
+
+    # Conversation sessions ("memory" or "sqlite" for multi-worker setups)
+    SESSION_BACKEND: str = "memory"
+    SESSION_SQLITE_PATH: str = "./storage/sessions.db"
+    SESSION_TTL_SECONDS: int = 86400
+    SESSION_MAX_SESSIONS: int = 10000
+    SESSION_MAX_MESSAGES: int = 20
+
+    # Prompt history budget (older turns are folded into a rolling summary)
+    HISTORY_TOKEN_BUDGET: int = 600
+    HISTORY_SUMMARY_TOKENS: int = 150
+    HISTORY_SUMMARY_MODEL: str = "llama-3.1-8b-instant"
+
+    # Concurrency
+    AUDIO_INFERENCE_WORKERS: int = 2
+    FACE_INFERENCE_WORKERS: int = 2
+    FILE_IO_WORKERS: int = 4
+
     # Pydantic Configuration
     model_config = SettingsConfigDict(
         env_file=".env", 
@@ -60,6 +180,16 @@ class Settings(BaseSettings):
     @property
     def allowed_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
+
+    @property
+    def route_latency_budgets(self) -> List[Tuple[str, float]]:
+        """(path prefix, seconds) pairs, longest prefix first"""
+        budgets = []
+        for entry in self.ROUTE_LATENCY_BUDGETS.split(","):
+            prefix, _, seconds = entry.partition("=")
+            if prefix.strip() and seconds.strip():
+                budgets.append((prefix.strip(), float(seconds)))
+        return sorted(budgets, key=lambda budget: len(budget[0]), reverse=True)
     # -----------------------------------------------------------------------
 
 # Settings instance creation
@@ -71,6 +71,17 @@ RESPONSE_LENGTH = {
     "long": 200
 }
 
+# Reply length per emotion (keys of RESPONSE_LENGTH)
+EMOTION_RESPONSE_LENGTH = {
+    "happy": "medium",
+    "sad": "long",
+    "angry": "medium",
+    "fear": "long",
+    "surprise": "short",
+    "disgust": "medium",
+    "neutral": "medium"
+}
+
 # File processing
 AUDIO_SAMPLE_RATE = 16000
 IMAGE_SIZE = (48, 48)  # For CNN input
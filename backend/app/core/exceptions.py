@@ -41,6 +41,36 @@ class GroqAPIError(MoodifyException):
         super().__init__(message, status_code=502)
 
 
+class UpstreamTimeoutError(GroqAPIError):
+    """Exception raised when an upstream call misses its deadline"""
+    def __init__(self, message: str = "Upstream call timed out"):
+        MoodifyException.__init__(self, message, status_code=504)
+
+
+class CircuitOpenError(GroqAPIError):
+    """Exception raised when the upstream circuit breaker is open"""
+    def __init__(self, message: str = "Upstream temporarily unavailable"):
+        MoodifyException.__init__(self, message, status_code=503)
+
+
+class RateLimitedError(GroqAPIError):
+    """Exception raised when a call waits too long for client-side rate budget"""
+    def __init__(self, message: str = "Rate limit budget exhausted"):
+        MoodifyException.__init__(self, message, status_code=429)
+
+
+class EmotionHandleError(MoodifyException):
+    """Exception raised when an emotion result handle cannot be used"""
+    def __init__(self, message: str = "Emotion handle is unknown or expired", status_code: int = 404):
+        super().__init__(message, status_code=status_code)
+
+
+class DeadlineExceededError(MoodifyException):
+    """Exception raised when a request's latency budget is spent before a required stage"""
+    def __init__(self, message: str = "Request deadline exceeded"):
+        super().__init__(message, status_code=504)
+
+
 class FileValidationError(MoodifyException):
     """Exception raised when file validation fails"""
     def __init__(self, message: str = "File validation failed"):
@@ -0,0 +1,74 @@
+"""
+Dedicated thread pools for blocking work
+
+Audio inference, face inference and file I/O each get their own pool so a
+slow branch of a multimodal request never queues behind the other one.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from app.config import settings
+from app.core.logging_config import log
+from app.core.metrics import metrics
+
+
+audio_executor = ThreadPoolExecutor(
+    max_workers=settings.AUDIO_INFERENCE_WORKERS,
+    thread_name_prefix="audio-infer"
+)
+face_executor = ThreadPoolExecutor(
+    max_workers=settings.FACE_INFERENCE_WORKERS,
+    thread_name_prefix="face-infer"
+)
+io_executor = ThreadPoolExecutor(
+    max_workers=settings.FILE_IO_WORKERS,
+    thread_name_prefix="file-io"
+)
+
+
+async def run_in_executor(executor: ThreadPoolExecutor, func, *args, **kwargs):
+    """
+    Run a blocking callable on the given executor without blocking the event loop
+    
+    Cancelling the caller (e.g. the client disconnected) drops the job if it
+    is still queued; a job already running cannot be interrupted, so it
+    finishes on its thread and the result is discarded.
+    
+    The job runs in a copy of the caller's context, so stages it times land
+    in the calling request's trace.
+    
+    Args:
+        executor: Thread pool to run on
+        func: Blocking callable
+        
+    Returns:
+        Result of the callable
+    """
+    context = contextvars.copy_context()
+    future = executor.submit(context.run, functools.partial(func, *args, **kwargs))
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        # wrap_future already tried to cancel it; this only reports whether that worked
+        if future.cancel():
+            metrics.increment("cancelled_executor_jobs")
+        else:
+            metrics.increment("abandoned_executor_jobs")
+        raise
+
+
+def executor_queue_depths() -> Dict[str, int]:
+    """Jobs waiting for a free worker, per pool"""
+    return {
+        executor._thread_name_prefix: executor._work_queue.qsize()
+        for executor in (audio_executor, face_executor, io_executor)
+    }
+
+
+def shutdown_executors():
+    """Shut down all worker pools (called on application shutdown)"""
+    for executor in (audio_executor, face_executor, io_executor):
+        executor.shutdown(wait=False, cancel_futures=True)
+    log.info("Worker pools shut down")
@@ -0,0 +1,152 @@
+"""
+In-process counters and latency histograms for operational metrics
+
+Every thread (the event loop and each pool worker) records into its own
+shard without taking a lock; reads sum the shards. Recording stays cheap on
+hot paths, and the cost moves to snapshot() and the /metrics scrape.
+"""
+import re
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+
+# Latency buckets in seconds (Prometheus `le` bounds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROMETHEUS_PREFIX = "moodify"
+
+
+class _Histogram:
+    """One thread's observations for one histogram"""
+    
+    __slots__ = ("counts", "sum")
+    
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+
+
+class _Shard:
+    """Counters and histograms written by a single thread"""
+    
+    __slots__ = ("counters", "histograms")
+    
+    def __init__(self):
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, _Histogram] = {}
+
+
+class MetricsRegistry:
+    """Named counters and stage latency histograms, sharded per thread"""
+    
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._shards: List[_Shard] = []
+        self._local = threading.local()
+        # Only taken when a thread records for the first time
+        self._register_lock = threading.Lock()
+    
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._register_lock:
+                self._shards.append(shard)
+        return shard
+    
+    def increment(self, name: str, amount: int = 1):
+        """
+        Increment a counter
+        
+        Args:
+            name: Counter name
+            amount: Amount to add
+        """
+        counters = self._shard().counters
+        counters[name] = counters.get(name, 0) + amount
+    
+    def observe(self, name: str, seconds: float):
+        """
+        Record a stage duration
+        
+        Args:
+            name: Stage name (the `stage` label on /metrics)
+            seconds: Duration in seconds
+        """
+        histograms = self._shard().histograms
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = _Histogram(len(self.buckets) + 1)
+        histogram.counts[bisect_left(self.buckets, seconds)] += 1
+        histogram.sum += seconds
+    
+    def get(self, name: str) -> int:
+        """Get the current value of a counter"""
+        return sum(shard.counters.get(name, 0) for shard in self._shards)
+    
+    def snapshot(self) -> Dict[str, int]:
+        """Copy of all counters"""
+        totals: Dict[str, int] = {}
+        for shard in list(self._shards):
+            # dict() copies atomically, so a writer adding a key can't break the loop
+            for name, value in dict(shard.counters).items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+    
+    def histograms(self) -> Dict[str, Tuple[List[int], float]]:
+        """Per-stage (bucket counts incl. +Inf, sum of seconds), summed over threads"""
+        totals: Dict[str, Tuple[List[int], float]] = {}
+        for shard in list(self._shards):
+            for name, histogram in dict(shard.histograms).items():
+                counts, total = totals.get(name, ([0] * (len(self.buckets) + 1), 0.0))
+                totals[name] = ([a + b for a, b in zip(counts, histogram.counts)], total + histogram.sum)
+        return totals
+    
+    def prometheus(self, gauges: Optional[Mapping[str, float]] = None) -> str:
+        """
+        Render everything in the Prometheus text exposition format
+        
+        Args:
+            gauges: Point-in-time values read at scrape time (queue depths, readiness)
+        
+        Returns:
+            Exposition text for a /metrics endpoint
+        """
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_stage_duration_seconds Pipeline stage and upstream call latency",
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_duration_seconds histogram",
+        ]
+        for stage, (counts, total) in sorted(self.histograms().items()):
+            label = f'stage="{_label_value(stage)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{PROMETHEUS_PREFIX}_stage_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{PROMETHEUS_PREFIX}_stage_duration_seconds_bucket{{{label},le="+Inf"}} {cumulative}')
+            lines.append(f"{PROMETHEUS_PREFIX}_stage_duration_seconds_sum{{{label}}} {total}")
+            lines.append(f"{PROMETHEUS_PREFIX}_stage_duration_seconds_count{{{label}}} {cumulative}")
+        
+        for name, value in sorted(self.snapshot().items()):
+            metric = f"{PROMETHEUS_PREFIX}_{_metric_name(name)}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        
+        for name, value in sorted((gauges or {}).items()):
+            metric = f"{PROMETHEUS_PREFIX}_{_metric_name(name)}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
@@ -0,0 +1,296 @@
+"""
+Stage-graph executor for request pipelines
+
+A pipeline is a set of named async stages with dependencies. Each run starts
+every stage as soon as its dependencies finish, so independent branches
+(audio and face ingest/detection, session loading) overlap. Stages are timed
+into a StageTimer, can be skipped by a condition or served from a shared
+result cache, and the first failure cancels everything still running.
+Stages marked needs_budget refuse to start once the request deadline has
+passed. Cleanup stages run last, whether the run succeeded or not.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set
+from app.config import settings
+from app.core.logging_config import log
+from app.core.exceptions import DeadlineExceededError
+from app.core.metrics import metrics
+from app.core.resilience import short_on_time
+from app.core.timing import StageTimer
+
+
+class Stage(NamedTuple):
+    """
+    One pipeline stage
+    
+    Attributes:
+        name: Unique stage name (also its timing key and result key)
+        run: Coroutine function taking the PipelineRun and returning the stage result
+        after: Stages that must finish first
+        when: Run only if this returns True once dependencies are done (else result None)
+        cache_key: Key for the shared stage cache (None = do not cache this run)
+        timed: Report the stage in the timing breakdown
+        cleanup: Run after all other stages, even when the run failed
+        needs_budget: Fail instead of starting once the request deadline has passed
+    """
+    name: str
+    run: Callable[["PipelineRun"], Awaitable[Any]]
+    after: Sequence[str] = ()
+    when: Optional[Callable[["PipelineRun"], bool]] = None
+    cache_key: Optional[Callable[["PipelineRun"], Optional[str]]] = None
+    timed: bool = True
+    cleanup: bool = False
+    needs_budget: bool = False
+
+
+class StageCache:
+    """LRU + TTL cache of stage results shared by all runs"""
+    
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 300, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def _live(self, key: str) -> Optional[tuple]:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] > self.ttl_seconds:
+            del self._entries[key]
+            entry = None
+        return entry
+    
+    def contains(self, stage: str, key: Optional[str]) -> bool:
+        """Whether a live result exists (no hit/miss accounting)"""
+        if not self.enabled or key is None:
+            return False
+        with self._lock:
+            return self._live(f"{stage}:{key}") is not None
+    
+    def get(self, stage: str, key: str) -> Optional[Any]:
+        key = f"{stage}:{key}"
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, stage: str, key: str, value: Any):
+        key = f"{stage}:{key}"
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict:
+        """Entry count and hit rate"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+class PipelineRun:
+    """State of one pipeline execution: inputs, stage results and what ran"""
+    
+    def __init__(self, inputs: Dict[str, Any], timer: Optional[StageTimer] = None):
+        self.inputs = inputs
+        self.results: Dict[str, Any] = {}
+        self.timer = timer or StageTimer()
+        self.ran: List[str] = []
+        self.skipped: List[str] = []
+        self.cached: List[str] = []
+        self.error: Optional[BaseException] = None
+    
+    def __getitem__(self, name: str) -> Any:
+        """Stage result, falling back to a run input of that name"""
+        if name in self.results:
+            return self.results[name]
+        return self.inputs[name]
+    
+    def get(self, name: str, default: Any = None) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+
+class Pipeline:
+    """A validated stage graph that can be run many times"""
+    
+    def __init__(self, name: str, stages: Iterable[Stage], cache: Optional[StageCache] = None):
+        """
+        Args:
+            name: Pipeline name (metric prefix)
+            stages: Stage definitions
+            cache: Shared cache for stages with a cache_key
+        
+        Raises:
+            ValueError: Duplicate names, unknown dependencies or a cycle
+        """
+        self.name = name
+        self.cache = cache
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage {stage.name!r} in pipeline {name!r}")
+            self.stages[stage.name] = stage
+        for stage in self.stages.values():
+            unknown = [dep for dep in stage.after if dep not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name!r} depends on unknown stages {unknown}")
+        self.order = self._topological_order()
+    
+    def _topological_order(self) -> List[str]:
+        order: List[str] = []
+        state: Dict[str, int] = {}
+        
+        def visit(name: str, path: List[str]):
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Cycle in pipeline {self.name!r}: {' -> '.join(path + [name])}")
+            state[name] = 1
+            for dep in self.stages[name].after:
+                visit(dep, path + [name])
+            state[name] = 2
+            order.append(name)
+        
+        for name in self.stages:
+            visit(name, [])
+        return order
+    
+    def _needed(self, targets: Optional[Sequence[str]]) -> Set[str]:
+        """Targets plus everything they depend on (all stages if no targets)"""
+        if targets is None:
+            return {name for name, stage in self.stages.items() if not stage.cleanup}
+        needed: Set[str] = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in needed:
+                needed.add(name)
+                pending.extend(self.stages[name].after)
+        return needed
+    
+    async def _run_stage(self, stage: Stage, run: PipelineRun, deps: List[asyncio.Task]):
+        for dep in deps:
+            # A failed dependency fails this stage too
+            await dep
+        
+        if stage.when is not None and not stage.when(run):
+            run.results[stage.name] = None
+            run.skipped.append(stage.name)
+            return
+        
+        key = stage.cache_key(run) if stage.cache_key is not None and self.cache is not None and self.cache.enabled else None
+        if key is not None:
+            cached = self.cache.get(stage.name, key)
+            if cached is not None:
+                run.results[stage.name] = cached
+                run.cached.append(stage.name)
+                metrics.increment(f"pipeline_stage_cached_{stage.name}")
+                return
+        
+        if stage.needs_budget and short_on_time(0):
+            # A cached result is free, but new work past the deadline is wasted
+            metrics.increment(f"pipeline_{self.name}_deadline_exceeded")
+            raise DeadlineExceededError(f"Request deadline passed before stage {stage.name}")
+        
+        if stage.timed:
+            with run.timer.stage(stage.name):
+                result = await stage.run(run)
+        else:
+            result = await stage.run(run)
+        run.results[stage.name] = result
+        run.ran.append(stage.name)
+        if key is not None and result is not None:
+            self.cache.put(stage.name, key, result)
+    
+    async def _cleanup(self, run: PipelineRun):
+        for stage in self.stages.values():
+            if not stage.cleanup:
+                continue
+            try:
+                await stage.run(run)
+            except Exception as e:
+                log.warning(f"Pipeline {self.name} cleanup stage {stage.name} failed: {str(e)}")
+    
+    async def run(
+        self,
+        inputs: Optional[Dict[str, Any]] = None,
+        timer: Optional[StageTimer] = None,
+        targets: Optional[Sequence[str]] = None
+    ) -> PipelineRun:
+        """
+        Execute the graph
+        
+        Args:
+            inputs: Named run inputs stages read via run[name]
+            timer: Timer receiving the stage timings (new one if omitted)
+            targets: Only run these stages and their dependencies (default: all)
+        
+        Returns:
+            The finished PipelineRun
+        
+        Raises:
+            The first stage failure, after cancelling the stages still running
+        """
+        run = PipelineRun(inputs or {}, timer)
+        needed = self._needed(targets)
+        tasks: Dict[str, asyncio.Task] = {}
+        for name in self.order:
+            if name in needed:
+                stage = self.stages[name]
+                tasks[name] = asyncio.create_task(
+                    self._run_stage(stage, run, [tasks[dep] for dep in stage.after])
+                )
+        
+        try:
+            pending = set(tasks.values())
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+                failed = [task for task in done if not task.cancelled() and task.exception() is not None]
+                if failed:
+                    # Report the root failure, not a dependent that re-raised it
+                    run.error = next(
+                        task.exception() for name, task in tasks.items() if task in failed
+                    )
+                    metrics.increment(f"pipeline_{self.name}_failed")
+                    raise run.error
+            return run
+        except BaseException as e:
+            if run.error is None:
+                run.error = e
+            raise
+        finally:
+            # Failure or caller cancellation: stop every stage still running
+            unfinished = [task for task in tasks.values() if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                metrics.increment("cancelled_pipeline_stages", len(unfinished))
+                await asyncio.gather(*unfinished, return_exceptions=True)
+            await self._cleanup(run)
+
+
+# Detection results keyed by media content, shared by every chat pipeline
+stage_cache = StageCache(
+    max_entries=settings.PIPELINE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PIPELINE_CACHE_TTL_SECONDS,
+    enabled=settings.PIPELINE_CACHE_ENABLED
+)
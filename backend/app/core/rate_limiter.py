@@ -0,0 +1,284 @@
+"""
+Client-side rate limiting for Groq
+
+Token buckets track the requests-per-minute and tokens-per-minute budgets
+(corrected from x-ratelimit-* response headers) and callers queue by
+priority, so peak traffic turns into smooth throughput instead of 429 bursts.
+"""
+import asyncio
+import heapq
+import itertools
+import re
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+import httpx
+from app.config import settings
+from app.core.exceptions import RateLimitedError
+from app.core.logging_config import log
+from app.core.metrics import metrics
+from app.core.resilience import remaining_budget
+
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0   # text chat
+PRIORITY_PIPELINE = 1      # audio / image / multimodal pipelines
+PRIORITY_BACKGROUND = 2    # pool refills, history summaries
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_PIPELINE: "pipeline",
+    PRIORITY_BACKGROUND: "background",
+}
+
+# Priority of the work running in the current request / task
+request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+async def pipeline_priority():
+    """Route dependency: queue this request's Groq calls behind interactive chat"""
+    request_priority.set(PRIORITY_PIPELINE)
+
+
+_DURATION_PART = re.compile(r"([\d.]+)(ms|h|m|s)")
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset durations like "2m59.56s", "7.66s" or "120ms" into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Continuously refilling per-minute budget"""
+    
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+    
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+    
+    def has(self, amount: float, now: float) -> bool:
+        self._refill(now)
+        return self.level >= min(amount, self.capacity)
+    
+    def consume(self, amount: float):
+        self.level -= min(amount, self.capacity)
+    
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available"""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0) * 60 / self.capacity
+    
+    def sync(self, limit: Optional[float], remaining: Optional[float]):
+        """Adopt the server's view of the budget"""
+        self._refill(time.monotonic())
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "future")
+    
+    def __init__(self, priority: int, seq: int, tokens: int):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.future: Optional[asyncio.Future] = None
+    
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class RateLimiter:
+    """RPM/TPM limiter with a priority queue and per-priority queue-time limits"""
+    
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: int,
+        tokens_per_minute: Optional[int] = None,
+        max_wait_seconds: Optional[Dict[int, float]] = None
+    ):
+        """
+        Args:
+            name: Metric prefix
+            requests_per_minute: Request budget
+            tokens_per_minute: Token budget (None = requests only)
+            max_wait_seconds: Longest queue time per priority before giving up
+        """
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_wait_seconds = max_wait_seconds or {}
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+    
+    def _try_consume(self, tokens: int, now: float) -> bool:
+        if now < self._paused_until:
+            return False
+        if not self.requests.has(1, now):
+            return False
+        if self.tokens is not None and not self.tokens.has(tokens, now):
+            return False
+        self.requests.consume(1)
+        if self.tokens is not None:
+            self.tokens.consume(tokens)
+        return True
+    
+    def _wait_time(self, tokens: int, now: float) -> float:
+        wait = max(self._paused_until - now, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return max(wait, 0.01)
+    
+    def _wake_head(self):
+        if self._waiters:
+            future = self._waiters[0].future
+            if future is not None and not future.done():
+                future.set_result(None)
+    
+    def queue_depth(self) -> int:
+        """Callers currently waiting for budget"""
+        return len(self._waiters)
+    
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """Take budget only if it is free right now and nobody is queued"""
+        return not self._waiters and self._try_consume(tokens, time.monotonic())
+    
+    async def acquire(self, tokens: int = 0, priority: Optional[int] = None):
+        """
+        Wait for request (and token) budget
+        
+        Args:
+            tokens: Estimated tokens for the call (prompt + max completion)
+            priority: Queue priority (defaults to the current request's)
+        
+        Raises:
+            RateLimitedError: Queue-time limit for this priority was exceeded
+        """
+        if priority is None:
+            priority = request_priority.get()
+        if self.try_acquire(tokens):
+            return
+        
+        max_wait = self.max_wait_seconds.get(priority, 30.0)
+        budget = remaining_budget()
+        if budget is not None:
+            max_wait = min(max_wait, budget)
+        start = time.monotonic()
+        deadline = start + max_wait
+        waiter = _Waiter(priority, next(self._seq), tokens)
+        heapq.heappush(self._waiters, waiter)
+        metrics.increment(f"{self.name}_queued_{PRIORITY_NAMES.get(priority, priority)}")
+        
+        try:
+            while True:
+                now = time.monotonic()
+                if self._waiters[0] is waiter and self._try_consume(tokens, now):
+                    metrics.increment(f"{self.name}_queue_wait_ms", int((now - start) * 1000))
+                    return
+                if now >= deadline:
+                    metrics.increment(f"{self.name}_queue_timeout")
+                    raise RateLimitedError(f"{self.name}: queued too long waiting for rate budget")
+                
+                timeout = deadline - now
+                if self._waiters[0] is waiter:
+                    timeout = min(timeout, self._wait_time(tokens, now))
+                waiter.future = asyncio.get_running_loop().create_future()
+                try:
+                    await asyncio.wait_for(waiter.future, timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            # The caller went away while queued; its budget is never taken
+            metrics.increment(f"cancelled_{self.name}_queued_calls")
+            raise
+        finally:
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+            self._wake_head()
+    
+    def update_from_headers(self, headers: httpx.Headers, status_code: int):
+        """
+        Correct the buckets from x-ratelimit-* headers (and back off on 429)
+        
+        Groq reports requests per day and tokens per minute; the day budget
+        only matters once it is exhausted.
+        """
+        def number(key: str) -> Optional[float]:
+            try:
+                return float(headers[key])
+            except (KeyError, ValueError):
+                return None
+        
+        if self.tokens is not None:
+            self.tokens.sync(number("x-ratelimit-limit-tokens"), number("x-ratelimit-remaining-tokens"))
+        
+        pause = None
+        if number("x-ratelimit-remaining-requests") == 0:
+            pause = parse_reset_duration(headers.get("x-ratelimit-reset-requests"))
+        if status_code == 429:
+            pause = max(
+                pause or 0,
+                parse_reset_duration(headers.get("retry-after")) or 0,
+                parse_reset_duration(headers.get("x-ratelimit-reset-tokens")) or 0,
+                1.0
+            )
+            metrics.increment(f"{self.name}_upstream_429")
+        if pause:
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            log.warning(f"{self.name} rate limited upstream, pausing {pause:.1f}s")
+        self._wake_head()
+    
+    def stats(self) -> Dict:
+        """Bucket levels and queue depth"""
+        return {
+            "queued": self.queue_depth(),
+            "requests_available": round(self.requests.level, 2),
+            "tokens_available": round(self.tokens.level) if self.tokens is not None else None,
+            "paused_for_s": round(max(self._paused_until - time.monotonic(), 0), 2),
+        }
+
+
+_max_wait = {
+    PRIORITY_INTERACTIVE: settings.GROQ_QUEUE_MAX_WAIT_INTERACTIVE_SECONDS,
+    PRIORITY_PIPELINE: settings.GROQ_QUEUE_MAX_WAIT_PIPELINE_SECONDS,
+    PRIORITY_BACKGROUND: settings.GROQ_QUEUE_MAX_WAIT_BACKGROUND_SECONDS,
+}
+
+# Chat models share the account's RPM/TPM; Whisper has its own request budget
+chat_limiter = RateLimiter("groq_chat_rate", settings.GROQ_RPM, settings.GROQ_TPM, _max_wait)
+whisper_limiter = RateLimiter("groq_whisper_rate", settings.WHISPER_RPM, None, _max_wait)
+
+
+async def _on_groq_response(response: httpx.Response):
+    limiter = whisper_limiter if "/audio/" in response.request.url.path else chat_limiter
+    limiter.update_from_headers(response.headers, response.status_code)
+
+
+def groq_http_client(**kwargs) -> httpx.AsyncClient:
+    """HTTP client for LLM providers that feeds rate-limit headers to the limiters"""
+    # Plain httpx (works with every groq SDK version); the SDK still sets per-request timeouts
+    kwargs.setdefault("follow_redirects", True)
+    return httpx.AsyncClient(event_hooks={"response": [_on_groq_response]}, **kwargs)
+
+
+def rate_limit_stats() -> Dict[str, Dict]:
+    """Stats for the Groq limiters"""
+    return {limiter.name: limiter.stats() for limiter in (chat_limiter, whisper_limiter)}
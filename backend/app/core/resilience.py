@@ -0,0 +1,329 @@
+"""
+Resilience layer for upstream API calls
+
+Each upstream call type gets a ResilientCaller that bounds it by the request's
+remaining latency budget, fires a hedged duplicate once it runs past the
+observed p95, and trips a circuit breaker after repeated failures so callers
+can go straight to their fallbacks.
+"""
+import asyncio
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+from app.config import settings
+from app.core.exceptions import CircuitOpenError, UpstreamTimeoutError
+from app.core.logging_config import log
+from app.core.metrics import metrics
+from app.core.timing import observe_stage
+
+
+T = TypeVar("T")
+
+# Absolute time.monotonic() deadline for the current request (None = no budget)
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left in the current request's latency budget (None if unbounded)"""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def short_on_time(seconds: float) -> bool:
+    """Whether the current request has a budget with less than `seconds` left"""
+    budget = remaining_budget()
+    return budget is not None and budget < seconds
+
+
+# Degradations applied to the current request to meet its deadline (None outside a request)
+request_degradations: ContextVar[Optional[List[str]]] = ContextVar("request_degradations", default=None)
+
+
+def note_degradation(name: str):
+    """Record that the current request was degraded (e.g. "face_skipped", "fast_tier")"""
+    applied = request_degradations.get()
+    if applied is not None and name not in applied:
+        applied.append(name)
+    metrics.increment(f"deadline_{name}")
+
+
+def applied_degradations() -> List[str]:
+    """Degradations recorded so far for the current request"""
+    return list(request_degradations.get() or [])
+
+
+def latency_budget(path: str, timeout_header: Optional[str] = None) -> float:
+    """
+    Latency budget in seconds for a request
+    
+    A client timeout header (milliseconds) wins, capped at
+    REQUEST_MAX_LATENCY_BUDGET_SECONDS; otherwise the longest matching
+    ROUTE_LATENCY_BUDGETS prefix, then REQUEST_LATENCY_BUDGET_SECONDS.
+    """
+    if timeout_header:
+        try:
+            seconds = float(timeout_header) / 1000
+        except ValueError:
+            seconds = 0
+        if seconds > 0:
+            return min(seconds, settings.REQUEST_MAX_LATENCY_BUDGET_SECONDS)
+    for prefix, seconds in settings.route_latency_budgets:
+        if path.startswith(prefix):
+            return seconds
+    return settings.REQUEST_LATENCY_BUDGET_SECONDS
+
+
+class LatencyTracker:
+    """Rolling window of call latencies"""
+    
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+    
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+    
+    def __len__(self) -> int:
+        return len(self._samples)
+    
+    def percentile(self, p: float, last: Optional[int] = None) -> Optional[float]:
+        """p-th percentile in seconds over all (or the `last` n) samples (None without samples)"""
+        if not self._samples:
+            return None
+        samples = list(self._samples)[-last:] if last else self._samples
+        ordered = sorted(samples)
+        idx = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[idx]
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+    
+    def allow(self) -> bool:
+        """Whether a call may go upstream right now"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+        return True
+    
+    def is_open(self) -> bool:
+        """Whether calls are being rejected right now (no probe due yet)"""
+        return self.state == self.OPEN and time.monotonic() - self._opened_at < self.reset_seconds
+    
+    def release(self):
+        """Give back a half-open probe slot that never reached upstream"""
+        self._probe_in_flight = False
+    
+    def record_success(self):
+        if self.state != self.CLOSED:
+            log.info(f"Circuit {self.name} closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+    
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                log.warning(f"Circuit {self.name} opened after {self.failures} failures")
+                metrics.increment(f"{self.name}_breaker_opened")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class ResilientCaller:
+    """Deadline, hedging and circuit breaking for one upstream call type"""
+    
+    def __init__(
+        self,
+        name: str,
+        timeout_seconds: float = 15,
+        hedge_enabled: bool = True,
+        hedge_percentile: float = 95,
+        hedge_min_samples: int = 20,
+        hedge_min_delay_seconds: float = 0.2,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30
+    ):
+        """
+        Args:
+            name: Metric prefix (e.g. "groq_chat")
+            timeout_seconds: Upper bound per call, further capped by the request budget
+            hedge_enabled: Fire a duplicate request once the first runs past the hedge delay
+            hedge_percentile: Latency percentile used as the hedge delay
+            hedge_min_samples: Samples required before hedging starts
+            hedge_min_delay_seconds: Floor for the hedge delay
+            failure_threshold: Consecutive failures that open the breaker
+            reset_seconds: Time the breaker stays open before a probe
+        """
+        self.name = name
+        self.timeout_seconds = timeout_seconds
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay_seconds = hedge_min_delay_seconds
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_seconds)
+        self.latency = LatencyTracker()
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        _callers[name] = self
+    
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before a hedged duplicate is sent (None = don't hedge yet)"""
+        if not self.hedge_enabled or len(self.latency) < self.hedge_min_samples:
+            return None
+        return max(self.latency.percentile(self.hedge_percentile), self.hedge_min_delay_seconds)
+    
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        hedge: bool = True,
+        hedge_gate: Optional[Callable[[], bool]] = None
+    ) -> T:
+        """
+        Run an upstream call under the deadline, hedge and breaker policy
+        
+        Args:
+            fn: Zero-argument coroutine function making the call (must be
+                safe to issue twice when hedging)
+            hedge: Allow a hedged duplicate for this call
+            hedge_gate: Checked before firing the duplicate (e.g. free rate budget)
+        
+        Returns:
+            The call's result
+        
+        Raises:
+            CircuitOpenError: The breaker is open
+            UpstreamTimeoutError: The deadline passed before a result arrived
+        """
+        if not self.breaker.allow():
+            metrics.increment(f"{self.name}_breaker_rejected")
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+        
+        timeout = self.timeout_seconds
+        budget = remaining_budget()
+        budget_limited = budget is not None and budget < timeout
+        if budget_limited:
+            timeout = budget
+        if timeout <= 0:
+            self.breaker.release()
+            metrics.increment(f"{self.name}_deadline_exceeded")
+            raise UpstreamTimeoutError(f"{self.name}: request latency budget already spent")
+        
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._race(fn, hedge, hedge_gate), timeout=timeout)
+        except asyncio.TimeoutError:
+            # Running out of the caller's budget says nothing about upstream health
+            if budget_limited:
+                self.breaker.release()
+            else:
+                self.breaker.record_failure()
+            metrics.increment(f"{self.name}_timeout")
+            raise UpstreamTimeoutError(f"{self.name} timed out after {timeout:.1f}s")
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            metrics.increment(f"{self.name}_error")
+            raise
+        
+        self.breaker.record_success()
+        elapsed = time.perf_counter() - start
+        self.latency.add(elapsed)
+        observe_stage(self.name, start, elapsed)
+        return result
+    
+    async def _race(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        hedge: bool,
+        hedge_gate: Optional[Callable[[], bool]]
+    ) -> T:
+        delay = self.hedge_delay() if hedge else None
+        primary = asyncio.ensure_future(fn())
+        if delay is None:
+            return await primary
+        
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and (hedge_gate is None or hedge_gate()):
+                self.hedges_fired += 1
+                metrics.increment(f"{self.name}_hedge_fired")
+                tasks.add(asyncio.ensure_future(fn()))
+            
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedges_won += 1
+                            metrics.increment(f"{self.name}_hedge_won")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks | {primary}:
+                if not task.done():
+                    task.cancel()
+    
+    def stats(self) -> Dict:
+        """Breaker state, latency percentiles and hedge win rate"""
+        p50 = self.latency.percentile(50)
+        p95 = self.latency.percentile(95)
+        return {
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "hedge_win_rate": round(self.hedges_won / self.hedges_fired, 4) if self.hedges_fired else 0.0,
+        }
+
+
+_callers: Dict[str, ResilientCaller] = {}
+
+
+def resilience_stats() -> Dict[str, Dict]:
+    """Stats for every registered caller"""
+    return {name: caller.stats() for name, caller in _callers.items()}
+
+
+def resilient_caller(name: str) -> ResilientCaller:
+    """Build a caller configured from the GROQ_* resilience settings"""
+    return ResilientCaller(
+        name,
+        timeout_seconds=settings.GROQ_TIMEOUT_SECONDS,
+        hedge_enabled=settings.GROQ_HEDGE_ENABLED,
+        hedge_percentile=settings.GROQ_HEDGE_PERCENTILE,
+        hedge_min_samples=settings.GROQ_HEDGE_MIN_SAMPLES,
+        hedge_min_delay_seconds=settings.GROQ_HEDGE_MIN_DELAY_MS / 1000,
+        failure_threshold=settings.GROQ_BREAKER_FAILURES,
+        reset_seconds=settings.GROQ_BREAKER_RESET_SECONDS
+    )
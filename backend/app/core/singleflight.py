@@ -0,0 +1,108 @@
+"""
+Single-flight coalescing of identical in-flight calls
+
+Concurrent callers asking for the same key share one upstream call and its
+result (or error) instead of each firing their own request.
+"""
+import asyncio
+import hashlib
+import json
+from typing import Awaitable, Callable, Dict, TypeVar
+from app.core.exceptions import UpstreamTimeoutError
+from app.core.metrics import metrics
+from app.core.resilience import remaining_budget
+
+
+T = TypeVar("T")
+
+
+def default_key(*args, **kwargs) -> str:
+    """Hash JSON-serializable call arguments into a key"""
+    payload = json.dumps({"args": args, "kwargs": kwargs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key"""
+    
+    def __init__(self, name: str, key_fn: Callable[..., str] = default_key):
+        """
+        Args:
+            name: Name used for the `<name>_coalesced` counter
+            key_fn: Builds a key from call arguments when do() is not given one
+        """
+        self.name = name
+        self.key_fn = key_fn
+        self.coalesced = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._callers: Dict[asyncio.Future, int] = {}
+    
+    def key(self, *args, **kwargs) -> str:
+        """Build a key with the configured key function"""
+        return self.key_fn(*args, **kwargs)
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn once per key among concurrent callers
+        
+        The shared call runs as its own task, so one caller being cancelled
+        does not cancel the result other callers are waiting for; once the
+        last caller is cancelled the shared call is cancelled too.
+        
+        The shared call runs in the first caller's context: its deadline,
+        queue priority, degradations and trace. Each caller still waits no
+        longer than its own remaining budget.
+        
+        Args:
+            key: Coalescing key
+            fn: Zero-argument coroutine function making the upstream call
+        
+        Returns:
+            The shared result (or raises the shared error)
+        
+        Raises:
+            UpstreamTimeoutError: This caller's budget ran out before the shared result
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        else:
+            self.coalesced += 1
+            metrics.increment(f"{self.name}_coalesced")
+        self._callers[task] = self._callers.get(task, 0) + 1
+        try:
+            budget = remaining_budget()
+            if budget is None:
+                return await asyncio.shield(task)
+            return await asyncio.wait_for(asyncio.shield(task), max(budget, 0))
+        except asyncio.TimeoutError:
+            self._release(task)
+            metrics.increment(f"{self.name}_wait_deadline_exceeded")
+            raise UpstreamTimeoutError(f"{self.name}: request latency budget spent waiting for a shared call")
+        except asyncio.CancelledError:
+            self._release(task)
+            raise
+        finally:
+            self._callers[task] -= 1
+            if not self._callers[task]:
+                del self._callers[task]
+    
+    def _release(self, task: asyncio.Future):
+        """Cancel the shared call if the caller giving up was the last one waiting"""
+        if self._callers[task] == 1 and not task.done():
+            # Nobody is left to use the result
+            task.cancel()
+            metrics.increment(f"cancelled_{self.name}_calls")
+    
+    def _forget(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the error as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+    
+    def in_flight(self) -> int:
+        """Number of distinct calls currently in flight"""
+        return len(self._inflight)
@@ -0,0 +1,68 @@
+"""
+Stage timing utilities for request pipelines
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict
+from app.core.metrics import metrics
+from app.core.tracing import record_span
+
+
+class StageTimer:
+    """
+    Records the wall-clock duration of named pipeline stages (milliseconds)
+    
+    Each stage is also observed in the process-wide stage histogram and the
+    current request's trace.
+    """
+    
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+    
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a block of work as a named stage
+        
+        Args:
+            name: Stage name reported in the timing breakdown
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] = round(elapsed * 1000, 2)
+            observe_stage(name, start, elapsed)
+    
+    def total_ms(self) -> float:
+        """Elapsed time since the timer was created"""
+        return round((time.perf_counter() - self._start) * 1000, 2)
+    
+    def as_dict(self) -> Dict[str, float]:
+        """Stage breakdown including the total elapsed time"""
+        return {**self.stages, "total": self.total_ms()}
+
+
+def observe_stage(name: str, start: float, seconds: float):
+    """
+    Report a finished stage to the stage histogram and the request trace
+    
+    Args:
+        name: Stage name
+        start: time.perf_counter() when the stage started
+        seconds: Stage duration
+    """
+    metrics.observe(name, seconds)
+    record_span(name, start, seconds)
+
+
+@contextmanager
+def timed(name: str):
+    """Time a block of work as a stage without a StageTimer (e.g. inside a pool job)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, start, time.perf_counter() - start)
@@ -0,0 +1,120 @@
+"""
+Per-request stage spans for Server-Timing and the slow-request recorder
+"""
+import heapq
+import itertools
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from app.config import settings
+
+
+class RequestTrace:
+    """Stage spans recorded while serving one request"""
+    
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.spans: List[tuple] = []
+        self.status: Optional[int] = None
+        self.duration_ms: Optional[float] = None
+    
+    def add(self, name: str, start: float, seconds: float):
+        """
+        Record a finished stage
+        
+        Args:
+            name: Stage name
+            start: time.perf_counter() when the stage started
+            seconds: Stage duration
+        """
+        # list.append is atomic, so pool threads record without a lock
+        self.spans.append((name, round((start - self._start) * 1000, 2), round(seconds * 1000, 2)))
+    
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._start) * 1000, 2)
+    
+    def stage_totals(self) -> Dict[str, float]:
+        """Milliseconds per stage name (repeated stages are summed), in first-seen order"""
+        totals: Dict[str, float] = {}
+        for name, _, duration in list(self.spans):
+            totals[name] = round(totals.get(name, 0.0) + duration, 2)
+        return totals
+    
+    def server_timing(self) -> str:
+        """Server-Timing header value for the stages finished so far"""
+        entries = [f"{name};dur={duration}" for name, duration in self.stage_totals().items()]
+        entries.append(f"total;dur={self.elapsed_ms()}")
+        return ", ".join(entries)
+    
+    def finish(self, status: Optional[int]):
+        self.status = status
+        self.duration_ms = self.elapsed_ms()
+    
+    def as_dict(self) -> Dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": round(self.started_at, 3),
+            "duration_ms": self.duration_ms,
+            "spans": [
+                {"name": name, "start_ms": start, "duration_ms": duration}
+                for name, start, duration in sorted(self.spans, key=lambda span: span[1])
+            ],
+        }
+
+
+# Trace of the request being served (None outside a request, e.g. warmup)
+request_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def record_span(name: str, start: float, seconds: float):
+    """Add a finished stage to the current request's trace, if any"""
+    trace = request_trace.get()
+    if trace is not None:
+        trace.add(name, start, seconds)
+
+
+class SlowTraceRecorder:
+    """
+    Keeps the traces of the slowest requests finished in a recent window
+    
+    A min-heap on duration holds at most `capacity` traces; a slower request
+    evicts the fastest one kept. Traces older than the window are dropped,
+    so after a burst of slow requests expires the recorder may briefly hold
+    fewer than `capacity` until new requests finish.
+    """
+    
+    def __init__(self, capacity: int = 20, window_seconds: float = 600):
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self._heap: List[tuple] = []
+        self._order = itertools.count()
+    
+    def _prune(self, now: float):
+        cutoff = now - self.window_seconds
+        if any(finished < cutoff for _, _, finished, _ in self._heap):
+            self._heap = [entry for entry in self._heap if entry[2] >= cutoff]
+            heapq.heapify(self._heap)
+    
+    def offer(self, trace: RequestTrace):
+        """Keep a finished request's trace if it is among the slowest in the window"""
+        now = time.monotonic()
+        self._prune(now)
+        entry = (trace.duration_ms, next(self._order), now, trace)
+        if len(self._heap) < self.capacity:
+            heapq.heappush(self._heap, entry)
+        elif trace.duration_ms > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+    
+    def snapshot(self) -> List[Dict]:
+        """Kept traces, slowest first"""
+        self._prune(time.monotonic())
+        return [entry[3].as_dict() for entry in sorted(self._heap, key=lambda entry: -entry[0])]
+
+
+# Global slow-request recorder (fed only when SLOW_TRACE_RECORDER_ENABLED)
+slow_traces = SlowTraceRecorder(settings.SLOW_TRACE_COUNT, settings.SLOW_TRACE_WINDOW_SECONDS)
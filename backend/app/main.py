@@ -4,8 +4,12 @@ from app.config import settings
 from app.core.logging_config import log
 from app.models.ml_models.model_loader import model_manager
 from app.api.middleware import setup_middleware
-from app.api.routes import health, audio, image, chat
+from app.api.routes import health, audio, image, chat, metrics
 from app.utils.file_handlers import cleanup_old_files
+from app.core.executors import shutdown_executors
+from app.services.groq_service import groq_service
+from app.services.session_store import session_store
+from app.services.emotion_handles import emotion_handles
 import asyncio
 
 @asynccontextmanager
@@ -14,9 +18,18 @@ async def lifespan(app: FastAPI):
     try:
         model_manager.load_all_models()
         cleanup_task = asyncio.create_task(periodic_cleanup())
+        pool_task = None
+        if settings.REPLY_POOL_ENABLED:
+            pool_task = asyncio.create_task(groq_service.pool.run(
+                refresh_seconds=settings.REPLY_POOL_REFRESH_SECONDS,
+                idle_check=groq_service.is_idle
+            ))
         yield
     finally:
         cleanup_task.cancel()
+        if pool_task is not None:
+            pool_task.cancel()
+        shutdown_executors()
         log.info("Moodify backend shut down")
 
 async def periodic_cleanup():
@@ -24,6 +37,8 @@ async def periodic_cleanup():
         try:
             await asyncio.sleep(3600)
             cleanup_old_files()
+            await session_store.purge_expired()
+            emotion_handles.purge_expired()
         except asyncio.CancelledError:
             break
         except Exception as e:
@@ -39,6 +54,7 @@ app.include_router(health.router)
 app.include_router(audio.router)
 app.include_router(image.router)
 app.include_router(chat.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
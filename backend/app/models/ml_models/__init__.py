@@ -2,5 +2,6 @@
 ML Models module initialization
 """
 from app.models.ml_models.model_loader import model_manager
+from app.models.ml_models.emotion_vector import EmotionVector, FusedEmotion
 
-__all__ = ['model_manager']
+__all__ = ['model_manager', 'EmotionVector', 'FusedEmotion']
@@ -5,7 +5,11 @@ from transformers import pipeline
 from app.config import settings
 from app.core.logging_config import log
 from app.core.exceptions import ModelLoadError
+from app.core.timing import timed
+from app.utils.fusion_engine import build_label_projection
+from app.models.ml_models.emotion_vector import EmotionVector
 from typing import Dict
+import numpy as np
 import torch
 
 
@@ -14,6 +18,8 @@ class AudioEmotionModel:
     
     def __init__(self):
         self.model = None
+        self.label2id = {}
+        self.label_projection = None
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         log.info(f"Using device: {self.device}")
     
@@ -30,6 +36,11 @@ class AudioEmotionModel:
                 token=settings.HF_TOKEN if settings.HF_TOKEN else None
             )
             
+            # Precompute model label order -> EMOTION_LABELS order once
+            id2label = self.model.model.config.id2label
+            self.label2id = {label: int(idx) for idx, label in id2label.items()}
+            self.label_projection = build_label_projection(id2label)
+            
             log.info("Audio emotion model loaded successfully")
             
         except Exception as e:
@@ -66,6 +77,36 @@ class AudioEmotionModel:
             log.error(f"Audio emotion prediction failed: {str(e)}")
             raise
     
+    def predict_vector(self, audio_path: str) -> EmotionVector:
+        """
+        Predict the full emotion distribution for an audio file
+        
+        Args:
+            audio_path: Path to audio file
+            
+        Returns:
+            EmotionVector in EMOTION_LABELS order
+        """
+        if self.model is None:
+            raise ModelLoadError("Model not loaded. Call load() first.")
+        
+        try:
+            # Ask for every class instead of the pipeline's default top-5
+            with timed("wav2vec2_inference"):
+                predictions = self.model(audio_path, top_k=len(self.label2id))
+            
+            raw = np.zeros(len(self.label2id), dtype=np.float32)
+            for item in predictions:
+                raw[self.label2id[item["label"]]] = item["score"]
+            
+            vector = EmotionVector(raw @ self.label_projection, source="audio")
+            vector.needs_confirmation = vector.confidence < settings.AUDIO_CONFIDENCE_THRESHOLD
+            return vector
+            
+        except Exception as e:
+            log.error(f"Audio emotion prediction failed: {str(e)}")
+            raise
+    
     def is_loaded(self) -> bool:
         """Check if model is loaded"""
         return self.model is not None
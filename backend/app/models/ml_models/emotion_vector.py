@@ -0,0 +1,129 @@
+"""
+Compact internal representation of emotion predictions
+
+Services pass EmotionVector / FusedEmotion objects between each other and
+only convert to the pydantic response models at the API boundary.
+"""
+import numpy as np
+from typing import Dict, Optional, Tuple
+from app.core.constants import EMOTION_LABELS
+from app.models.schemas.emotion import EmotionResponse, EmotionFusionResponse
+from app.utils.fusion_engine import NUM_EMOTIONS, vector_from_dict
+
+
+# Shared label table - every vector points at this one tuple
+LABEL_TABLE: Tuple[str, ...] = tuple(EMOTION_LABELS)
+
+
+def _probs_to_dict(labels: Tuple[str, ...], probs: np.ndarray) -> Dict[str, float]:
+    """Label -> probability dict (rounded, float32 noise is not useful to clients)"""
+    return dict(zip(labels, np.round(probs.astype(np.float64), 6).tolist()))
+
+
+class EmotionVector:
+    """Fixed-order float32 emotion probabilities plus the label table"""
+    
+    __slots__ = ("probs", "labels", "source", "needs_confirmation")
+    
+    def __init__(
+        self,
+        probs: np.ndarray,
+        source: str,
+        needs_confirmation: bool = False,
+        labels: Tuple[str, ...] = LABEL_TABLE
+    ):
+        self.probs = np.asarray(probs, dtype=np.float32)
+        self.labels = labels
+        self.source = source
+        self.needs_confirmation = needs_confirmation
+    
+    @classmethod
+    def from_dict(cls, probabilities: Dict[str, float], source: str) -> "EmotionVector":
+        """Build a vector from a label -> probability dict"""
+        return cls(vector_from_dict(probabilities), source=source)
+    
+    @classmethod
+    def from_label(cls, emotion: str, confidence: float, source: str) -> "EmotionVector":
+        """Build a one-hot vector when only the top label is known"""
+        probs = np.zeros(NUM_EMOTIONS, dtype=np.float32)
+        if emotion in LABEL_TABLE:
+            probs[LABEL_TABLE.index(emotion)] = confidence
+        return cls(probs, source=source)
+    
+    @property
+    def top_index(self) -> int:
+        return int(self.probs.argmax())
+    
+    @property
+    def emotion(self) -> str:
+        return self.labels[self.top_index]
+    
+    @property
+    def confidence(self) -> float:
+        return min(float(self.probs[self.top_index]), 1.0)
+    
+    def top_k(self, k: int = 2) -> Tuple[Tuple[str, float], ...]:
+        """Top-k (label, probability) pairs, most likely first"""
+        order = np.argsort(self.probs)[::-1][:k]
+        return tuple((self.labels[i], float(self.probs[i])) for i in order)
+    
+    def to_dict(self) -> Dict[str, float]:
+        return _probs_to_dict(self.labels, self.probs)
+    
+    def to_response(self) -> EmotionResponse:
+        """Convert to the API response model"""
+        return EmotionResponse(
+            emotion=self.emotion,
+            confidence=round(self.confidence, 6),
+            probabilities=self.to_dict(),
+            needs_confirmation=self.needs_confirmation,
+            source=self.source
+        )
+    
+    def __repr__(self) -> str:
+        return f"EmotionVector({self.emotion}, {self.confidence:.2f}, source={self.source})"
+
+
+class FusedEmotion:
+    """Result of combining an audio vector with an (optional) face vector"""
+    
+    __slots__ = ("emotion", "confidence", "method", "probs", "audio", "face", "face_status")
+    
+    def __init__(
+        self,
+        emotion: str,
+        confidence: float,
+        method: str,
+        probs: np.ndarray,
+        audio: EmotionVector,
+        face: Optional[EmotionVector] = None,
+        face_status: str = "unavailable"
+    ):
+        self.emotion = emotion
+        self.confidence = confidence
+        self.method = method
+        self.probs = probs
+        self.audio = audio
+        self.face = face
+        self.face_status = face_status
+    
+    def to_response(self) -> EmotionFusionResponse:
+        """Convert to the API response model"""
+        if self.face is not None:
+            face_response = self.face.to_response()
+        else:
+            face_response = EmotionResponse(
+                emotion=self.face_status,
+                confidence=0.0,
+                probabilities={},
+                needs_confirmation=False,
+                source="face"
+            )
+        return EmotionFusionResponse(
+            final_emotion=self.emotion,
+            confidence=round(float(self.confidence), 6),
+            audio_emotion=self.audio.to_response(),
+            face_emotion=face_response,
+            fusion_method=self.method,
+            probabilities=_probs_to_dict(LABEL_TABLE, self.probs)
+        )
@@ -2,7 +2,7 @@
 Pydantic schemas for chat functionality
 """
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, Dict, List
 from app.models.schemas.emotion import EmotionResponse, EmotionFusionResponse
 
 
@@ -10,7 +10,9 @@ class ChatRequest(BaseModel):
     """Request model for chat"""
     message: Optional[str] = Field(None, description="Optional text message")
     emotion_context: Optional[str] = Field(None, description="Detected emotion context")
-    conversation_history: Optional[list] = Field(default_factory=list, description="Previous messages")
+    emotion_handle: Optional[str] = Field(None, description="Handle from a detection endpoint (overrides emotion_context)")
+    session_id: Optional[str] = Field(None, description="Conversation session id from a previous response")
+    conversation_history: Optional[list] = Field(default_factory=list, description="Deprecated: previous messages (use session_id)")
 
 
 class ChatResponse(BaseModel):
@@ -18,6 +20,9 @@ class ChatResponse(BaseModel):
     message: str = Field(..., description="AI generated response")
     emotion_detected: Optional[str] = Field(None, description="Emotion that was detected")
     strategy_used: Optional[str] = Field(None, description="Response strategy applied")
+    session_id: Optional[str] = Field(None, description="Session id to send with the next turn")
+    model_tier: Optional[str] = Field(None, description="What served the reply: large, fast, cache or pool")
+    degradations: List[str] = Field(default_factory=list, description="Shortcuts taken to meet the request deadline (e.g. face_skipped, fast_tier)")
 
 
 class AudioChatRequest(BaseModel):
@@ -46,3 +51,6 @@ class MultimodalChatResponse(BaseModel):
     """Response when both audio and image are provided"""
     emotion: EmotionFusionResponse
     chat_response: ChatResponse
+    stages_run: List[str] = Field(default_factory=list, description="Pipeline stages that actually ran")
+    timings: Dict[str, float] = Field(default_factory=dict, description="Per-stage timing breakdown in milliseconds")
+    speculation: Optional[str] = Field(None, description="Speculative reply outcome: win, win_second or miss (None when off)")
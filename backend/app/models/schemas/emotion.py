@@ -12,6 +12,7 @@ class EmotionResponse(BaseModel):
     probabilities: Dict[str, float] = Field(default_factory=dict, description="Emotion probabilities")
     needs_confirmation: bool = Field(default=False, description="Whether face confirmation is needed")
     source: str = Field(..., description="Detection source: audio or face")
+    handle: Optional[str] = Field(None, description="Result handle chat endpoints accept instead of the file")
 
 
 class EmotionFusionResponse(BaseModel):
@@ -21,3 +22,4 @@ class EmotionFusionResponse(BaseModel):
     audio_emotion: EmotionResponse
     face_emotion: EmotionResponse
     fusion_method: str = Field(..., description="How emotions were combined")
+    probabilities: Dict[str, float] = Field(default_factory=dict, description="Fused emotion probabilities")
@@ -1,54 +1,269 @@
+import asyncio
 import os
+import hashlib
 import librosa
-import numpy as np
-import json
-from groq import Groq
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
 from app.config import settings
+from app.models.ml_models.model_loader import model_manager
+from app.models.ml_models.emotion_vector import EmotionVector
+from app.core.executors import audio_executor, io_executor, run_in_executor
+from app.core.exceptions import EmotionDetectionError
+from app.core.logging_config import log
+from app.core.metrics import metrics
+from app.core.constants import AUDIO_SAMPLE_RATE
+from app.core.timing import StageTimer, timed
+from app.core.singleflight import SingleFlight
+from app.core.resilience import resilient_caller
+from app.core.rate_limiter import whisper_limiter
+from app.services.llm_providers import llm_provider
+from app.services.response_generator import response_generator
+from app.utils.acoustic_features import feature_engine
+from app.utils.fusion_engine import mix_sources
+from app.utils.local_emotion import acoustic_emotion_vector, arousal_from_features, text_emotion_vector
+
+# Acoustic features the local labeler and voice_tone use
+VOICE_FEATURES = (
+    "rms_mean", "rms_std", "zcr_mean", "pitch_mean", "pitch_std",
+    "voiced_fraction", "speaking_rate", "duration",
+)
 
 class AudioEmotionService:
     def __init__(self):
-        # Groq client initializing using settings
-        self.client = Groq(api_key=settings.GROQ_API_KEY)
-
-    async def detect_emotion_and_respond(self, audio_path: str):
-        # 1. Word Analysis (Transcription)
-        with open(audio_path, "rb") as file:
-            transcription = self.client.audio.transcriptions.create(
-                file=(audio_path, file.read()),
-                model="whisper-large-v3",
-                response_format="text",
-            )
+        # LLM_PROVIDER se chat + transcription backend (default Groq)
+        self.provider = llm_provider
+        # Same clip bytes ek hi Whisper call share karte hain
+        self.transcriptions = SingleFlight("transcription")
+        # Whisper ka apna deadline/hedge/breaker
+        self.whisper_calls = resilient_caller("groq_whisper")
+        # Label local signals se, upstream sirf reply ke liye
+        self.source_weights = (
+            settings.LOCAL_EMOTION_MODEL_WEIGHT,
+            settings.LOCAL_EMOTION_TEXT_WEIGHT,
+            settings.LOCAL_EMOTION_ACOUSTIC_WEIGHT
+        )
+    
+    async def detect_emotion(self, audio_path: str) -> EmotionVector:
+        """
+        Detect emotion from audio using the local wav2vec2 model
+        
+        Args:
+            audio_path: Path to audio file
+        
+        Returns:
+            EmotionVector (call to_response() at the API boundary)
+        """
+        try:
+            audio_model = model_manager.get_audio_model()
+            # Inference blocks, so it runs on the audio pool
+            vector = await run_in_executor(audio_executor, audio_model.predict_vector, audio_path)
+        except Exception as e:
+            log.error(f"Audio emotion detection failed: {str(e)}")
+            raise EmotionDetectionError(f"Audio emotion detection failed: {str(e)}")
         
-        # 2. Voice Tone Analysis (Acoustic Analysis)
-        # Librosa load karke pitch aur loudness nikalte hain
-        y, sr = librosa.load(audio_path)
-        energy = np.mean(librosa.feature.rms(y=y))
+        log.info(f"Detected audio emotion: {vector.emotion} (confidence: {vector.confidence:.2f})")
+        return vector
+    
+    async def transcribe(self, audio_path: str) -> str:
+        """
+        Transcribe a clip with Whisper
+        
+        Concurrent uploads of byte-identical clips share one upstream call.
         
-        # Voice energy se tone determine karna
-        voice_tone = "energetic/loud" if energy > 0.05 else "calm/soft"
+        Args:
+            audio_path: Path to audio file
         
-        # 3. Hybrid Analysis using LLM (Llama 3.1)
-        # Hum words aur voice tone dono Llama ko bhej rahe hain
-        prompt = f"""
-        User said: '{transcription}'
-        User's voice tone: {voice_tone}
+        Returns:
+            Transcript text
+        """
+        # File read bhi I/O pool pe, event loop block nahi hota
+        content = await run_in_executor(io_executor, self._read_clip, audio_path)
         
-        Task: Analyze both words and tone to find the emotion. Respond as Goku.
-        Format: JSON only with keys 'emotion' and 'reply'.
+        async def call() -> str:
+            await whisper_limiter.acquire()
+            return await self.whisper_calls.call(lambda: self.provider.transcribe(
+                os.path.basename(audio_path),
+                content,
+                model=settings.LLM_TRANSCRIPTION_MODEL
+            ), hedge_gate=whisper_limiter.try_acquire)
+        
+        if not settings.TRANSCRIPTION_COALESCE_ENABLED:
+            return await call()
+        key = hashlib.sha256(content).hexdigest()
+        return await self.transcriptions.do(key, call)
+    
+    @staticmethod
+    def _read_clip(audio_path: str) -> bytes:
+        """Read the clip bytes for upload (blocking; runs on the file I/O pool)"""
+        with open(audio_path, "rb") as file:
+            return file.read()
+    
+    @staticmethod
+    def _acoustic_features(audio_path: str) -> Dict[str, float]:
+        """Loudness, zero-crossing, pitch and pacing features (blocking; runs on the audio pool)"""
+        # Ek hi framing/FFT se saare features (AcousticFeatureEngine)
+        with timed("audio_decode"):
+            y, _ = librosa.load(audio_path, sr=AUDIO_SAMPLE_RATE)
+        vector = feature_engine.extract(y)
+        return feature_engine.as_dict(vector, VOICE_FEATURES)
+    
+    def classify_local(
+        self,
+        model_vector: Optional[EmotionVector],
+        features: Optional[Dict[str, float]],
+        transcript: Optional[str] = None
+    ) -> Tuple[EmotionVector, Dict[str, float]]:
         """
+        Label a clip from local signals only (no upstream call)
         
-        chat_completion = self.client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama-3.3-70b-versatile",
-            response_format={"type": "json_object"}
+        Mixes the wav2vec2 probabilities, the transcript lexicon and the
+        acoustic arousal prior with LOCAL_EMOTION_*_WEIGHT; missing signals
+        drop out and the rest are renormalized.
+        
+        Args:
+            model_vector: wav2vec2 emotion (None if the model is unavailable)
+            features: Acoustic features (None if extraction failed)
+            transcript: Optional transcript for the lexicon
+        
+        Returns:
+            (EmotionVector with source "local", effective weight per signal)
+        """
+        sources = (
+            model_vector.probs if model_vector is not None else None,
+            text_emotion_vector(transcript),
+            acoustic_emotion_vector(features) if features else None,
         )
+        mixed, weights = mix_sources(sources, self.source_weights)
+        if mixed is None:
+            vector = EmotionVector.from_label("neutral", 0.0, source="local")
+        else:
+            vector = EmotionVector(mixed, source="local")
+        used = {
+            name: round(float(weight), 3)
+            for name, weight in zip(("wav2vec2", "text", "acoustic"), weights)
+            if weight > 0
+        }
+        return vector, used
+    
+    def _local_stages(self, audio_path: str, timer: StageTimer) -> List[Awaitable]:
+        """Acoustic features + wav2vec2 stage coroutines, ready for asyncio.gather"""
+        # Voice features - CPU bound, audio pool pe
+        async def acoustic_stage() -> Optional[Dict[str, float]]:
+            with timer.stage("acoustic"):
+                try:
+                    return await run_in_executor(audio_executor, self._acoustic_features, audio_path)
+                except Exception as e:
+                    log.warning(f"Acoustic feature extraction failed: {str(e)}")
+                    return None
+        
+        # Local wav2vec2 emotion - already loaded model, koi network nahi
+        async def model_stage() -> Optional[EmotionVector]:
+            with timer.stage("wav2vec2"):
+                try:
+                    return await self.detect_emotion(audio_path)
+                except EmotionDetectionError:
+                    return None
         
-        result = json.loads(chat_completion.choices[0].message.content)
+        return [acoustic_stage(), model_stage()]
+    
+    @staticmethod
+    def _emotion_payload(
+        vector: EmotionVector,
+        used: Dict[str, float],
+        features: Optional[Dict[str, float]]
+    ) -> Dict[str, Any]:
+        payload = {
+            "label": vector.emotion,
+            "confidence": round(vector.confidence, 6),
+            "probabilities": vector.to_dict(),
+            "sources": used,
+        }
+        if features:
+            payload["voice_tone"] = "energetic/loud" if arousal_from_features(features) > 0.5 else "calm/soft"
+        return payload
+    
+    @staticmethod
+    def _reply_persona(voice_tone: Optional[str]) -> str:
+        """Goku persona for /audio/detect-emotion replies, with the detected voice tone"""
+        persona = "Respond as Goku: upbeat, encouraging and ready to train."
+        if voice_tone:
+            persona += f"\nUser's voice tone: {voice_tone}"
+        return persona
+    
+    async def detect_emotion_local(self, audio_path: str, transcript: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Label a clip without any upstream call
+        
+        Args:
+            audio_path: Path to audio file
+            transcript: Optional client-side transcript for the lexicon
+        
+        Returns:
+            Emotion payload and per-stage timings (ms)
+        """
+        timer = StageTimer()
+        with timer.stage("parallel"):
+            features, vector = await asyncio.gather(*self._local_stages(audio_path, timer))
+        with timer.stage("labeling"):
+            emotion, used = self.classify_local(vector, features, transcript)
+        metrics.increment("local_emotion_labeled")
+        return {
+            "emotion": self._emotion_payload(emotion, used, features),
+            "timings": timer.as_dict()
+        }
+    
+    async def detect_emotion_and_respond(self, audio_path: str):
+        """
+        Transcribe, label and reply to a voice clip
+        
+        The Whisper upload and the local analysis (acoustics + wav2vec2) run
+        concurrently. The emotion label is computed locally; the LLM is only
+        used for the reply.
+        
+        Args:
+            audio_path: Path to audio file
+        
+        Returns:
+            Transcript, emotion, chat response and per-stage timings (ms)
+        """
+        timer = StageTimer()
+        
+        # 1. Word Analysis (Transcription) - network bound
+        async def transcription_stage() -> str:
+            with timer.stage("transcription"):
+                try:
+                    return await self.transcribe(audio_path)
+                except Exception as e:
+                    # Whisper slow/down ho (SDK ya httpx errors bhi) to sirf voice se kaam chalao
+                    log.warning(f"Transcription unavailable, labeling from voice only: {str(e)}")
+                    return ""
+        
+        # 2. Voice tone + wav2vec2, transcription ke saath parallel
+        with timer.stage("parallel"):
+            transcription, features, vector = await asyncio.gather(
+                transcription_stage(), *self._local_stages(audio_path, timer)
+            )
+        
+        # 3. Local labeling: model + words + tone, koi LLM nahi
+        with timer.stage("labeling"):
+            emotion, used = self.classify_local(vector, features, transcription)
+        metrics.increment("local_emotion_labeled")
+        
+        payload = self._emotion_payload(emotion, used, features)
+        
+        # 4. LLM sirf reply banata hai, Goku ki awaaz mein + voice tone context
+        # (fallback reply built in hai)
+        with timer.stage("llm"):
+            chat_response = await response_generator.generate_response(
+                emotion=emotion.emotion,
+                user_message=transcription or None,
+                persona=self._reply_persona(payload.get("voice_tone"))
+            )
         
         return {
             "transcript": transcription,
-            "emotion": {"label": result.get("emotion", "neutral")},
-            "chat_response": {"message": result.get("reply", "I'm ready to train!")}
+            "emotion": payload,
+            "chat_response": chat_response.model_dump(),
+            "timings": timer.as_dict()
         }
 
 # Instance creation for routes to use
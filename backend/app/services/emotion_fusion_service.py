@@ -1,19 +1,88 @@
 """
 Emotion fusion service - combines audio and face emotions
 """
-from app.models.schemas.emotion import EmotionResponse, EmotionFusionResponse
-from app.utils.emotion_mapping import combine_emotions
+from app.models.ml_models.emotion_vector import EmotionVector, FusedEmotion
+from app.utils.fusion_engine import FusionEngine, BatchFusionResult
 from app.core.logging_config import log
+from app.core.metrics import metrics
+from app.config import settings
+import numpy as np
 
 
 class EmotionFusionService:
     """Service for combining emotions from multiple sources"""
     
+    def __init__(self):
+        self.engine = FusionEngine(
+            audio_weight=settings.FUSION_AUDIO_WEIGHT,
+            face_weight=settings.FUSION_FACE_WEIGHT,
+            dominance_margin=settings.FUSION_DOMINANCE_MARGIN
+        )
+    
+    def should_consult_face(self, audio_emotion: EmotionVector) -> bool:
+        """
+        Cascade policy: decide whether face detection is worth running
+        
+        Audio is the primary signal. When its confidence clears
+        AUDIO_CONFIDENCE_THRESHOLD the face branch (detection + CNN) is
+        skipped entirely; only ambiguous audio is sent for face confirmation.
+        
+        Args:
+            audio_emotion: Emotion from audio
+            
+        Returns:
+            True if the face model should be consulted
+        """
+        if not settings.EMOTION_CASCADE_ENABLED:
+            return True
+        
+        if audio_emotion.confidence >= settings.AUDIO_CONFIDENCE_THRESHOLD:
+            metrics.increment("cascade_audio_decisive")
+            log.info(
+                f"Audio decisive ({audio_emotion.confidence:.2f} >= "
+                f"{settings.AUDIO_CONFIDENCE_THRESHOLD}), skipping face detection"
+            )
+            return False
+        
+        if not settings.REQUEST_FACE_CONFIRMATION:
+            metrics.increment("cascade_face_confirmation_disabled")
+            return False
+        
+        metrics.increment("cascade_face_consulted")
+        return True
+    
+    def audio_only(
+        self,
+        audio_emotion: EmotionVector,
+        fusion_method: str,
+        face_status: str = "unavailable"
+    ) -> FusedEmotion:
+        """
+        Build a fusion result from audio alone (face skipped or unavailable)
+        
+        Args:
+            audio_emotion: Emotion from audio
+            fusion_method: Reason the face branch did not contribute
+            face_status: Placeholder label reported for the face emotion
+            
+        Returns:
+            FusedEmotion with the audio emotion as the final result
+        """
+        metrics.increment(f"fusion_{fusion_method}")
+        return FusedEmotion(
+            emotion=audio_emotion.emotion,
+            confidence=audio_emotion.confidence,
+            method=fusion_method,
+            probs=audio_emotion.probs,
+            audio=audio_emotion,
+            face_status=face_status
+        )
+    
     async def fuse_emotions(
         self,
-        audio_emotion: EmotionResponse,
-        face_emotion: EmotionResponse
-    ) -> EmotionFusionResponse:
+        audio_emotion: EmotionVector,
+        face_emotion: EmotionVector
+    ) -> FusedEmotion:
         """
         Fuse audio and face emotions into a single determination
         
@@ -22,42 +91,55 @@ class EmotionFusionService:
             face_emotion: Emotion from face
             
         Returns:
-            EmotionFusionResponse with combined result
+            FusedEmotion with combined result (call to_response() at the API boundary)
         """
         try:
             log.info("Fusing audio and face emotions")
             
-            # Combine emotions
-            final_emotion, final_confidence, fusion_method = combine_emotions(
-                audio_emotion=audio_emotion.emotion,
-                face_emotion=face_emotion.emotion,
-                audio_confidence=audio_emotion.confidence,
-                face_confidence=face_emotion.confidence
-            )
+            # Fuse full probability vectors
+            result = self.engine.fuse(audio_emotion.probs, face_emotion.probs)
             
             log.info(
-                f"Fusion result: {final_emotion} (confidence: {final_confidence:.2f}, "
-                f"method: {fusion_method})"
+                f"Fusion result: {result.emotion} (confidence: {result.confidence:.2f}, "
+                f"method: {result.method})"
             )
+            metrics.increment(f"fusion_{result.method}")
+            if face_emotion.confidence < settings.FACE_CONFIDENCE_THRESHOLD:
+                metrics.increment("cascade_face_low_confidence")
             
-            return EmotionFusionResponse(
-                final_emotion=final_emotion,
-                confidence=final_confidence,
-                audio_emotion=audio_emotion,
-                face_emotion=face_emotion,
-                fusion_method=fusion_method
+            return FusedEmotion(
+                emotion=result.emotion,
+                confidence=result.confidence,
+                method=result.method,
+                probs=result.probabilities,
+                audio=audio_emotion,
+                face=face_emotion
             )
             
         except Exception as e:
             log.error(f"Emotion fusion failed: {str(e)}")
             # Fallback to audio emotion if fusion fails
-            return EmotionFusionResponse(
-                final_emotion=audio_emotion.emotion,
+            return FusedEmotion(
+                emotion=audio_emotion.emotion,
                 confidence=audio_emotion.confidence,
-                audio_emotion=audio_emotion,
-                face_emotion=face_emotion,
-                fusion_method="fallback_audio"
+                method="fallback_audio",
+                probs=audio_emotion.probs,
+                audio=audio_emotion,
+                face=face_emotion
             )
+    
+    def fuse_batch(self, audio_probs: np.ndarray, face_probs: np.ndarray) -> BatchFusionResult:
+        """
+        Fuse many audio/face probability pairs at once (offline analysis)
+        
+        Args:
+            audio_probs: (N, 7) audio probabilities in EMOTION_LABELS order
+            face_probs: (N, 7) face probabilities in EMOTION_LABELS order
+            
+        Returns:
+            BatchFusionResult with per-row emotion, confidence and method codes
+        """
+        return self.engine.fuse_batch(audio_probs, face_probs)
 
 
 # Global service instance
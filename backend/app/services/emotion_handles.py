@@ -0,0 +1,107 @@
+"""
+Short-lived handles for emotion detection results
+
+Detection endpoints store their result and return an opaque handle; chat
+endpoints accept the handle in place of the media, so a clip or photo that
+was just analysed is not uploaded, decoded and run through the model again.
+Handles live in process memory (LRU + TTL), so with several workers the
+chat call must reach the worker that issued the handle (sticky sessions).
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from app.config import settings
+from app.core.exceptions import EmotionHandleError
+from app.core.metrics import metrics
+from app.models.ml_models.emotion_vector import EmotionVector
+
+
+HANDLE_PREFIX = "emo_"
+
+
+class _HandleEntry:
+    __slots__ = ("vector", "kind", "created_at")
+    
+    def __init__(self, vector: EmotionVector, kind: str):
+        self.vector = vector
+        self.kind = kind
+        self.created_at = time.monotonic()
+
+
+class EmotionHandleStore:
+    """LRU + TTL map from handle to a detected EmotionVector"""
+    
+    def __init__(self, max_handles: int = 5000, ttl_seconds: float = 300):
+        self.max_handles = max_handles
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _HandleEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def put(self, vector: EmotionVector, kind: str) -> str:
+        """
+        Store a detection result
+        
+        Args:
+            vector: Detected emotion
+            kind: Media it came from ("audio" or "face")
+        
+        Returns:
+            Handle to pass to a chat endpoint
+        """
+        handle = HANDLE_PREFIX + secrets.token_urlsafe(12)
+        with self._lock:
+            self._entries[handle] = _HandleEntry(vector, kind)
+            while len(self._entries) > self.max_handles:
+                self._entries.popitem(last=False)
+        metrics.increment("emotion_handles_issued")
+        return handle
+    
+    def get(self, handle: str, kind: Optional[str] = None) -> EmotionVector:
+        """
+        Look up a stored detection result
+        
+        Args:
+            handle: Handle returned by a detection endpoint
+            kind: Required media kind ("audio" or "face"), None for any
+        
+        Returns:
+            The stored EmotionVector
+        
+        Raises:
+            EmotionHandleError: Unknown, expired or of the wrong kind
+        """
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is not None and time.monotonic() - entry.created_at > self.ttl_seconds:
+                del self._entries[handle]
+                entry = None
+        if entry is None:
+            metrics.increment("emotion_handles_missed")
+            raise EmotionHandleError(f"Emotion handle {handle!r} is unknown or expired; upload the media again")
+        if kind is not None and entry.kind != kind:
+            raise EmotionHandleError(f"Emotion handle {handle!r} holds a {entry.kind} result, not {kind}", status_code=400)
+        metrics.increment("emotion_handles_reused")
+        return entry.vector
+    
+    def purge_expired(self) -> int:
+        """Drop expired handles, returning how many were removed"""
+        cutoff = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            expired = [h for h, entry in self._entries.items() if entry.created_at < cutoff]
+            for handle in expired:
+                del self._entries[handle]
+        return len(expired)
+    
+    def stats(self) -> Dict:
+        """Live handle count"""
+        with self._lock:
+            return {"handles": len(self._entries), "ttl_seconds": self.ttl_seconds}
+
+
+# Global store instance
+emotion_handles = EmotionHandleStore(
+    max_handles=settings.EMOTION_HANDLE_MAX,
+    ttl_seconds=settings.EMOTION_HANDLE_TTL_SECONDS
+)
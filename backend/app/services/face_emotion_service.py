@@ -3,13 +3,13 @@ Face emotion detection service
 """
 import torch
 from app.models.ml_models.model_loader import model_manager
-from app.models.schemas.emotion import EmotionResponse
+from app.models.ml_models.emotion_vector import EmotionVector
 from app.utils.image_processing import process_image_for_emotion
-from app.core.constants import EMOTION_LABELS
 from app.core.logging_config import log
+from app.core.timing import timed
 from app.core.exceptions import EmotionDetectionError, ImageProcessingError
+from app.core.executors import face_executor, run_in_executor
 from app.config import settings
-from typing import Dict
 
 
 class FaceEmotionService:
@@ -24,19 +24,25 @@ class FaceEmotionService:
         if self.model is None:
             log.warning("CNN model not available - face emotion detection disabled")
     
-    async def detect_emotion(self, image_path: str) -> EmotionResponse:
+    async def detect_emotion(self, image_path: str) -> EmotionVector:
         """
         Detect emotion from face image
         
+        Face detection and CNN inference block, so they run on the face pool.
+        
         Args:
             image_path: Path to image file
             
         Returns:
-            EmotionResponse object
+            EmotionVector (call to_response() at the API boundary)
             
         Raises:
             EmotionDetectionError: If CNN model is not available
         """
+        return await run_in_executor(face_executor, self._detect_emotion_sync, image_path)
+    
+    def _detect_emotion_sync(self, image_path: str) -> EmotionVector:
+        """Blocking face detection + CNN inference"""
         try:
             if self.model is None:
                 self.initialize()
@@ -51,7 +57,8 @@ class FaceEmotionService:
             log.info(f"Detecting emotion from image: {image_path}")
             
             # Process image and detect face
-            face_tensor, face_detected, coordinates = process_image_for_emotion(image_path)
+            with timed("face_detector"):
+                face_tensor, face_detected, coordinates = process_image_for_emotion(image_path)
             
             if not face_detected:
                 raise ImageProcessingError("No face detected in image")
@@ -59,37 +66,22 @@ class FaceEmotionService:
             log.info(f"Face detected at coordinates: {coordinates}")
             
             # Predict emotion
-            probabilities = self.model.predict(face_tensor)
-            
-            # Convert to numpy and get predictions
-            probs_numpy = probabilities.cpu().numpy()[0]
-            
-            # Get top emotion
-            top_emotion_idx = probs_numpy.argmax()
-            top_emotion = EMOTION_LABELS[top_emotion_idx]
-            confidence = float(probs_numpy[top_emotion_idx])
+            with timed("cnn_inference"):
+                probabilities = self.model.predict(face_tensor)
             
-            # Create probabilities dict
-            emotion_probs = {
-                EMOTION_LABELS[i]: float(probs_numpy[i])
-                for i in range(len(EMOTION_LABELS))
-            }
+            # Fixed-order probabilities straight from the CNN output
+            vector = EmotionVector(probabilities.cpu().numpy()[0], source="face")
+            confidence = vector.confidence
             
-            log.info(f"Detected emotion: {top_emotion} (confidence: {confidence:.2f})")
+            log.info(f"Detected emotion: {vector.emotion} (confidence: {confidence:.2f})")
             
             # Check if confidence is too low
-            needs_confirmation = confidence < settings.FACE_CONFIDENCE_THRESHOLD
+            vector.needs_confirmation = confidence < settings.FACE_CONFIDENCE_THRESHOLD
             
-            if needs_confirmation:
+            if vector.needs_confirmation:
                 log.warning(f"Low confidence ({confidence:.2f}) for face emotion")
             
-            return EmotionResponse(
-                emotion=top_emotion,
-                confidence=confidence,
-                probabilities=emotion_probs,
-                needs_confirmation=needs_confirmation,
-                source="face"
-            )
+            return vector
             
         except ImageProcessingError:
             raise
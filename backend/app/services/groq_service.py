@@ -1,85 +1,291 @@
 """
 Groq API service for generating responses
 """
-from groq import Groq
+import hashlib
+import time
 from app.config import settings
 from app.core.logging_config import log
+from app.core.timing import observe_stage
 from app.core.exceptions import GroqAPIError
 from app.utils.prompt_templates import create_system_prompt, create_user_prompt
-from typing import List, Dict, Optional
+from app.core.singleflight import SingleFlight
+from app.core.resilience import resilient_caller
+from app.core.rate_limiter import chat_limiter, PRIORITY_BACKGROUND
+from app.utils.token_budget import estimate_tokens, message_tokens
+from app.services.response_cache import ResponseCache
+from app.services.reply_pool import ReplyPool
+from app.services.history_compactor import HistoryCompactor
+from app.services.llm_providers import LLMProvider, llm_provider
+from app.services.model_router import RouteDecision, create_router, response_tier, target_max_tokens
+from typing import AsyncIterator, List, Dict, Optional
 
 
 class GroqService:
     """Service for Groq API interactions"""
     
-    def __init__(self):
-        self.client = None
-        self.model = "llama-3.1-70b-versatile"  # or mixtral-8x7b-32768
+    def __init__(self, provider: Optional[LLMProvider] = None):
+        # Chat backend selected by LLM_PROVIDER (Groq by default)
+        self.provider = provider or llm_provider
+        self.model = settings.LLM_CHAT_MODEL
+        self.top_p = 0.9
+        self.cache = ResponseCache(
+            max_keys=settings.LLM_CACHE_MAX_KEYS,
+            variants_per_key=settings.LLM_CACHE_VARIANTS,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS
+        )
+        # Deadlines, hedging and circuit breaking for every chat call (per model tier)
+        self.resilience = resilient_caller("groq_chat")
+        self.fast_resilience = resilient_caller("groq_chat_fast")
+        # History summaries and pool refills get their own callers, so background
+        # traffic never skews the live-chat latency stats and breaker
+        self.summary_calls = resilient_caller("groq_summary")
+        self.pool_calls = resilient_caller("groq_pool_refill")
+        # Large vs fast model per request, from load, latency and deadline
+        self.router = create_router("chat_router", self.model, self.resilience, self.fast_resilience, chat_limiter)
+        # Concurrent identical completions share one upstream call
+        self.inflight = SingleFlight("llm", key_fn=self.cache.make_key)
+        # Pre-generated no-message replies, filled in the background
+        self.pool = ReplyPool(
+            generate=self._generate_pool_reply,
+            size=settings.REPLY_POOL_SIZE,
+            low_watermark=settings.REPLY_POOL_LOW_WATERMARK,
+            max_uses=settings.REPLY_POOL_MAX_USES,
+            max_age_seconds=settings.REPLY_POOL_MAX_AGE_SECONDS,
+            token_budget=settings.REPLY_POOL_TOKEN_BUDGET,
+            budget_window_seconds=settings.REPLY_POOL_BUDGET_WINDOW_SECONDS,
+            reply_tokens=settings.REPLY_POOL_REPLY_TOKENS
+        )
+        self.last_request_at = 0.0
+        # Long histories are cut to a token budget plus a rolling summary
+        self.compactor = HistoryCompactor(
+            summarize=self._summarize_history,
+            token_budget=settings.HISTORY_TOKEN_BUDGET,
+            summary_tokens=settings.HISTORY_SUMMARY_TOKENS
+        )
     
-    def initialize(self):
-        """Initialize Groq client"""
-        try:
-            self.client = Groq(api_key=settings.GROQ_API_KEY)
-            log.info("Groq client initialized")
-        except Exception as e:
-            log.error(f"Failed to initialize Groq client: {str(e)}")
-            raise GroqAPIError(f"Groq initialization failed: {str(e)}")
+    def _build_messages(
+        self,
+        emotion: str,
+        user_message: Optional[str] = None,
+        conversation_history: Optional[List[Dict]] = None,
+        session_id: Optional[str] = None,
+        persona: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Build the chat messages array for a request
+        
+        History is fitted into HISTORY_TOKEN_BUDGET; older turns are replaced
+        by a rolling summary.
+        
+        Args:
+            emotion: Detected emotion
+            user_message: Optional user message
+            conversation_history: Optional previous messages
+            session_id: Optional session id (keys the summary cache)
+            persona: Optional extra system instructions
+            
+        Returns:
+            List of role/content messages
+        """
+        start = time.perf_counter()
+        
+        # Create prompts
+        system_prompt = create_system_prompt(emotion, persona)
+        user_prompt = create_user_prompt(user_message, emotion)
+        
+        # Build messages array
+        messages = [
+            {"role": "system", "content": system_prompt}
+        ]
+        
+        # Add conversation history if provided
+        if conversation_history:
+            namespace = session_id or hashlib.sha1(
+                str(conversation_history[0].get("content", "")).encode("utf-8")
+            ).hexdigest()
+            recent, summary = self.compactor.compact(conversation_history, namespace)
+            if summary:
+                messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+            messages.extend(recent)
+        
+        # Add current user message
+        messages.append({"role": "user", "content": user_prompt})
+        
+        observe_stage("prompt_build", start, time.perf_counter() - start)
+        return messages
+    
+    async def _summarize_history(self, previous_summary: Optional[str], turns: List[Dict]) -> str:
+        """Fold turns that left the history window into the rolling summary"""
+        transcript = "\n".join(f"{m.get('role', 'user')}: {m.get('content', '')}" for m in turns)
+        prompt = (
+            "Update the summary of this conversation between a user and a supportive chatbot. "
+            "Keep facts about the user, their feelings and open topics. Reply with the summary only.\n\n"
+            f"Current summary: {previous_summary or '(none)'}\n\nNew turns:\n{transcript}"
+        )
+        await chat_limiter.acquire(
+            estimate_tokens(prompt) + settings.HISTORY_SUMMARY_TOKENS,
+            priority=PRIORITY_BACKGROUND
+        )
+        summary = await self.summary_calls.call(lambda: self.provider.chat(
+            [{"role": "user", "content": prompt}],
+            model=settings.HISTORY_SUMMARY_MODEL,
+            max_tokens=settings.HISTORY_SUMMARY_TOKENS,
+            temperature=0.2,
+        ), hedge=False)
+        return summary.strip()
+    
+    @staticmethod
+    def _estimate_tokens(messages: List[Dict], max_tokens: int) -> int:
+        """Prompt plus maximum completion tokens, charged against the TPM budget"""
+        return sum(message_tokens(m) for m in messages) + max_tokens
+    
+    def _route(self, emotion: str, messages: List[Dict], max_tokens: Optional[int]) -> RouteDecision:
+        """Model tier and completion length for a request"""
+        if max_tokens is None:
+            max_tokens = target_max_tokens(emotion)
+        return self.router.route(self._estimate_tokens(messages, 0), max_tokens)
+    
+    def _request_key(self, messages: List[Dict], route: RouteDecision, temperature: float) -> str:
+        """Key identifying a completion request (messages plus generation params)"""
+        return self.inflight.key(
+            messages,
+            model=route.model,
+            max_tokens=route.max_tokens,
+            temperature=temperature,
+            top_p=self.top_p
+        )
+    
+    def _cache_key(self, messages: List[Dict], route: RouteDecision, temperature: float) -> Optional[str]:
+        """Response cache key for a request (None when caching is disabled)"""
+        if not settings.LLM_CACHE_ENABLED:
+            return None
+        return self._request_key(messages, route, temperature)
+    
+    async def _complete(self, messages: List[Dict], route: RouteDecision, temperature: float) -> str:
+        """
+        Make a non-streaming completion call, coalescing identical in-flight requests
+        
+        The shared call also fills the cache, so a burst of N identical
+        requests stores one variant rather than N copies of it.
+        
+        Args:
+            messages: Chat messages
+            route: Model tier, its caller and max_tokens
+            temperature: Temperature for generation
+            
+        Returns:
+            Completion text
+        """
+        request_key = self._request_key(messages, route, temperature)
+        
+        tokens = self._estimate_tokens(messages, route.max_tokens)
+        
+        async def call() -> str:
+            await chat_limiter.acquire(tokens)
+            response = await route.caller.call(
+                lambda: self.provider.chat(
+                    messages,
+                    model=route.model,
+                    max_tokens=route.max_tokens,
+                    temperature=temperature,
+                    top_p=self.top_p,
+                ),
+                # Only hedge with spare rate budget, never by queueing
+                hedge_gate=lambda: chat_limiter.try_acquire(tokens)
+            )
+            if settings.LLM_CACHE_ENABLED:
+                self.cache.put(request_key, response)
+            return response
+        
+        if not settings.LLM_COALESCE_ENABLED:
+            return await call()
+        return await self.inflight.do(request_key, call)
+    
+    def _pooled_reply(
+        self,
+        emotion: str,
+        user_message: Optional[str],
+        conversation_history: Optional[List[Dict]],
+        persona: Optional[str] = None
+    ) -> Optional[str]:
+        """Pre-generated reply for the no-message case (None if not applicable)"""
+        # Pool replies use the default prompt, so they can't stand in for a persona
+        if not settings.REPLY_POOL_ENABLED or user_message or conversation_history or persona:
+            return None
+        return self.pool.take(emotion)
+    
+    def is_idle(self) -> bool:
+        """True when no user-facing generation started recently"""
+        return time.monotonic() - self.last_request_at >= settings.REPLY_POOL_IDLE_SECONDS
+    
+    async def _generate_pool_reply(self, emotion: str) -> str:
+        """Fresh no-message reply for the reply pool (bypasses cache and coalescing)"""
+        messages = self._build_messages(emotion)
+        await chat_limiter.acquire(
+            self._estimate_tokens(messages, settings.REPLY_POOL_REPLY_TOKENS),
+            priority=PRIORITY_BACKGROUND
+        )
+        return await self.pool_calls.call(lambda: self.provider.chat(
+            messages,
+            model=self.model,
+            max_tokens=settings.REPLY_POOL_REPLY_TOKENS,
+            temperature=0.9,
+            top_p=self.top_p,
+        ), hedge=False)
     
     async def generate_response(
         self,
         emotion: str,
         user_message: Optional[str] = None,
         conversation_history: Optional[List[Dict]] = None,
-        max_tokens: int = 200,
-        temperature: float = 0.8
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.8,
+        session_id: Optional[str] = None,
+        persona: Optional[str] = None
     ) -> str:
         """
         Generate response using Groq API
         
+        The serving tier ("large", "fast", "cache" or "pool") is left in
+        the response_tier context variable.
+        
         Args:
             emotion: Detected emotion
             user_message: Optional user message
             conversation_history: Optional previous messages
-            max_tokens: Maximum tokens in response
+            max_tokens: Maximum tokens in response (default: the emotion's RESPONSE_LENGTH target)
             temperature: Temperature for generation
+            session_id: Optional session id (keys the history summary cache)
+            persona: Optional extra system instructions (part of the cache key)
             
         Returns:
             Generated response text
         """
+        self.last_request_at = time.monotonic()
+        pooled = self._pooled_reply(emotion, user_message, conversation_history, persona)
+        if pooled is not None:
+            log.info(f"Serving pooled reply for emotion: {emotion}")
+            response_tier.set("pool")
+            return pooled
+        
         try:
-            if self.client is None:
-                self.initialize()
+            messages = self._build_messages(emotion, user_message, conversation_history, session_id, persona)
+            route = self._route(emotion, messages, max_tokens)
             
-            # Create prompts
-            system_prompt = create_system_prompt(emotion)
-            user_prompt = create_user_prompt(user_message, emotion)
+            # Identical prompts can be served without a network round trip
+            cache_key = self._cache_key(messages, route, temperature)
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    log.info(f"Serving cached response for emotion: {emotion}")
+                    response_tier.set("cache")
+                    return cached
             
-            # Build messages array
-            messages = [
-                {"role": "system", "content": system_prompt}
-            ]
-            
-            # Add conversation history if provided
-            if conversation_history:
-                for msg in conversation_history[-5:]:  # Last 5 messages
-                    messages.append(msg)
-            
-            # Add current user message
-            messages.append({"role": "user", "content": user_prompt})
-            
-            log.info(f"Generating response for emotion: {emotion}")
+            log.info(f"Generating response for emotion: {emotion} ({route.tier} tier, {route.reason})")
             
             # Call Groq API
-            chat_completion = self.client.chat.completions.create(
-                messages=messages,
-                model=self.model,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                top_p=0.9,
-            )
-            
-            # Extract response
-            response = chat_completion.choices[0].message.content
+            response = await self._complete(messages, route, temperature)
+            response_tier.set(route.tier)
             
             log.info(f"Generated response ({len(response)} chars)")
             
@@ -89,10 +295,85 @@ class GroqService:
             log.error(f"Groq API call failed: {str(e)}")
             raise GroqAPIError(f"Failed to generate response: {str(e)}")
     
+    async def stream_response(
+        self,
+        emotion: str,
+        user_message: Optional[str] = None,
+        conversation_history: Optional[List[Dict]] = None,
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.8,
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response from Groq token by token
+        
+        Args:
+            emotion: Detected emotion
+            user_message: Optional user message
+            conversation_history: Optional previous messages
+            max_tokens: Maximum tokens in response (default: the emotion's RESPONSE_LENGTH target)
+            temperature: Temperature for generation
+            session_id: Optional session id (keys the history summary cache)
+            
+        Yields:
+            Text deltas as they arrive
+            
+        Raises:
+            GroqAPIError: If the stream cannot be opened or breaks midway
+        """
+        self.last_request_at = time.monotonic()
+        pooled = self._pooled_reply(emotion, user_message, conversation_history)
+        if pooled is not None:
+            log.info(f"Serving pooled reply for emotion: {emotion}")
+            response_tier.set("pool")
+            yield pooled
+            return
+        
+        try:
+            messages = self._build_messages(emotion, user_message, conversation_history, session_id)
+            route = self._route(emotion, messages, max_tokens)
+            
+            cache_key = self._cache_key(messages, route, temperature)
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    log.info(f"Serving cached response for emotion: {emotion}")
+                    response_tier.set("cache")
+                    yield cached
+                    return
+            
+            log.info(f"Streaming response for emotion: {emotion} ({route.tier} tier, {route.reason})")
+            
+            # Deadline and breaker cover opening the stream; streams are not hedged
+            await chat_limiter.acquire(self._estimate_tokens(messages, route.max_tokens))
+            stream = await route.caller.call(lambda: self.provider.open_stream(
+                messages,
+                model=route.model,
+                max_tokens=route.max_tokens,
+                temperature=temperature,
+                top_p=self.top_p,
+            ), hedge=False)
+            response_tier.set(route.tier)
+            
+            parts = []
+            async for delta in stream:
+                parts.append(delta)
+                yield delta
+            
+            # Only complete streams are cached
+            if cache_key is not None:
+                self.cache.put(cache_key, "".join(parts))
+                    
+        except Exception as e:
+            log.error(f"Groq streaming call failed: {str(e)}")
+            raise GroqAPIError(f"Failed to stream response: {str(e)}")
+    
     async def generate_quick_response(self, emotion: str) -> str:
         """
         Generate a quick response based only on emotion
         
+        Served from the reply pool when it has one, otherwise generated live.
+        
         Args:
             emotion: Detected emotion
             
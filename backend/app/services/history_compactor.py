@@ -0,0 +1,123 @@
+"""
+Token-budgeted conversation history with rolling summaries
+
+Recent turns are kept verbatim up to a token budget; turns that fall out of
+that window are folded into a cached summary. A summary is only recomputed
+when new turns drop out, and then only the new turns are folded in.
+"""
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from app.core.logging_config import log
+from app.core.metrics import metrics
+from app.core.resilience import request_deadline
+from app.utils.token_budget import fit_messages
+
+
+def _message_digest(previous: Optional[Dict], message: Dict) -> str:
+    """Digest of a message plus its predecessor (repeated replies stay distinct)"""
+    parts = []
+    for m in (previous, message):
+        if m is not None:
+            parts.append(f"{m.get('role', '')}\x1f{m.get('content', '')}")
+    return hashlib.sha1("\x1e".join(parts).encode("utf-8")).hexdigest()
+
+
+class HistoryCompactor:
+    """Fits conversation history into a token budget"""
+    
+    def __init__(
+        self,
+        summarize: Callable[[Optional[str], List[Dict]], Awaitable[str]],
+        token_budget: int = 600,
+        summary_tokens: int = 150,
+        max_summaries: int = 2048
+    ):
+        """
+        Args:
+            summarize: Coroutine (previous_summary, new_turns) -> updated summary
+            token_budget: Tokens allowed for history including the summary
+            summary_tokens: Tokens reserved for the summary
+            max_summaries: Cached summaries kept (LRU)
+        """
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.max_summaries = max_summaries
+        self._summaries: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._pending: Set[Tuple[str, str]] = set()
+        self._tasks: Set[asyncio.Task] = set()
+    
+    def compact(self, history: List[Dict], namespace: str) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Split history into verbatim recent turns and a summary of the rest
+        
+        Returns the newest cached summary immediately. If turns dropped out
+        since it was computed, an updated summary is built in the background
+        for the next request, so this request never waits on it.
+        
+        Args:
+            history: Conversation messages, oldest first
+            namespace: Conversation identity (session id) for the summary cache
+        
+        Returns:
+            (recent messages, summary or None)
+        """
+        if not history:
+            return [], None
+        
+        # Everything fits verbatim
+        if fit_messages(history, self.token_budget) == 0:
+            return list(history), None
+        
+        # Leave room for the summary once something has to be dropped
+        split = fit_messages(history, max(self.token_budget - self.summary_tokens, 0))
+        recent, dropped = history[split:], history[:split]
+        metrics.increment("history_compacted")
+        
+        # Newest dropped message that already has a summary through it
+        summary = None
+        covered = 0
+        for i in range(len(dropped) - 1, -1, -1):
+            key = (namespace, _message_digest(dropped[i - 1] if i else None, dropped[i]))
+            if key in self._summaries:
+                self._summaries.move_to_end(key)
+                summary, covered = self._summaries[key], i + 1
+                break
+        
+        if covered < len(dropped):
+            target = (namespace, _message_digest(dropped[-2] if len(dropped) > 1 else None, dropped[-1]))
+            self._schedule(target, summary, dropped[covered:])
+        else:
+            metrics.increment("history_summary_hit")
+        
+        return list(recent), summary
+    
+    def _schedule(self, key: Tuple[str, str], previous: Optional[str], turns: List[Dict]):
+        if key in self._pending:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._pending.add(key)
+        task = loop.create_task(self._update(key, previous, turns))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _update(self, key: Tuple[str, str], previous: Optional[str], turns: List[Dict]):
+        # Background work is not bound by the triggering request's budget
+        request_deadline.set(None)
+        try:
+            summary = await self.summarize(previous, turns)
+            if summary:
+                self._summaries[key] = summary
+                self._summaries.move_to_end(key)
+                while len(self._summaries) > self.max_summaries:
+                    self._summaries.popitem(last=False)
+                metrics.increment("history_summary_computed")
+        except Exception as e:
+            log.warning(f"History summary failed: {str(e)}")
+        finally:
+            self._pending.discard(key)
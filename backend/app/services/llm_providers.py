@@ -0,0 +1,232 @@
+"""
+LLM provider backends for chat completion and transcription
+
+Services talk to an LLMProvider instead of a vendor SDK, so the upstream can
+be swapped through Settings (e.g. pointed at scripts/llm_standin_server.py
+for load tests without spending real quota).
+"""
+import json
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
+from groq import AsyncGroq
+from app.config import settings
+from app.core.logging_config import log
+from app.core.rate_limiter import groq_http_client
+
+
+def _params(**kwargs) -> Dict:
+    """Drop unset generation parameters"""
+    return {key: value for key, value in kwargs.items() if value is not None}
+
+
+class LLMProvider(ABC):
+    """Chat completion and transcription backend"""
+    
+    name = "base"
+    
+    @abstractmethod
+    async def chat(
+        self,
+        messages: List[Dict],
+        model: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        top_p: Optional[float] = None,
+        json_mode: bool = False
+    ) -> str:
+        """
+        Run a chat completion
+        
+        Args:
+            messages: Role/content messages
+            model: Model name
+            max_tokens: Maximum completion tokens
+            temperature: Sampling temperature
+            top_p: Nucleus sampling
+            json_mode: Ask for a JSON object response
+        
+        Returns:
+            Completion text
+        """
+    
+    @abstractmethod
+    async def open_stream(
+        self,
+        messages: List[Dict],
+        model: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        top_p: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Open a streaming chat completion
+        
+        Returns once the upstream has accepted the request, so deadlines and
+        breakers can wrap the open separately from consuming the stream.
+        
+        Returns:
+            Async iterator of text deltas
+        """
+    
+    @abstractmethod
+    async def transcribe(self, filename: str, content: bytes, model: str) -> str:
+        """
+        Transcribe an audio clip
+        
+        Args:
+            filename: Original file name (used for format detection)
+            content: Audio bytes
+            model: Transcription model name
+        
+        Returns:
+            Transcript text
+        """
+
+
+class GroqProvider(LLMProvider):
+    """Groq cloud via the official SDK"""
+    
+    name = "groq"
+    
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
+        self.api_key = api_key
+        self.base_url = base_url or None
+        self._client: Optional[AsyncGroq] = None
+    
+    @property
+    def client(self) -> AsyncGroq:
+        if self._client is None:
+            # Rate-limit headers feed the client-side limiter; retries are left
+            # to the limiter/breaker instead of the SDK's own retry loop
+            self._client = AsyncGroq(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=groq_http_client(),
+                max_retries=settings.GROQ_MAX_RETRIES
+            )
+            log.info("Groq client initialized")
+        return self._client
+    
+    async def chat(self, messages, model, max_tokens=None, temperature=None, top_p=None, json_mode=False) -> str:
+        completion = await self.client.chat.completions.create(
+            messages=messages,
+            model=model,
+            **_params(
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                response_format={"type": "json_object"} if json_mode else None
+            )
+        )
+        return completion.choices[0].message.content
+    
+    async def open_stream(self, messages, model, max_tokens=None, temperature=None, top_p=None) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
+            messages=messages,
+            model=model,
+            stream=True,
+            **_params(max_tokens=max_tokens, temperature=temperature, top_p=top_p)
+        )
+        return self._deltas(stream)
+    
+    @staticmethod
+    async def _deltas(stream) -> AsyncIterator[str]:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+    
+    async def transcribe(self, filename: str, content: bytes, model: str) -> str:
+        return await self.client.audio.transcriptions.create(
+            file=(filename, content),
+            model=model,
+            response_format="text",
+        )
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Any server speaking the OpenAI-compatible REST API (vLLM, llama.cpp, the local stand-in, ...)"""
+    
+    name = "openai_compatible"
+    
+    def __init__(self, base_url: str, api_key: str = "", timeout: float = 60.0):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = groq_http_client(base_url=self.base_url, headers=headers, timeout=self.timeout)
+            log.info(f"OpenAI-compatible client initialized ({self.base_url})")
+        return self._client
+    
+    @staticmethod
+    def _payload(messages, model, max_tokens, temperature, top_p, **extra) -> Dict:
+        return {
+            "messages": messages,
+            "model": model,
+            **_params(max_tokens=max_tokens, temperature=temperature, top_p=top_p),
+            **extra,
+        }
+    
+    async def chat(self, messages, model, max_tokens=None, temperature=None, top_p=None, json_mode=False) -> str:
+        payload = self._payload(messages, model, max_tokens, temperature, top_p)
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        response = await self.client.post("/chat/completions", json=payload)
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+    
+    async def open_stream(self, messages, model, max_tokens=None, temperature=None, top_p=None) -> AsyncIterator[str]:
+        payload = self._payload(messages, model, max_tokens, temperature, top_p, stream=True)
+        request = self.client.build_request("POST", "/chat/completions", json=payload)
+        response = await self.client.send(request, stream=True)
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+            response.raise_for_status()
+        return self._deltas(response)
+    
+    @staticmethod
+    async def _deltas(response: httpx.Response) -> AsyncIterator[str]:
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                if choices:
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+        finally:
+            await response.aclose()
+    
+    async def transcribe(self, filename: str, content: bytes, model: str) -> str:
+        response = await self.client.post(
+            "/audio/transcriptions",
+            files={"file": (filename, content)},
+            data={"model": model, "response_format": "text"}
+        )
+        response.raise_for_status()
+        return response.text
+
+
+def create_provider() -> LLMProvider:
+    """Build the provider selected by LLM_PROVIDER"""
+    api_key = settings.LLM_API_KEY or settings.GROQ_API_KEY
+    if settings.LLM_PROVIDER == "openai_compatible":
+        return OpenAICompatibleProvider(settings.LLM_BASE_URL, api_key=api_key)
+    return GroqProvider(api_key, base_url=settings.LLM_BASE_URL)
+
+
+# Global provider instance
+llm_provider = create_provider()
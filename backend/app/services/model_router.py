@@ -0,0 +1,188 @@
+"""
+Per-request model tier routing
+
+Each request goes to the large model unless load or its deadline says the
+fast model is the better bet: the large model's recent p95 is over the SLO,
+the rate-limit queue is deep, the remaining latency budget is shorter than
+the large model usually takes, or its breaker is open. Long prompts stay on
+the large model for quality unless the deadline rules it out.
+"""
+from contextvars import ContextVar
+from typing import Dict, NamedTuple, Optional, Tuple
+from app.config import settings
+from app.core.constants import EMOTION_RESPONSE_LENGTH, RESPONSE_LENGTH
+from app.core.metrics import metrics
+from app.core.rate_limiter import RateLimiter
+from app.core.resilience import ResilientCaller, note_degradation, remaining_budget, short_on_time
+
+
+TIER_LARGE = "large"
+TIER_FAST = "fast"
+
+# What served the current request's reply: "large", "fast", "cache" or "pool"
+response_tier: ContextVar[Optional[str]] = ContextVar("response_tier", default=None)
+
+
+def target_max_tokens(emotion: str) -> int:
+    """Completion token target for an emotion (RESPONSE_LENGTH via EMOTION_RESPONSE_LENGTH)"""
+    return RESPONSE_LENGTH[EMOTION_RESPONSE_LENGTH.get(emotion, "medium")]
+
+
+class ModelTier(NamedTuple):
+    name: str
+    model: str
+    caller: ResilientCaller
+
+
+class RouteDecision(NamedTuple):
+    tier: str
+    model: str
+    caller: ResilientCaller
+    max_tokens: int
+    reason: str
+
+
+class ModelRouter:
+    """Chooses the large or fast model tier for each request"""
+    
+    def __init__(
+        self,
+        name: str,
+        large: ModelTier,
+        fast: ModelTier,
+        limiter: RateLimiter,
+        enabled: bool = True,
+        latency_slo_seconds: float = 3.0,
+        queue_threshold: int = 4,
+        long_message_tokens: int = 400,
+        window: int = 30,
+        min_samples: int = 5,
+        probe_every: int = 10,
+        deadline_margin: float = 1.2,
+        short_reply_seconds: float = 4.0
+    ):
+        """
+        Args:
+            name: Metric prefix (e.g. "chat_router")
+            large: Default, higher quality tier
+            fast: Tier used under load or deadline pressure
+            limiter: Rate limiter whose queue depth signals load
+            enabled: Route at all (False = always large)
+            latency_slo_seconds: Large-tier p95 above this shifts traffic to fast
+            queue_threshold: Queued requests at which traffic shifts to fast
+            long_message_tokens: Prompts above this stay large unless the deadline forbids
+            window: Recent calls the p95 is computed over
+            min_samples: Calls needed before latency is trusted
+            probe_every: While shifted for latency, every n-th request still goes large
+            deadline_margin: Large tier needs p95 * margin of budget left
+            short_reply_seconds: Under this much budget replies are capped to short
+                (and go fast while the large tier has no latency history)
+        """
+        self.name = name
+        self.tiers = {large.name: large, fast.name: fast}
+        self.large = large
+        self.fast = fast
+        self.limiter = limiter
+        self.enabled = enabled
+        self.latency_slo_seconds = latency_slo_seconds
+        self.queue_threshold = queue_threshold
+        self.long_message_tokens = long_message_tokens
+        self.window = window
+        self.min_samples = min_samples
+        self.probe_every = probe_every
+        self.deadline_margin = deadline_margin
+        self.short_reply_seconds = short_reply_seconds
+        self._latency_shifted = 0
+        self.routed: Dict[str, int] = {large.name: 0, fast.name: 0}
+    
+    def p95(self, tier: ModelTier) -> Optional[float]:
+        """Recent p95 latency of a tier (None until enough calls)"""
+        if len(tier.caller.latency) < self.min_samples:
+            return None
+        return tier.caller.latency.percentile(95, last=self.window)
+    
+    def _choose(self, prompt_tokens: int) -> Tuple[ModelTier, str]:
+        if not self.enabled:
+            return self.large, "disabled"
+        if self.large.caller.breaker.is_open():
+            return self.fast, "large_unavailable"
+        
+        large_p95 = self.p95(self.large)
+        budget = remaining_budget()
+        if budget is not None:
+            needed = large_p95 * self.deadline_margin if large_p95 is not None else self.short_reply_seconds
+            if budget < needed:
+                return self.fast, "deadline"
+        if prompt_tokens > self.long_message_tokens:
+            return self.large, "long_message"
+        if self.limiter.queue_depth() >= self.queue_threshold:
+            return self.fast, "queue"
+        if large_p95 is not None and large_p95 > self.latency_slo_seconds:
+            # Keep sampling the large tier so traffic returns once it recovers
+            self._latency_shifted += 1
+            if self.probe_every and self._latency_shifted % self.probe_every == 0:
+                return self.large, "probe"
+            return self.fast, "latency"
+        return self.large, "default"
+    
+    def route(self, prompt_tokens: int, max_tokens: int) -> RouteDecision:
+        """
+        Pick the tier for one request
+        
+        Args:
+            prompt_tokens: Estimated prompt tokens (message length signal)
+            max_tokens: Completion token target
+        
+        Returns:
+            RouteDecision with the tier, model, its caller and max_tokens
+        """
+        tier, reason = self._choose(prompt_tokens)
+        if reason == "deadline":
+            note_degradation("fast_tier")
+        if reason == "deadline" or short_on_time(self.short_reply_seconds):
+            # Shorter replies finish sooner when time is nearly up
+            if max_tokens > RESPONSE_LENGTH["short"]:
+                max_tokens = RESPONSE_LENGTH["short"]
+                note_degradation("max_tokens_capped")
+        self.routed[tier.name] += 1
+        metrics.increment(f"{self.name}_{tier.name}")
+        if tier is self.fast:
+            metrics.increment(f"{self.name}_fast_{reason}")
+        return RouteDecision(tier.name, tier.model, tier.caller, max_tokens, reason)
+    
+    def stats(self) -> Dict:
+        """Requests per tier and the latency signals behind the decisions"""
+        return {
+            "enabled": self.enabled,
+            "routed": dict(self.routed),
+            "p95_ms": {
+                name: round(p95 * 1000, 1) if (p95 := self.p95(tier)) is not None else None
+                for name, tier in self.tiers.items()
+            },
+            "queued": self.limiter.queue_depth(),
+        }
+
+
+def create_router(
+    name: str,
+    large_model: str,
+    large_caller: ResilientCaller,
+    fast_caller: ResilientCaller,
+    limiter: RateLimiter
+) -> ModelRouter:
+    """Build a router configured from the LLM_ROUTER_* settings"""
+    return ModelRouter(
+        name,
+        large=ModelTier(TIER_LARGE, large_model, large_caller),
+        fast=ModelTier(TIER_FAST, settings.LLM_FAST_MODEL, fast_caller),
+        limiter=limiter,
+        enabled=settings.LLM_ROUTING_ENABLED,
+        latency_slo_seconds=settings.LLM_ROUTER_LATENCY_SLO_SECONDS,
+        queue_threshold=settings.LLM_ROUTER_QUEUE_THRESHOLD,
+        long_message_tokens=settings.LLM_ROUTER_LONG_MESSAGE_TOKENS,
+        window=settings.LLM_ROUTER_WINDOW,
+        min_samples=settings.LLM_ROUTER_MIN_SAMPLES,
+        probe_every=settings.LLM_ROUTER_PROBE_EVERY,
+        deadline_margin=settings.LLM_ROUTER_DEADLINE_MARGIN,
+        short_reply_seconds=settings.DEADLINE_SHORT_REPLY_SECONDS
+    )
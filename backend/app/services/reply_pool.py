@@ -0,0 +1,202 @@
+"""
+Pre-generated per-emotion reply pools
+
+With no user message the reply only depends on the emotion, so a handful of
+LLM-written replies per emotion are generated ahead of time (while the
+service is idle, within a token budget) and served instantly with rotation.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set
+from app.core.constants import EMOTION_LABELS
+from app.core.logging_config import log
+from app.core.metrics import metrics
+
+
+class _PooledReply:
+    __slots__ = ("text", "uses", "created_at")
+    
+    def __init__(self, text: str):
+        self.text = text
+        self.uses = 0
+        self.created_at = time.monotonic()
+
+
+class ReplyPool:
+    """In-memory per-emotion reply pools with low-watermark refill"""
+    
+    def __init__(
+        self,
+        generate: Callable[[str], Awaitable[str]],
+        size: int = 8,
+        low_watermark: int = 3,
+        max_uses: int = 3,
+        max_age_seconds: float = 3600,
+        token_budget: int = 20000,
+        budget_window_seconds: float = 3600,
+        reply_tokens: int = 100
+    ):
+        """
+        Args:
+            generate: Coroutine function producing one fresh reply for an emotion
+            size: Target replies per emotion
+            low_watermark: Refill an emotion once it drops below this many replies
+            max_uses: Times a reply is served before it is retired
+            max_age_seconds: Replies older than this are retired
+            token_budget: Completion tokens the pool may spend per budget window
+            budget_window_seconds: Length of the budget window
+            reply_tokens: Max tokens per generated reply (charged up front)
+        """
+        self.generate = generate
+        self.size = size
+        self.low_watermark = low_watermark
+        self.max_uses = max_uses
+        self.max_age_seconds = max_age_seconds
+        self.token_budget = token_budget
+        self.budget_window_seconds = budget_window_seconds
+        self.reply_tokens = reply_tokens
+        
+        self._pools: Dict[str, Deque[_PooledReply]] = {emotion: deque() for emotion in EMOTION_LABELS}
+        self._wanted: Set[str] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._idle_check: Callable[[], bool] = lambda: True
+        self._window_start = time.monotonic()
+        self._spent = 0
+        self.running = False
+    
+    def level(self, emotion: str) -> int:
+        """Replies currently pooled for an emotion"""
+        pool = self._pools.get(emotion)
+        return len(pool) if pool is not None else 0
+    
+    def take(self, emotion: str) -> Optional[str]:
+        """
+        Serve a pooled reply
+        
+        Replies rotate round-robin and are retired after max_uses serves or
+        max_age_seconds. Dropping below the low watermark queues a refill.
+        
+        Args:
+            emotion: Detected emotion
+        
+        Returns:
+            A reply, or None if the pool for this emotion is empty
+        """
+        pool = self._pools.get(emotion)
+        if pool is None:
+            return None
+        
+        now = time.monotonic()
+        while pool and now - pool[0].created_at > self.max_age_seconds:
+            pool.popleft()
+        
+        if not pool:
+            self._request_refill(emotion)
+            metrics.increment("reply_pool_miss")
+            return None
+        
+        reply = pool.popleft()
+        reply.uses += 1
+        if reply.uses < self.max_uses:
+            pool.append(reply)
+        
+        if len(pool) < self.low_watermark:
+            self._request_refill(emotion)
+        
+        metrics.increment("reply_pool_hit")
+        return reply.text
+    
+    def _request_refill(self, emotion: str):
+        self._wanted.add(emotion)
+        if self._wake is not None:
+            self._wake.set()
+    
+    def _reserve_tokens(self) -> bool:
+        """Charge one reply against the token budget (False if exhausted)"""
+        now = time.monotonic()
+        if now - self._window_start >= self.budget_window_seconds:
+            self._window_start = now
+            self._spent = 0
+        if self._spent + self.reply_tokens > self.token_budget:
+            return False
+        self._spent += self.reply_tokens
+        return True
+    
+    async def refill(self, emotion: str) -> int:
+        """
+        Top an emotion's pool up to size
+        
+        Waits for the idle check before each generation and stops early
+        when the token budget runs out or generation fails.
+        
+        Args:
+            emotion: Emotion to refill
+        
+        Returns:
+            Number of replies added
+        """
+        pool = self._pools[emotion]
+        added = 0
+        
+        while len(pool) < self.size:
+            while not self._idle_check():
+                await asyncio.sleep(1.0)
+            
+            if not self._reserve_tokens():
+                metrics.increment("reply_pool_budget_exhausted")
+                break
+            
+            try:
+                text = await self.generate(emotion)
+            except Exception as e:
+                log.warning(f"Reply pool generation failed for {emotion}: {str(e)}")
+                break
+            
+            if text:
+                pool.append(_PooledReply(text))
+                added += 1
+                metrics.increment("reply_pool_generated")
+        
+        if len(pool) >= self.size:
+            self._wanted.discard(emotion)
+        return added
+    
+    async def run(self, refresh_seconds: float, idle_check: Callable[[], bool]):
+        """
+        Background loop filling pools during idle time
+        
+        Fills every emotion on startup, then refills whenever take() reports
+        a low watermark, and re-checks all pools every refresh_seconds.
+        
+        Args:
+            refresh_seconds: Interval between periodic top-ups
+            idle_check: Returns True when no user-facing generation is running
+        """
+        self.running = True
+        self._wake = asyncio.Event()
+        self._idle_check = idle_check
+        self._wanted.update(self._pools)
+        
+        try:
+            while True:
+                # Emptiest pools first
+                for emotion in sorted(self._wanted, key=self.level):
+                    await self.refill(emotion)
+                
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=refresh_seconds)
+                except asyncio.TimeoutError:
+                    self._wanted.update(e for e, pool in self._pools.items() if len(pool) < self.size)
+        finally:
+            self.running = False
+    
+    def stats(self) -> Dict:
+        """Pool levels and token budget usage"""
+        return {
+            "running": self.running,
+            "levels": {emotion: len(pool) for emotion, pool in self._pools.items()},
+            "tokens_spent": self._spent,
+            "token_budget": self.token_budget,
+        }
@@ -0,0 +1,125 @@
+"""
+LLM response cache for repeated prompt shapes
+
+With no user message, the system prompt and opening line are pure functions
+of the emotion, so many requests send byte-identical prompts. Each key keeps
+several completions so repeat visitors still see varied replies.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from app.core.metrics import metrics
+
+
+class _CacheEntry:
+    __slots__ = ("variants", "cursor", "created_at")
+    
+    def __init__(self):
+        self.variants: List[str] = []
+        self.cursor = 0
+        self.created_at = time.monotonic()
+
+
+class ResponseCache:
+    """LRU + TTL cache holding up to N response variants per prompt key"""
+    
+    def __init__(self, max_keys: int = 512, variants_per_key: int = 3, ttl_seconds: float = 3600):
+        self.max_keys = max_keys
+        self.variants_per_key = variants_per_key
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(messages: List[Dict], **params) -> str:
+        """
+        Hash a normalized message list plus generation params
+        
+        Args:
+            messages: Chat messages (role/content)
+            **params: Generation parameters (model, max_tokens, temperature, ...)
+        
+        Returns:
+            Hex digest cache key
+        """
+        normalized = [
+            {"role": str(m.get("role", "user")).lower(), "content": " ".join(str(m.get("content", "")).split())}
+            for m in messages
+        ]
+        payload = json.dumps({"messages": normalized, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response
+        
+        A key only serves hits once it holds `variants_per_key` responses;
+        until then callers go upstream and add another variant. Hits rotate
+        through the stored variants.
+        
+        Args:
+            key: Cache key from make_key()
+        
+        Returns:
+            A cached response, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created_at > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            
+            if entry is None or len(entry.variants) < self.variants_per_key:
+                self.misses += 1
+                metrics.increment("llm_cache_miss")
+                return None
+            
+            self._entries.move_to_end(key)
+            response = entry.variants[entry.cursor % len(entry.variants)]
+            entry.cursor += 1
+            self.hits += 1
+            metrics.increment("llm_cache_hit")
+            return response
+    
+    def put(self, key: str, response: str):
+        """
+        Store a response variant
+        
+        Args:
+            key: Cache key from make_key()
+            response: Completion text
+        """
+        if not response:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _CacheEntry()
+            self._entries.move_to_end(key)
+            if len(entry.variants) < self.variants_per_key:
+                entry.variants.append(response)
+            
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+                metrics.increment("llm_cache_eviction")
+    
+    def clear(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        """Hit-rate and size statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "keys": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
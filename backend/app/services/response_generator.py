@@ -2,10 +2,14 @@
 Response generation service - combines emotion detection with Groq
 """
 from app.services.groq_service import groq_service
+from app.services.model_router import response_tier
 from app.models.schemas.chat import ChatResponse
 from app.utils.emotion_mapping import get_emotion_strategy
 from app.core.logging_config import log
-from typing import Optional, List, Dict
+from app.core.metrics import metrics
+from app.core.resilience import note_degradation, short_on_time
+from app.config import settings
+from typing import AsyncIterator, Optional, List, Dict, Tuple, Union
 
 
 class ResponseGenerator:
@@ -18,7 +22,9 @@ class ResponseGenerator:
         self,
         emotion: str,
         user_message: Optional[str] = None,
-        conversation_history: Optional[List[Dict]] = None
+        conversation_history: Optional[List[Dict]] = None,
+        session_id: Optional[str] = None,
+        persona: Optional[str] = None
     ) -> ChatResponse:
         """
         Generate a response based on detected emotion
@@ -27,10 +33,15 @@ class ResponseGenerator:
             emotion: Detected emotion
             user_message: Optional user message
             conversation_history: Optional conversation history
+            session_id: Optional conversation session id
+            persona: Optional extra system instructions for the reply
             
         Returns:
             ChatResponse object
         """
+        if self._out_of_time():
+            return self._fallback(emotion)
+        
         try:
             log.info(f"Generating response for emotion: {emotion}")
             
@@ -38,26 +49,107 @@ class ResponseGenerator:
             strategy = get_emotion_strategy(emotion)
             
             # Generate response using Groq
+            response_tier.set(None)
             response_text = await self.groq.generate_response(
                 emotion=emotion,
                 user_message=user_message,
-                conversation_history=conversation_history
+                conversation_history=conversation_history,
+                session_id=session_id,
+                persona=persona
             )
             
             return ChatResponse(
                 message=response_text,
                 emotion_detected=emotion,
-                strategy_used=strategy['approach']
+                strategy_used=strategy['approach'],
+                model_tier=response_tier.get()
             )
             
         except Exception as e:
             log.error(f"Response generation failed: {str(e)}")
             # Fallback response
-            return ChatResponse(
-                message=self._get_fallback_response(emotion),
+            self._note_deadline_fallback()
+            return self._fallback(emotion)
+    
+    async def stream_response(
+        self,
+        emotion: str,
+        user_message: Optional[str] = None,
+        conversation_history: Optional[List[Dict]] = None,
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Union[str, ChatResponse]]]:
+        """
+        Stream a response based on detected emotion
+        
+        Yields ("token", text) for each delta, then ("done", ChatResponse).
+        If the upstream stream fails, yields ("fallback", text) with the
+        fallback reply instead of further tokens; clients replace any partial
+        text with it. The final ChatResponse always carries the full message.
+        
+        Args:
+            emotion: Detected emotion
+            user_message: Optional user message
+            conversation_history: Optional conversation history
+            session_id: Optional conversation session id
+            
+        Yields:
+            (event, payload) tuples
+        """
+        if self._out_of_time():
+            fallback = self._fallback(emotion)
+            yield "token", fallback.message
+            yield "done", fallback
+            return
+        
+        strategy = get_emotion_strategy(emotion)
+        parts = []
+        response_tier.set(None)
+        
+        try:
+            async for delta in self.groq.stream_response(
+                emotion=emotion,
+                user_message=user_message,
+                conversation_history=conversation_history,
+                session_id=session_id
+            ):
+                parts.append(delta)
+                yield "token", delta
+            
+            yield "done", ChatResponse(
+                message="".join(parts),
                 emotion_detected=emotion,
-                strategy_used="fallback"
+                strategy_used=strategy['approach'],
+                model_tier=response_tier.get()
             )
+            
+        except Exception as e:
+            log.error(f"Response streaming failed after {len(parts)} chunks: {str(e)}")
+            self._note_deadline_fallback()
+            fallback = self._fallback(emotion)
+            yield "fallback", fallback.message
+            yield "done", fallback
+    
+    def _out_of_time(self) -> bool:
+        """Too little of the request budget left for an LLM call"""
+        if short_on_time(settings.DEADLINE_FALLBACK_REPLY_SECONDS):
+            log.warning("Request deadline nearly spent, serving the fallback reply")
+            note_degradation("fallback_reply")
+            return True
+        return False
+    
+    def _note_deadline_fallback(self):
+        """Count a failed call as a deadline degradation when the budget ran out"""
+        if short_on_time(settings.DEADLINE_FALLBACK_REPLY_SECONDS):
+            note_degradation("fallback_reply")
+    
+    def _fallback(self, emotion: str) -> ChatResponse:
+        """Canned reply for the emotion"""
+        metrics.increment("fallback_replies")
+        return ChatResponse(
+            message=self._get_fallback_response(emotion),
+            emotion_detected=emotion,
+            strategy_used="fallback"
+        )
     
     def _get_fallback_response(self, emotion: str) -> str:
         """
@@ -0,0 +1,275 @@
+"""
+Server-side conversation sessions
+
+Clients send a session id instead of re-uploading the whole conversation;
+the server keeps the history and appends each turn itself.
+"""
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+from app.config import settings
+from app.core.executors import io_executor, run_in_executor
+from app.core.logging_config import log
+
+
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+class SessionBackend(ABC):
+    """
+    Storage for per-session message lists
+    
+    Messages are role/content dicts; an assistant reply may also carry the
+    `emotion` it answered, kept as metadata and never sent to the LLM.
+    """
+    
+    # Backends doing disk/network I/O run on the I/O pool
+    blocking = False
+    
+    @abstractmethod
+    def get(self, session_id: str) -> List[Dict]:
+        """Stored messages for a session (empty if unknown or expired)"""
+    
+    @abstractmethod
+    def append(self, session_id: str, messages: List[Dict]):
+        """Append messages to a session, creating it if needed"""
+    
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Drop a session"""
+    
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Drop expired sessions, returning how many were removed"""
+
+
+class InMemorySessionBackend(SessionBackend):
+    """Process-local LRU + TTL store (single worker)"""
+    
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 86400, max_messages: int = 20):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self._sessions: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, session_id: str) -> List[Dict]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            if time.monotonic() - session["updated_at"] > self.ttl_seconds:
+                del self._sessions[session_id]
+                return []
+            self._sessions.move_to_end(session_id)
+            return list(session["messages"])
+    
+    def append(self, session_id: str, messages: List[Dict]):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = {"messages": []}
+            session["messages"] = (session["messages"] + messages)[-self.max_messages:]
+            session["updated_at"] = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+    
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+    
+    def purge_expired(self) -> int:
+        cutoff = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            expired = [sid for sid, s in self._sessions.items() if s["updated_at"] < cutoff]
+            for sid in expired:
+                del self._sessions[sid]
+        return len(expired)
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """SQLite file store shared by several workers on one host"""
+    
+    blocking = True
+    
+    def __init__(self, path: str, ttl_seconds: float = 86400, max_messages: int = 20):
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+                "role TEXT NOT NULL, content TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(messages)")}
+            if "emotion" not in columns:
+                # Files created before emotion metadata was stored
+                self._conn.execute("ALTER TABLE messages ADD COLUMN emotion TEXT")
+    
+    def get(self, session_id: str) -> List[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return []
+            if time.time() - row[0] > self.ttl_seconds:
+                self._delete(session_id)
+                return []
+            rows = self._conn.execute(
+                "SELECT role, content, emotion FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, self.max_messages)
+            ).fetchall()
+        return [
+            {"role": role, "content": content, **({"emotion": emotion} if emotion else {})}
+            for role, content, emotion in reversed(rows)
+        ]
+    
+    def append(self, session_id: str, messages: List[Dict]):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT INTO sessions (session_id, updated_at) VALUES (?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at",
+                    (session_id, time.time())
+                )
+                self._conn.executemany(
+                    "INSERT INTO messages (session_id, role, content, emotion) VALUES (?, ?, ?, ?)",
+                    [(session_id, m["role"], m["content"], m.get("emotion")) for m in messages]
+                )
+                self._conn.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND id NOT IN "
+                    "(SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                    (session_id, session_id, self.max_messages)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def _delete(self, session_id: str):
+        self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+    
+    def delete(self, session_id: str):
+        with self._lock:
+            self._delete(session_id)
+    
+    def purge_expired(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [row[0] for row in self._conn.execute(
+                "SELECT session_id FROM sessions WHERE updated_at < ?", (cutoff,)
+            )]
+            for session_id in expired:
+                self._delete(session_id)
+        return len(expired)
+
+
+def create_backend() -> SessionBackend:
+    """Build the backend selected by SESSION_BACKEND"""
+    if settings.SESSION_BACKEND == "sqlite":
+        return SQLiteSessionBackend(
+            settings.SESSION_SQLITE_PATH,
+            ttl_seconds=settings.SESSION_TTL_SECONDS,
+            max_messages=settings.SESSION_MAX_MESSAGES
+        )
+    return InMemorySessionBackend(
+        max_sessions=settings.SESSION_MAX_SESSIONS,
+        ttl_seconds=settings.SESSION_TTL_SECONDS,
+        max_messages=settings.SESSION_MAX_MESSAGES
+    )
+
+
+class SessionStore:
+    """Service for server-side conversation history"""
+    
+    def __init__(self, backend: Optional[SessionBackend] = None):
+        self.backend = backend or create_backend()
+    
+    async def _call(self, func, *args):
+        if self.backend.blocking:
+            return await run_in_executor(io_executor, func, *args)
+        return func(*args)
+    
+    def resolve(self, session_id: Optional[str]) -> str:
+        """
+        Return a usable session id
+        
+        Args:
+            session_id: Client-supplied id (may be None)
+        
+        Returns:
+            The client's id if well-formed, otherwise a new one
+        """
+        if session_id and SESSION_ID_PATTERN.match(session_id):
+            return session_id
+        if session_id:
+            log.warning("Ignoring malformed session id, starting a new session")
+        return uuid.uuid4().hex
+    
+    async def get_history(self, session_id: str) -> List[Dict]:
+        """
+        Stored conversation history for a session
+        
+        Args:
+            session_id: Session id from resolve()
+        
+        Returns:
+            List of role/content messages, oldest first (metadata stripped)
+        """
+        messages = await self._call(self.backend.get, session_id)
+        return [{"role": m["role"], "content": m["content"]} for m in messages]
+    
+    async def append_turn(
+        self,
+        session_id: str,
+        user_message: Optional[str],
+        assistant_content: str,
+        emotion: Optional[str] = None
+    ):
+        """
+        Record one exchange
+        
+        Args:
+            session_id: Session id from resolve()
+            user_message: What the user actually said (None for emotion-only
+                requests, which store no user turn)
+            assistant_content: The reply that was returned
+            emotion: Emotion the reply answered (metadata on the reply)
+        """
+        messages = [{"role": "user", "content": user_message}] if user_message else []
+        reply = {"role": "assistant", "content": assistant_content}
+        if emotion:
+            reply["emotion"] = emotion
+        messages.append(reply)
+        await self._call(self.backend.append, session_id, messages)
+    
+    async def delete(self, session_id: str):
+        """Forget a session"""
+        await self._call(self.backend.delete, session_id)
+    
+    async def purge_expired(self) -> int:
+        """Drop expired sessions"""
+        return await self._call(self.backend.purge_expired)
+
+
+# Global service instance
+session_store = SessionStore()
@@ -0,0 +1,261 @@
+"""
+Speculative reply generation for the top emotion candidates
+
+The system prompt depends on the final emotion, so the LLM call normally
+waits for face detection and fusion. In speculative mode the reply starts
+streaming for the audio model's top-2 emotions as soon as they are known;
+when fusion settles, the matching stream is kept (with everything it has
+buffered so far) and the other is cancelled. Extra tokens are traded for
+taking face detection and fusion off the critical path; win and waste rates
+show whether the trade pays off.
+"""
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.config import settings
+from app.core.logging_config import log
+from app.core.metrics import metrics
+from app.core.rate_limiter import chat_limiter
+from app.models.ml_models.emotion_vector import EmotionVector
+from app.models.schemas.chat import ChatResponse
+from app.services.response_generator import ResponseGenerator, response_generator
+from app.utils.token_budget import estimate_tokens
+
+
+Event = Tuple[str, Any]
+
+
+class _Candidate:
+    """One speculative reply stream and the events it has produced so far"""
+    
+    def __init__(self, emotion: str, events: AsyncIterator[Event]):
+        self.emotion = emotion
+        self.events: List[Event] = []
+        self.finished = False
+        self._arrived = asyncio.Event()
+        self.task = asyncio.create_task(self._consume(events))
+    
+    async def _consume(self, events: AsyncIterator[Event]):
+        try:
+            async for event in events:
+                self.events.append(event)
+                self._arrived.set()
+        finally:
+            self.finished = True
+            self._arrived.set()
+    
+    def tokens(self) -> int:
+        """Completion tokens streamed so far (estimated)"""
+        return estimate_tokens("".join(p for e, p in self.events if e == "token"))
+    
+    async def replay(self) -> AsyncIterator[Event]:
+        """Buffered events first, then live ones until the stream ends"""
+        sent = 0
+        while True:
+            while sent < len(self.events):
+                yield self.events[sent]
+                sent += 1
+            if self.finished:
+                return
+            self._arrived.clear()
+            await self._arrived.wait()
+
+
+class Speculation:
+    """Candidate reply streams for one request, resolved once the emotion is final"""
+    
+    def __init__(
+        self,
+        owner: "SpeculativeResponder",
+        candidates: Dict[str, _Candidate],
+        user_message: Optional[str],
+        conversation_history: Optional[List[Dict]],
+        session_id: Optional[str]
+    ):
+        self.owner = owner
+        self.candidates = candidates
+        self.user_message = user_message
+        self.conversation_history = conversation_history
+        self.session_id = session_id
+        self.outcome: Optional[str] = None
+    
+    def cancel(self, keep: Optional[str] = None) -> int:
+        """
+        Cancel every candidate except `keep`
+        
+        Returns:
+            Estimated completion tokens the cancelled candidates had used
+        """
+        wasted = 0
+        for emotion, candidate in self.candidates.items():
+            if emotion == keep:
+                continue
+            candidate.task.cancel()
+            wasted += candidate.tokens()
+        return wasted
+    
+    def abandon(self):
+        """Cancel every candidate if the request ended before resolve() (e.g. client gone)"""
+        if self.outcome is not None:
+            return
+        self.outcome = "abandoned"
+        self.owner.record(self.outcome, self.cancel())
+    
+    def resolve(self, emotion: str) -> AsyncIterator[Event]:
+        """
+        Reply events for the final emotion
+        
+        Same events as ResponseGenerator.stream_response(). A matching
+        candidate is replayed from its buffer; otherwise every candidate is
+        cancelled and a fresh stream is started.
+        
+        Args:
+            emotion: Final (fused) emotion
+        """
+        winner = self.candidates.get(emotion)
+        wasted = self.cancel(keep=emotion)
+        ranks = list(self.candidates)
+        self.outcome = "miss" if winner is None else ("win" if ranks.index(emotion) == 0 else "win_second")
+        self.owner.record(self.outcome, wasted)
+        if winner is None:
+            log.info(f"Speculation missed: {emotion} not in {ranks}")
+            return self.owner.generator.stream_response(
+                emotion=emotion,
+                user_message=self.user_message,
+                conversation_history=self.conversation_history,
+                session_id=self.session_id
+            )
+        return self._replay(winner)
+    
+    async def _replay(self, winner: _Candidate) -> AsyncIterator[Event]:
+        try:
+            async for event, payload in winner.replay():
+                if event == "done":
+                    self.owner.record_used(winner.tokens())
+                yield event, payload
+        finally:
+            # Client went away mid-stream
+            if not winner.finished:
+                winner.task.cancel()
+    
+    async def response(self, emotion: str) -> ChatResponse:
+        """Final ChatResponse for the emotion (non-streaming endpoints)"""
+        async for event, payload in self.resolve(emotion):
+            if event == "done":
+                return payload
+        raise RuntimeError("Reply stream ended without a response")
+
+
+class SpeculativeResponder:
+    """Starts reply streams for likely emotions before detection finishes"""
+    
+    def __init__(
+        self,
+        generator: ResponseGenerator,
+        enabled: bool = False,
+        top_k: int = 2,
+        min_probability: float = 0.15,
+        max_queue_depth: int = 1
+    ):
+        """
+        Args:
+            generator: Response generator whose stream_response() is speculated
+            enabled: Speculate at all (False = start() always returns None)
+            top_k: Candidate emotions per request
+            min_probability: Runner-up candidates need at least this probability
+            max_queue_depth: Only add runner-up streams while fewer calls wait on the rate limiter
+        """
+        self.generator = generator
+        self.enabled = enabled
+        self.top_k = top_k
+        self.min_probability = min_probability
+        self.max_queue_depth = max_queue_depth
+        self._counts = {"started": 0, "streams": 0, "win": 0, "win_second": 0, "miss": 0, "abandoned": 0}
+        self._wasted_tokens = 0
+        self._used_tokens = 0
+    
+    def candidates(self, vector: EmotionVector, settled: bool = False) -> List[str]:
+        """
+        Emotions worth a speculative stream, most likely first
+        
+        Args:
+            vector: Provisional (audio) emotion
+            settled: The provisional top-1 is already final (e.g. face skipped by the cascade)
+        """
+        ranked = vector.top_k(self.top_k)
+        chosen = [ranked[0][0]]
+        if settled or chat_limiter.queue_depth() >= self.max_queue_depth:
+            # No runner-up: either nothing can change the label or tokens are scarce
+            return chosen
+        chosen.extend(label for label, prob in ranked[1:] if prob >= self.min_probability)
+        return chosen
+    
+    def start(
+        self,
+        vector: EmotionVector,
+        user_message: Optional[str] = None,
+        conversation_history: Optional[List[Dict]] = None,
+        session_id: Optional[str] = None,
+        settled: bool = False
+    ) -> Optional[Speculation]:
+        """
+        Start reply streams for the provisional emotion's top candidates
+        
+        Args:
+            vector: Provisional (audio) emotion
+            user_message: Optional user message
+            conversation_history: Optional conversation history
+            session_id: Optional conversation session id
+            settled: The provisional top-1 is already final
+        
+        Returns:
+            Speculation to resolve with the final emotion, or None when disabled
+        """
+        if not self.enabled:
+            return None
+        emotions = self.candidates(vector, settled)
+        candidates = {
+            emotion: _Candidate(emotion, self.generator.stream_response(
+                emotion=emotion,
+                user_message=user_message,
+                conversation_history=conversation_history,
+                session_id=session_id
+            ))
+            for emotion in emotions
+        }
+        self._counts["started"] += 1
+        self._counts["streams"] += len(candidates)
+        metrics.increment("speculation_started")
+        metrics.increment("speculation_streams", len(candidates))
+        log.info(f"Speculating replies for {emotions}")
+        return Speculation(self, candidates, user_message, conversation_history, session_id)
+    
+    def record(self, outcome: str, wasted_tokens: int):
+        self._counts[outcome] += 1
+        self._wasted_tokens += wasted_tokens
+        metrics.increment(f"speculation_{outcome}")
+        metrics.increment("speculation_wasted_tokens", wasted_tokens)
+    
+    def record_used(self, tokens: int):
+        self._used_tokens += tokens
+    
+    def stats(self) -> Dict:
+        """Win rate (final emotion was a candidate) and token waste rate"""
+        resolved = self._counts["win"] + self._counts["win_second"] + self._counts["miss"]
+        spent = self._used_tokens + self._wasted_tokens
+        return {
+            "enabled": self.enabled,
+            **self._counts,
+            "win_rate": round((resolved - self._counts["miss"]) / resolved, 3) if resolved else None,
+            "wasted_tokens": self._wasted_tokens,
+            "waste_rate": round(self._wasted_tokens / spent, 3) if spent else None,
+        }
+
+
+# Global service instance
+speculative_responder = SpeculativeResponder(
+    response_generator,
+    enabled=settings.SPECULATIVE_REPLIES_ENABLED,
+    top_k=settings.SPECULATIVE_TOP_K,
+    min_probability=settings.SPECULATIVE_MIN_PROBABILITY,
+    max_queue_depth=settings.SPECULATIVE_MAX_QUEUE_DEPTH
+)
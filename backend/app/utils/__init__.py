@@ -1,8 +1,13 @@
 """
 Utilities module initialization
 """
+from app.utils.acoustic_features import *
 from app.utils.audio_processing import *
 from app.utils.image_processing import *
 from app.utils.emotion_mapping import *
+from app.utils.fusion_engine import *
+from app.utils.local_emotion import *
 from app.utils.file_handlers import *
 from app.utils.prompt_templates import *
+from app.utils.sse import *
+from app.utils.token_budget import *
@@ -0,0 +1,294 @@
+"""
+Vectorized acoustic feature engine with one shared framing / STFT per clip
+
+Every clip is framed once; RMS, zero-crossing rate and YIN pitch come from the
+time-domain frames, and spectral centroid and MFCCs from a single real FFT of
+those frames. Batch mode frames all clips into one matrix, so N clips cost the
+same handful of NumPy calls as one, and per-clip statistics are segment
+reductions over the stacked frames.
+"""
+import time
+import numpy as np
+from contextlib import contextmanager
+from typing import Dict, Optional, Sequence, Tuple
+from functools import lru_cache
+from scipy.fft import dct, irfft, rfft
+from app.core.constants import AUDIO_SAMPLE_RATE
+
+
+N_MFCC = 13
+
+# Order of the compact per-clip feature vector
+FEATURE_NAMES: Tuple[str, ...] = (
+    *(f"mfcc_{i}_mean" for i in range(N_MFCC)),
+    *(f"mfcc_{i}_std" for i in range(N_MFCC)),
+    "centroid_mean", "centroid_std",
+    "zcr_mean", "zcr_std",
+    "rms_mean", "rms_std",
+    "pitch_mean", "pitch_std", "voiced_fraction",
+    "speaking_rate", "duration",
+)
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+
+def _mel_filterbank(sr: int, n_fft: int, n_mels: int, fmin: float, fmax: float) -> np.ndarray:
+    """(n_mels, n_fft // 2 + 1) triangular mel filterbank (HTK mel scale)"""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + np.asarray(hz) / 700.0)
+    
+    def mel_to_hz(mel):
+        return 700.0 * (10.0 ** (np.asarray(mel) / 2595.0) - 1.0)
+    
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sr)
+    edges = mel_to_hz(np.linspace(hz_to_mel(fmin), hz_to_mel(fmax), n_mels + 2))
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (center - lower)
+    falling = (upper - bins) / (upper - center)
+    weights = np.maximum(0.0, np.minimum(rising, falling))
+    # Slaney-style area normalization so wide high bands don't dominate
+    weights *= (2.0 / (upper - lower))
+    return weights.astype(np.float32)
+
+
+class AcousticFeatureEngine:
+    """Per-clip acoustic features from a single framing of the signal"""
+    
+    def __init__(
+        self,
+        sr: int = AUDIO_SAMPLE_RATE,
+        frame_length: int = 512,
+        hop_length: int = 160,
+        n_mels: int = 40,
+        fmin_pitch: float = 70.0,
+        fmax_pitch: float = 400.0,
+        yin_threshold: float = 0.15,
+        silence_rms: float = 0.01
+    ):
+        """
+        Args:
+            sr: Sample rate clips are expected in
+            frame_length: Samples per frame (also the FFT size)
+            hop_length: Samples between frames
+            n_mels: Mel bands feeding the MFCCs
+            fmin_pitch: Lowest pitch searched by YIN (sets the longest lag)
+            fmax_pitch: Highest pitch searched by YIN
+            yin_threshold: YIN aperiodicity threshold for voiced frames
+            silence_rms: Frames quieter than this are never voiced
+        """
+        self.sr = sr
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.silence_rms = silence_rms
+        self.yin_threshold = yin_threshold
+        self.tau_min = max(int(sr / fmax_pitch), 2)
+        self.tau_max = min(int(sr / fmin_pitch), frame_length // 2)
+        # YIN compares the first `yin_window` samples with their lagged copy
+        self.yin_window = frame_length - self.tau_max
+        self.window = np.hanning(frame_length).astype(np.float32)
+        self.freqs = np.fft.rfftfreq(frame_length, 1.0 / sr).astype(np.float32)
+        self.mel = _mel_filterbank(sr, frame_length, n_mels, 0.0, sr / 2)
+        self.stage_ms: Dict[str, float] = {}
+    
+    @contextmanager
+    def _stage(self, name: str, timed: bool):
+        if not timed:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_ms[name] = self.stage_ms.get(name, 0.0) + (time.perf_counter() - start) * 1000
+    
+    def frame(self, y: np.ndarray) -> np.ndarray:
+        """(n_frames, frame_length) strided view of a clip (zero-padded to one frame)"""
+        y = np.asarray(y, dtype=np.float32)
+        if len(y) < self.frame_length:
+            y = np.pad(y, (0, self.frame_length - len(y)))
+        return np.lib.stride_tricks.sliding_window_view(y, self.frame_length)[::self.hop_length]
+    
+    def _yin(self, frames: np.ndarray, rms: np.ndarray) -> np.ndarray:
+        """Vectorized YIN over frames; 0 for unvoiced frames (silent frames are skipped)"""
+        pitch = np.zeros(len(frames), dtype=np.float32)
+        loud = np.flatnonzero(rms > self.silence_rms)
+        if not len(loud):
+            return pitch
+        frames = frames[loud]
+        window = self.yin_window
+        lags = self.tau_max + 1
+        
+        # Cross-correlation of each frame's head with every lagged copy, via FFT.
+        # window + tau_max == frame_length, so a frame-length FFT never wraps.
+        head = rfft(frames[:, :window], self.frame_length, axis=1)
+        full = rfft(frames, axis=1)
+        corr = irfft(np.conj(head) * full, self.frame_length, axis=1)[:, :lags]
+        
+        # Energy of the lagged windows from cumulative sums
+        power = np.concatenate([np.zeros((len(frames), 1), np.float32), np.cumsum(frames ** 2, axis=1)], axis=1)
+        taus = np.arange(lags)
+        lagged_energy = power[:, taus + window] - power[:, taus]
+        diff = power[:, window:window + 1] + lagged_energy - 2 * corr
+        diff[:, 0] = 0.0
+        
+        # Cumulative mean normalized difference
+        cumulative = np.cumsum(diff[:, 1:], axis=1)
+        cmnd = np.ones_like(diff)
+        cmnd[:, 1:] = diff[:, 1:] * np.arange(1, lags, dtype=np.float32) / np.maximum(cumulative, 1e-10)
+        
+        # First lag under the threshold (else the global minimum) in the search band
+        band = cmnd[:, self.tau_min:]
+        below = band < self.yin_threshold
+        first = np.where(below.any(axis=1), below.argmax(axis=1), band.argmin(axis=1))
+        # Walk to the bottom of that dip
+        rows = np.arange(len(frames))
+        last = band.shape[1] - 1
+        while True:
+            step = np.minimum(first + 1, last)
+            better = band[rows, step] < band[rows, first]
+            if not better.any():
+                break
+            first = np.where(better, step, first)
+        
+        # Parabolic interpolation around the dip for a sub-sample lag
+        left = band[rows, np.maximum(first - 1, 0)]
+        mid = band[rows, first]
+        right = band[rows, np.minimum(first + 1, last)]
+        curvature = left - 2 * mid + right
+        offset = np.where(curvature > 1e-10, 0.5 * (left - right) / np.maximum(curvature, 1e-10), 0.0)
+        lag = first + self.tau_min + np.clip(offset, -0.5, 0.5)
+        
+        voiced = mid < self.yin_threshold
+        pitch[loud[voiced]] = self.sr / lag[voiced]
+        return pitch
+    
+    def frame_features(self, frames: np.ndarray, timed: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Frame-level features from one shared framing
+        
+        Args:
+            frames: (n_frames, frame_length) frames
+            timed: Accumulate per-feature time in stage_ms
+        
+        Returns:
+            Dict of per-frame arrays: rms, zcr, centroid, pitch (n_frames,) and mfcc (n_frames, N_MFCC)
+        """
+        frames = np.asarray(frames, dtype=np.float32)
+        with self._stage("rms", timed):
+            rms = np.sqrt(np.mean(frames ** 2, axis=1))
+        with self._stage("zcr", timed):
+            signs = np.signbit(frames)
+            zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame_length - 1)
+        with self._stage("stft", timed):
+            # The one FFT shared by centroid and MFCC
+            power = np.abs(rfft(frames * self.window, axis=1)) ** 2
+        with self._stage("centroid", timed):
+            magnitude = np.sqrt(power)
+            centroid = (magnitude @ self.freqs) / np.maximum(magnitude.sum(axis=1), 1e-10)
+        with self._stage("mfcc", timed):
+            log_mel = 10.0 * np.log10(np.maximum(power @ self.mel.T, 1e-10))
+            mfcc = dct(log_mel, type=2, norm="ortho", axis=1)[:, :N_MFCC]
+        with self._stage("pitch", timed):
+            pitch = self._yin(frames, rms)
+        return {
+            "rms": rms.astype(np.float32),
+            "zcr": zcr.astype(np.float32),
+            "centroid": centroid.astype(np.float32),
+            "mfcc": mfcc.astype(np.float32),
+            "pitch": pitch,
+        }
+    
+    def _speaking_rate(self, rms: np.ndarray, pitch: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """Syllable-nucleus rate per clip: voiced energy peaks per second of clip"""
+        # ~50 ms moving average of the energy envelope (per clip edges blur a few frames)
+        width = max(int(0.05 * self.sr / self.hop_length), 1)
+        envelope = np.convolve(rms, np.ones(width, np.float32) / width, mode="same")
+        mean_energy = np.repeat(np.add.reduceat(envelope, starts) / counts, counts)
+        
+        peak = np.zeros(len(envelope), dtype=bool)
+        peak[1:-1] = (envelope[1:-1] > envelope[:-2]) & (envelope[1:-1] >= envelope[2:])
+        peak &= (envelope > mean_energy) & (pitch > 0)
+        # No two nuclei closer than ~100 ms
+        gap = max(int(0.1 * self.sr / self.hop_length), 1)
+        idx = np.flatnonzero(peak)
+        if len(idx):
+            keep = np.concatenate([[True], np.diff(idx) >= gap])
+            idx = idx[keep]
+        clip_of = np.repeat(np.arange(len(starts)), counts)
+        nuclei = np.bincount(clip_of[idx], minlength=len(starts))
+        seconds = np.maximum((counts * self.hop_length + self.frame_length - self.hop_length) / self.sr, 1e-6)
+        return (nuclei / seconds).astype(np.float32)
+    
+    def extract_batch(self, clips: Sequence[np.ndarray], timed: bool = False) -> np.ndarray:
+        """
+        Compact feature vectors for many clips at once
+        
+        Args:
+            clips: Mono float clips at self.sr
+            timed: Accumulate per-feature time in stage_ms
+        
+        Returns:
+            (N, len(FEATURE_NAMES)) float32 matrix in FEATURE_NAMES order
+        """
+        with self._stage("framing", timed):
+            framed = [self.frame(clip) for clip in clips]
+            counts = np.array([len(f) for f in framed])
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            frames = np.concatenate(framed)
+        
+        f = self.frame_features(frames, timed)
+        
+        with self._stage("summary", timed):
+            def mean_std(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+                values = values.reshape(len(values), -1).astype(np.float64)
+                mean = np.add.reduceat(values, starts, axis=0) / counts[:, None]
+                sq = np.add.reduceat(values ** 2, starts, axis=0) / counts[:, None]
+                return mean, np.sqrt(np.maximum(sq - mean ** 2, 0.0))
+            
+            mfcc_mean, mfcc_std = mean_std(f["mfcc"])
+            stats = [mean_std(f[name]) for name in ("centroid", "zcr", "rms")]
+            
+            voiced = (f["pitch"] > 0).astype(np.float64)
+            voiced_count = np.add.reduceat(voiced, starts)
+            pitch_sum = np.add.reduceat(f["pitch"].astype(np.float64), starts)
+            pitch_sq = np.add.reduceat(f["pitch"].astype(np.float64) ** 2, starts)
+            pitch_mean = pitch_sum / np.maximum(voiced_count, 1)
+            pitch_std = np.sqrt(np.maximum(pitch_sq / np.maximum(voiced_count, 1) - pitch_mean ** 2, 0.0))
+            
+            durations = np.array([len(clip) / self.sr for clip in clips])
+            columns = [
+                mfcc_mean, mfcc_std,
+                *(column for pair in stats for column in pair),
+                pitch_mean[:, None], pitch_std[:, None], (voiced_count / counts)[:, None],
+                self._speaking_rate(f["rms"], f["pitch"], starts, counts)[:, None],
+                durations[:, None],
+            ]
+            return np.hstack(columns).astype(np.float32)
+    
+    def extract(self, y: np.ndarray, timed: bool = False) -> np.ndarray:
+        """
+        Compact feature vector for one clip
+        
+        Args:
+            y: Mono float clip at self.sr
+            timed: Accumulate per-feature time in stage_ms
+        
+        Returns:
+            (len(FEATURE_NAMES),) float32 vector
+        """
+        return self.extract_batch([y], timed)[0]
+    
+    @staticmethod
+    def as_dict(vector: np.ndarray, names: Optional[Sequence[str]] = None) -> Dict[str, float]:
+        """Named view of a feature vector (all features, or just `names`)"""
+        names = names or FEATURE_NAMES
+        return {name: float(vector[FEATURE_INDEX[name]]) for name in names}
+
+
+@lru_cache(maxsize=8)
+def engine_for(sr: int) -> AcousticFeatureEngine:
+    """Shared engine for a sample rate (filterbanks are built once)"""
+    return AcousticFeatureEngine(sr=sr)
+
+
+# Shared engine for the service's sample rate
+feature_engine = engine_for(AUDIO_SAMPLE_RATE)
@@ -9,6 +9,7 @@ from pydub import AudioSegment
 from app.core.logging_config import log
 from app.core.exceptions import AudioProcessingError
 from app.core.constants import AUDIO_SAMPLE_RATE
+from app.utils.acoustic_features import engine_for
 
 
 def convert_to_wav(input_path: str, output_path: str = None) -> str:
@@ -94,35 +95,29 @@ def get_audio_duration(audio_path: str) -> float:
 
 def extract_audio_features(audio_data: np.ndarray, sr: int) -> dict:
     """
-    Extract features from audio (optional - for future use)
+    Extract frame-level features from audio
+    
+    All features share one framing and one FFT (see AcousticFeatureEngine).
     
     Args:
         audio_data: Audio samples
         sr: Sample rate
         
     Returns:
-        Dictionary of audio features
+        Dictionary of audio features, each (n_features, n_frames)
     """
     try:
-        features = {}
-        
-        # MFCCs
-        mfccs = librosa.feature.mfcc(y=audio_data, sr=sr, n_mfcc=13)
-        features['mfccs'] = mfccs
-        
-        # Zero crossing rate
-        zcr = librosa.feature.zero_crossing_rate(audio_data)
-        features['zcr'] = zcr
-        
-        # Spectral centroid
-        spectral_centroids = librosa.feature.spectral_centroid(y=audio_data, sr=sr)
-        features['spectral_centroid'] = spectral_centroids
-        
-        # RMS energy
-        rms = librosa.feature.rms(y=audio_data)
-        features['rms'] = rms
-        
-        return features
+        engine = engine_for(sr)
+        frames = engine.frame(np.asarray(audio_data, dtype=np.float32))
+        frame_features = engine.frame_features(frames)
+        
+        return {
+            'mfccs': frame_features['mfcc'].T,
+            'zcr': frame_features['zcr'][None, :],
+            'spectral_centroid': frame_features['centroid'][None, :],
+            'rms': frame_features['rms'][None, :],
+            'pitch': frame_features['pitch'][None, :],
+        }
         
     except Exception as e:
         log.error(f"Feature extraction failed: {str(e)}")
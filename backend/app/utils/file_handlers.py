@@ -9,6 +9,7 @@ from fastapi import UploadFile
 from app.config import settings
 from app.core.logging_config import log
 from app.core.exceptions import FileValidationError
+from app.core.executors import io_executor, run_in_executor
 
 
 def validate_audio_file(file: UploadFile) -> bool:
@@ -73,12 +74,19 @@ def validate_image_file(file: UploadFile) -> bool:
     return True
 
 
-async def save_upload_file(file: UploadFile, file_type: str = "audio") -> str:
+def _write_bytes(file_path: Path, content: bytes):
+    """Write bytes to disk (runs on the file I/O pool)"""
+    with open(file_path, "wb") as f:
+        f.write(content)
+
+
+async def save_upload_bytes(content: bytes, filename: str, file_type: str = "audio") -> str:
     """
-    Save uploaded file to temporary storage
+    Save already-read upload bytes to temporary storage
     
     Args:
-        file: Uploaded file
+        content: File content
+        filename: Original filename (its extension is kept)
         file_type: Type of file ("audio" or "image")
         
     Returns:
@@ -86,7 +94,7 @@ async def save_upload_file(file: UploadFile, file_type: str = "audio") -> str:
     """
     try:
         # Create unique filename
-        file_ext = Path(file.filename).suffix
+        file_ext = Path(filename or "").suffix
         unique_filename = f"{uuid.uuid4()}{file_ext}"
         
         # Determine save directory
@@ -100,10 +108,7 @@ async def save_upload_file(file: UploadFile, file_type: str = "audio") -> str:
         
         # Save file
         file_path = save_dir / unique_filename
-        
-        content = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(content)
+        await run_in_executor(io_executor, _write_bytes, file_path, content)
         
         log.info(f"File saved: {file_path}")
         return str(file_path)
@@ -113,6 +118,25 @@ async def save_upload_file(file: UploadFile, file_type: str = "audio") -> str:
         raise FileValidationError(f"Failed to save file: {str(e)}")
 
 
+async def save_upload_file(file: UploadFile, file_type: str = "audio") -> str:
+    """
+    Save uploaded file to temporary storage
+    
+    Args:
+        file: Uploaded file
+        file_type: Type of file ("audio" or "image")
+        
+    Returns:
+        Path to saved file
+    """
+    try:
+        content = await file.read()
+    except Exception as e:
+        log.error(f"Failed to save file: {str(e)}")
+        raise FileValidationError(f"Failed to save file: {str(e)}")
+    return await save_upload_bytes(content, file.filename, file_type)
+
+
 def cleanup_old_files():
     """
     Clean up old temporary files
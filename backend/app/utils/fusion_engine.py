@@ -0,0 +1,203 @@
+"""
+Probability-level emotion fusion on fixed-order vectors
+
+Emotion probabilities are handled as float32 vectors in EMOTION_LABELS order,
+so fusing one pair or thousands of pairs is the same handful of NumPy ops.
+The decision rules match combine_emotions() (agreement, dominance margin,
+weighted tie-break), so fusion_method values are unchanged.
+"""
+import numpy as np
+from typing import Dict, Mapping, NamedTuple, Optional, Sequence, Tuple
+from app.core.constants import EMOTION_LABELS
+from app.utils.emotion_mapping import normalize_emotion_label
+
+
+NUM_EMOTIONS = len(EMOTION_LABELS)
+EMOTION_INDEX = {label: i for i, label in enumerate(EMOTION_LABELS)}
+
+# Method codes returned by fuse_batch() index into this tuple
+FUSION_METHODS = (
+    "agreement",
+    "audio_dominant",
+    "face_dominant",
+    "audio_weighted",
+    "face_weighted",
+)
+
+
+class FusionResult(NamedTuple):
+    """Result of fusing a single audio/face pair"""
+    emotion: str
+    confidence: float
+    method: str
+    probabilities: np.ndarray
+
+
+class BatchFusionResult(NamedTuple):
+    """Result of fusing N audio/face pairs"""
+    emotion_idx: np.ndarray    # (N,) index into EMOTION_LABELS
+    confidence: np.ndarray     # (N,) float32
+    method_idx: np.ndarray     # (N,) index into FUSION_METHODS
+    probabilities: np.ndarray  # (N, NUM_EMOTIONS) weighted fused distribution
+
+
+def build_label_projection(id2label: Mapping[int, str]) -> np.ndarray:
+    """
+    Precompute a projection from a model's output order to EMOTION_LABELS order
+    
+    Labels are normalized once here (e.g. "calm" -> "neutral", "fearful" -> "fear"),
+    so per-request code never touches label strings. Classes that map to the
+    same standard emotion are summed by the projection.
+    
+    Args:
+        id2label: Model config mapping of output index to label
+    
+    Returns:
+        (n_model_labels, NUM_EMOTIONS) float32 one-hot projection matrix
+    """
+    projection = np.zeros((len(id2label), NUM_EMOTIONS), dtype=np.float32)
+    for idx, label in id2label.items():
+        target = EMOTION_INDEX.get(normalize_emotion_label(label), EMOTION_INDEX["neutral"])
+        projection[int(idx), target] = 1.0
+    return projection
+
+
+def vector_from_dict(probabilities: Dict[str, float]) -> np.ndarray:
+    """
+    Convert a label -> probability dict into a fixed-order vector
+    
+    Args:
+        probabilities: Emotion probabilities keyed by label
+    
+    Returns:
+        (NUM_EMOTIONS,) float32 vector
+    """
+    vector = np.zeros(NUM_EMOTIONS, dtype=np.float32)
+    for label, score in probabilities.items():
+        idx = EMOTION_INDEX.get(normalize_emotion_label(label))
+        if idx is not None:
+            vector[idx] += score
+    return vector
+
+
+def vector_to_dict(vector: np.ndarray) -> Dict[str, float]:
+    """Convert a fixed-order vector back to a label -> probability dict"""
+    return {label: float(score) for label, score in zip(EMOTION_LABELS, vector.tolist())}
+
+
+class FusionEngine:
+    """Vectorized audio/face emotion fusion"""
+    
+    def __init__(
+        self,
+        audio_weight: float = 0.6,
+        face_weight: float = 0.4,
+        dominance_margin: float = 0.3
+    ):
+        self.audio_weight = np.float32(audio_weight)
+        self.face_weight = np.float32(face_weight)
+        self.dominance_margin = np.float32(dominance_margin)
+    
+    def fuse_batch(self, audio_probs: np.ndarray, face_probs: np.ndarray) -> BatchFusionResult:
+        """
+        Fuse N audio/face probability pairs at once
+        
+        Args:
+            audio_probs: (N, NUM_EMOTIONS) audio probabilities
+            face_probs: (N, NUM_EMOTIONS) face probabilities
+        
+        Returns:
+            BatchFusionResult
+        """
+        audio = np.atleast_2d(np.asarray(audio_probs, dtype=np.float32))
+        face = np.atleast_2d(np.asarray(face_probs, dtype=np.float32))
+        rows = np.arange(audio.shape[0])
+        
+        audio_idx = audio.argmax(axis=1)
+        face_idx = face.argmax(axis=1)
+        audio_conf = audio[rows, audio_idx]
+        face_conf = face[rows, face_idx]
+        
+        agree = audio_idx == face_idx
+        audio_wins = audio_conf > face_conf
+        dominant = ~agree & (np.abs(audio_conf - face_conf) > self.dominance_margin)
+        
+        emotion_idx = np.where(agree | audio_wins, audio_idx, face_idx)
+        confidence = np.where(
+            agree,
+            (audio_conf + face_conf) / 2,
+            np.where(
+                dominant,
+                np.where(audio_wins, audio_conf, face_conf),
+                audio_conf * self.audio_weight + face_conf * self.face_weight
+            )
+        ).astype(np.float32)
+        method_idx = np.where(
+            agree, 0,
+            np.where(dominant, np.where(audio_wins, 1, 2), np.where(audio_wins, 3, 4))
+        )
+        
+        total_weight = self.audio_weight + self.face_weight
+        fused = (audio * self.audio_weight + face * self.face_weight) / total_weight
+        
+        return BatchFusionResult(emotion_idx, confidence, method_idx, fused)
+    
+    def fuse(self, audio_probs: np.ndarray, face_probs: np.ndarray) -> FusionResult:
+        """
+        Fuse a single audio/face probability pair
+        
+        Args:
+            audio_probs: (NUM_EMOTIONS,) audio probabilities
+            face_probs: (NUM_EMOTIONS,) face probabilities
+        
+        Returns:
+            FusionResult
+        """
+        result = self.fuse_batch(audio_probs, face_probs)
+        return FusionResult(
+            emotion=EMOTION_LABELS[int(result.emotion_idx[0])],
+            confidence=float(result.confidence[0]),
+            method=FUSION_METHODS[int(result.method_idx[0])],
+            probabilities=result.probabilities[0]
+        )
+    
+    @staticmethod
+    def labels(emotion_idx: np.ndarray) -> np.ndarray:
+        """Map an array of emotion indices to label strings"""
+        return np.asarray(EMOTION_LABELS)[emotion_idx]
+    
+    @staticmethod
+    def methods(method_idx: np.ndarray) -> np.ndarray:
+        """Map an array of method codes to fusion_method strings"""
+        return np.asarray(FUSION_METHODS)[method_idx]
+
+
+def mix_sources(
+    vectors: Sequence[Optional[np.ndarray]],
+    weights: Sequence[float]
+) -> Tuple[Optional[np.ndarray], np.ndarray]:
+    """
+    Weighted mixture of per-source emotion distributions
+    
+    Missing sources (None) are skipped and the remaining weights renormalized,
+    so a clip without a transcript is labeled from voice alone.
+    
+    Args:
+        vectors: (NUM_EMOTIONS,) distributions or None, one per source
+        weights: Weight per source
+    
+    Returns:
+        (mixed distribution or None if no source is available, effective weights)
+    """
+    present = np.array([v is not None for v in vectors])
+    effective = np.where(present, np.asarray(weights, dtype=np.float32), 0).astype(np.float32)
+    total = effective.sum()
+    if total <= 0:
+        return None, effective
+    effective /= total
+    stacked = np.stack([
+        np.asarray(v, dtype=np.float32) / max(float(np.sum(v)), 1e-6) if v is not None
+        else np.zeros(NUM_EMOTIONS, dtype=np.float32)
+        for v in vectors
+    ])
+    return effective @ stacked, effective
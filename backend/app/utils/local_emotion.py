@@ -0,0 +1,141 @@
+"""
+Local emotion signals from transcripts and acoustic features
+
+Lightweight, dependency-free stand-ins for the upstream LLM labeler: a small
+emotion lexicon with negation and intensifier handling for transcripts, and
+an arousal prior from loudness / zero-crossing features. Both return
+distributions in EMOTION_LABELS order for mix_sources().
+"""
+import re
+import numpy as np
+from typing import Dict, Optional
+from app.utils.fusion_engine import EMOTION_INDEX, NUM_EMOTIONS
+
+
+# Word -> emotion cues (lower case; Hinglish cues included for the voice chat)
+EMOTION_LEXICON: Dict[str, str] = {
+    **dict.fromkeys([
+        "happy", "glad", "great", "awesome", "amazing", "excited", "love", "loved", "fun",
+        "wonderful", "fantastic", "yay", "proud", "good", "nice", "joy", "cheerful",
+        "celebrate", "won", "win", "khush", "mast", "badhiya",
+    ], "happy"),
+    **dict.fromkeys([
+        "sad", "unhappy", "depressed", "down", "lonely", "alone", "cry", "crying", "miss",
+        "lost", "hurt", "tired", "exhausted", "hopeless", "heartbroken", "upset", "bad",
+        "awful", "sorry", "dukhi", "udaas",
+    ], "sad"),
+    **dict.fromkeys([
+        "angry", "mad", "furious", "annoyed", "irritated", "hate", "frustrated", "rage",
+        "pissed", "stupid", "unfair", "gussa",
+    ], "angry"),
+    **dict.fromkeys([
+        "scared", "afraid", "fear", "anxious", "nervous", "worried", "worry", "panic",
+        "terrified", "stress", "stressed", "exam", "deadline", "dar", "tension",
+    ], "fear"),
+    **dict.fromkeys([
+        "surprised", "wow", "unexpected", "shocked", "suddenly", "whoa", "unbelievable",
+        "omg",
+    ], "surprise"),
+    **dict.fromkeys([
+        "gross", "disgusting", "disgusted", "yuck", "eww", "nasty", "revolting", "ugh",
+    ], "disgust"),
+}
+
+NEGATIONS = {"not", "no", "never", "dont", "don't", "isnt", "isn't", "wasnt", "wasn't", "cant", "can't", "nahi"}
+INTENSIFIERS = {"very", "so", "really", "extremely", "super", "totally", "bahut"}
+
+# Negated positive cues read as sad; negated negative cues fade toward neutral
+_NEGATED = {"happy": "sad"}
+
+_WORD = re.compile(r"[a-z']+")
+
+# Arousal extremes the acoustic prior interpolates between
+_HIGH_AROUSAL = {"angry": 0.3, "happy": 0.25, "surprise": 0.2, "fear": 0.15, "neutral": 0.1}
+_LOW_AROUSAL = {"sad": 0.4, "neutral": 0.45, "disgust": 0.05, "fear": 0.1}
+
+
+def _distribution(weights: Dict[str, float]) -> np.ndarray:
+    vector = np.zeros(NUM_EMOTIONS, dtype=np.float32)
+    for label, weight in weights.items():
+        vector[EMOTION_INDEX[label]] += weight
+    return vector / vector.sum()
+
+
+HIGH_AROUSAL_PRIOR = _distribution(_HIGH_AROUSAL)
+LOW_AROUSAL_PRIOR = _distribution(_LOW_AROUSAL)
+
+
+def text_emotion_vector(text: Optional[str], smoothing: float = 0.25) -> Optional[np.ndarray]:
+    """
+    Emotion distribution from lexicon cues in a transcript
+    
+    Args:
+        text: Transcript or message
+        smoothing: Pseudo-count added to every emotion (fewer cues = flatter)
+    
+    Returns:
+        (NUM_EMOTIONS,) float32 distribution, or None when no cue words occur
+    """
+    if not text:
+        return None
+    counts = np.zeros(NUM_EMOTIONS, dtype=np.float32)
+    negate_left = 0
+    boost = 1.0
+    hits = 0
+    for word in _WORD.findall(text.lower()):
+        if word in NEGATIONS:
+            negate_left = 3
+            continue
+        if word in INTENSIFIERS:
+            boost = 1.5
+            continue
+        emotion = EMOTION_LEXICON.get(word)
+        if emotion is not None:
+            if negate_left:
+                emotion = _NEGATED.get(emotion, "neutral")
+            counts[EMOTION_INDEX[emotion]] += boost
+            hits += 1
+        boost = 1.0
+        negate_left = max(negate_left - 1, 0)
+    if not hits:
+        return None
+    counts += smoothing
+    return counts / counts.sum()
+
+
+def arousal_from_features(features: Dict[str, float]) -> float:
+    """
+    0..1 arousal estimate from loudness, zero-crossing rate and prosody
+    
+    Pitch variability and speaking rate join in when the features carry them.
+    
+    Args:
+        features: Acoustic features with rms_mean and zcr_mean (optionally
+            pitch_std and speaking_rate)
+    
+    Returns:
+        Arousal (0 = calm/soft, 1 = energetic/loud)
+    """
+    loudness = np.clip((features.get("rms_mean", 0.0) - 0.01) / 0.09, 0.0, 1.0)
+    brightness = np.clip((features.get("zcr_mean", 0.0) - 0.03) / 0.12, 0.0, 1.0)
+    energy = 0.8 * loudness + 0.2 * brightness
+    if "pitch_std" not in features or "speaking_rate" not in features:
+        return float(energy)
+    # Lively intonation (~10-60 Hz spread) and fast pacing (~2-6 syllables/s)
+    intonation = np.clip((features["pitch_std"] - 10.0) / 50.0, 0.0, 1.0)
+    pace = np.clip((features["speaking_rate"] - 2.0) / 4.0, 0.0, 1.0)
+    return float(0.7 * energy + 0.15 * intonation + 0.15 * pace)
+
+
+def acoustic_emotion_vector(features: Dict[str, float]) -> np.ndarray:
+    """
+    Weak emotion prior from acoustic arousal
+    
+    Args:
+        features: Acoustic features with rms_mean and zcr_mean
+    
+    Returns:
+        (NUM_EMOTIONS,) float32 distribution
+    """
+    arousal = arousal_from_features(features)
+    return (arousal * HIGH_AROUSAL_PRIOR + (1 - arousal) * LOW_AROUSAL_PRIOR).astype(np.float32)
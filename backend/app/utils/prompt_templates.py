@@ -2,14 +2,17 @@
 Prompt templates for Groq API responses
 """
 from app.utils.emotion_mapping import get_emotion_strategy
+from app.utils.token_budget import fit_messages
+from typing import Optional
 
 
-def create_system_prompt(emotion: str) -> str:
+def create_system_prompt(emotion: str, persona: Optional[str] = None) -> str:
     """
     Create system prompt based on detected emotion
     
     Args:
         emotion: Detected emotion
+        persona: Optional extra instructions (character voice, signal context)
         
     Returns:
         System prompt string
@@ -36,6 +39,9 @@ Guidelines:
 
 Remember: You're here to be a supportive presence, not to solve all their problems."""
     
+    if persona:
+        system_prompt += f"\n\n{persona}"
+    
     return system_prompt
 
 
@@ -69,13 +75,14 @@ def create_user_prompt(user_message: str = None, emotion: str = None) -> str:
     return "Hello!"
 
 
-def create_conversation_context(emotion: str, previous_messages: list = None) -> str:
+def create_conversation_context(emotion: str, previous_messages: list = None, max_tokens: int = 300) -> str:
     """
     Create conversation context for Groq
     
     Args:
         emotion: Current detected emotion
         previous_messages: Previous conversation messages
+        max_tokens: Token budget for the quoted messages (newest kept first)
         
     Returns:
         Context string
@@ -84,7 +91,8 @@ def create_conversation_context(emotion: str, previous_messages: list = None) ->
     
     if previous_messages and len(previous_messages) > 0:
         context_parts.append("\nPrevious conversation:")
-        for msg in previous_messages[-3:]:  # Last 3 messages
+        start = fit_messages(previous_messages, max_tokens)
+        for msg in previous_messages[start:]:
             role = msg.get('role', 'user')
             content = msg.get('content', '')
             context_parts.append(f"{role}: {content}")
@@ -0,0 +1,30 @@
+"""
+Server-Sent Events helpers
+"""
+import json
+from typing import Any
+from pydantic import BaseModel
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # Disable proxy buffering (nginx)
+}
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    Format a single SSE frame
+    
+    Args:
+        event: Event name
+        data: Payload (pydantic model, dict or string), sent as JSON
+        
+    Returns:
+        Encoded SSE frame
+    """
+    if isinstance(data, BaseModel):
+        payload = data.model_dump_json()
+    else:
+        payload = json.dumps(data)
+    return f"event: {event}\ndata: {payload}\n\n"
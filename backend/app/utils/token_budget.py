@@ -0,0 +1,57 @@
+"""
+Local token counting and budget fitting for prompt assembly
+"""
+import re
+from typing import Dict, List
+
+
+# Word pieces and individual punctuation marks, roughly how BPE tokenizers split text
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Per-message framing overhead (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate the token count of a string without a tokenizer download
+    
+    Takes the larger of the word/punctuation count and chars / 4, which
+    tracks Llama-family tokenizers closely enough for budgeting.
+    
+    Args:
+        text: Input text
+    
+    Returns:
+        Estimated token count
+    """
+    if not text:
+        return 0
+    return max(len(_TOKEN_PATTERN.findall(text)), (len(text) + 3) // 4)
+
+
+def message_tokens(message: Dict) -> int:
+    """Estimated tokens for one chat message including framing"""
+    return estimate_tokens(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS
+
+
+def fit_messages(messages: List[Dict], budget: int) -> int:
+    """
+    Find how many trailing messages fit in a token budget
+    
+    Args:
+        messages: Messages, oldest first
+        budget: Token budget
+    
+    Returns:
+        Split index: messages[split:] fit, messages[:split] do not
+    """
+    used = 0
+    split = len(messages)
+    while split > 0:
+        cost = message_tokens(messages[split - 1])
+        if used + cost > budget:
+            break
+        used += cost
+        split -= 1
+    return split
@@ -0,0 +1,89 @@
+"""
+Benchmark acoustic feature extraction: separate librosa calls vs the shared-STFT engine
+
+Usage:
+    python scripts/benchmark_audio_features.py                 # synthetic 5 s clips
+    python scripts/benchmark_audio_features.py a.wav b.wav     # your own clips
+"""
+import sys
+import time
+import numpy as np
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import librosa
+from app.core.constants import AUDIO_SAMPLE_RATE
+from app.utils.acoustic_features import engine_for
+
+
+def synthetic_clips(count: int = 8, seconds: float = 5.0, sr: int = AUDIO_SAMPLE_RATE) -> list:
+    """Voiced-ish test clips: a gliding tone with a syllable envelope plus noise"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sr)) / sr
+    clips = []
+    for i in range(count):
+        f0 = 110 + 20 * i + 15 * np.sin(2 * np.pi * 0.5 * t)
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * (3 + i % 3) * t)
+        voice = np.sin(2 * np.pi * np.cumsum(f0) / sr) * envelope
+        clips.append((0.3 * voice + 0.01 * rng.standard_normal(len(t))).astype(np.float32))
+    return clips
+
+
+def librosa_features(y: np.ndarray, sr: int, timings: dict):
+    """The separate per-feature librosa calls (each re-frames or re-runs the STFT)"""
+    calls = {
+        "mfcc": lambda: librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13),
+        "zcr": lambda: librosa.feature.zero_crossing_rate(y),
+        "centroid": lambda: librosa.feature.spectral_centroid(y=y, sr=sr),
+        "rms": lambda: librosa.feature.rms(y=y),
+        "pitch": lambda: librosa.yin(y, fmin=70, fmax=400, sr=sr),
+    }
+    for name, call in calls.items():
+        start = time.perf_counter()
+        call()
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def main():
+    sr = AUDIO_SAMPLE_RATE
+    if len(sys.argv) > 1:
+        clips = [librosa.load(path, sr=sr)[0] for path in sys.argv[1:]]
+    else:
+        clips = synthetic_clips(sr=sr)
+    engine = engine_for(sr)
+    audio_seconds = sum(len(clip) for clip in clips) / sr
+    
+    # Warm up (numba JIT in librosa, FFT plans)
+    librosa_features(clips[0], sr, {})
+    engine.extract(clips[0])
+    
+    librosa_ms = {}
+    start = time.perf_counter()
+    for clip in clips:
+        librosa_features(clip, sr, librosa_ms)
+    librosa_total = (time.perf_counter() - start) * 1000
+    
+    engine.stage_ms.clear()
+    start = time.perf_counter()
+    for clip in clips:
+        engine.extract(clip, timed=True)
+    engine_total = (time.perf_counter() - start) * 1000
+    engine_ms = dict(engine.stage_ms)
+    
+    start = time.perf_counter()
+    engine.extract_batch(clips)
+    batch_total = (time.perf_counter() - start) * 1000
+    
+    print(f"{len(clips)} clips, {audio_seconds:.1f} s of audio at {sr} Hz\n")
+    print(f"{'stage':<12}{'librosa ms':>12}{'engine ms':>12}")
+    for name in sorted(set(librosa_ms) | set(engine_ms)):
+        print(f"{name:<12}{librosa_ms.get(name, 0.0):>12.1f}{engine_ms.get(name, 0.0):>12.1f}")
+    print(f"\n{'librosa (separate calls)':<28}{librosa_total:>10.1f} ms")
+    print(f"{'engine (per clip)':<28}{engine_total:>10.1f} ms  ({librosa_total / engine_total:.1f}x)")
+    print(f"{'engine (one batch)':<28}{batch_total:>10.1f} ms  ({librosa_total / batch_total:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark per-request middleware overhead on GET /health
+
+Compares the app with no middleware, the previous BaseHTTPMiddleware stack
+and the current pure-ASGI stack, calling the ASGI app directly (no network)
+so only framework and middleware cost is measured. Log lines go to a null
+sink, so formatting cost is counted but nothing is printed.
+
+Usage:
+    python scripts/benchmark_middleware.py [requests]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.cors import CORSMiddleware
+from app.api.middleware import setup_middleware
+from app.api.routes import health
+from app.config import settings
+from app.core.exceptions import MoodifyException
+from app.core.logging_config import log
+from app.core.resilience import request_deadline
+
+
+# --- Previous stack (BaseHTTPMiddleware), kept here for comparison ---
+
+class LegacyErrorHandlingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        try:
+            return await call_next(request)
+        except MoodifyException as e:
+            log.error(f"Moodify exception: {e.message}")
+            return JSONResponse(status_code=e.status_code, content={"error": e.message, "type": type(e).__name__})
+        except Exception as e:
+            log.error(f"Unhandled exception: {str(e)}")
+            return JSONResponse(status_code=500, content={"error": "Internal server error", "detail": str(e)})
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        log.info(f"Request: {request.method} {request.url.path}")
+        response = await call_next(request)
+        duration = time.time() - start_time
+        log.info(f"Response: {request.method} Status: {response.status_code} Duration: {duration:.2f}s")
+        return response
+
+
+class LegacyDeadlineMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        token = request_deadline.set(time.monotonic() + settings.REQUEST_LATENCY_BUDGET_SECONDS)
+        try:
+            return await call_next(request)
+        finally:
+            request_deadline.reset(token)
+
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+    app.include_router(health.router)
+    if stack == "legacy":
+        app.add_middleware(LegacyDeadlineMiddleware)
+        app.add_middleware(LegacyLoggingMiddleware)
+        app.add_middleware(LegacyErrorHandlingMiddleware)
+        app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    elif stack == "current":
+        setup_middleware(app)
+    return app
+
+
+async def call(app: FastAPI):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/health", "raw_path": b"/health",
+        "query_string": b"", "root_path": "", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+    }
+    sent = False
+    
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(3600)
+    
+    async def send(message):
+        pass
+    
+    await app(scope, receive, send)
+
+
+async def measure(app: FastAPI, requests: int) -> list:
+    for _ in range(200):
+        await call(app)
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await call(app)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    log.remove()
+    log.add(lambda message: None, level="INFO")
+    
+    results = {}
+    for stack in ("bare", "legacy", "current"):
+        samples = asyncio.run(measure(build_app(stack), requests))
+        samples.sort()
+        results[stack] = statistics.mean(samples)
+        print(
+            f"{stack:<8} mean {results[stack]:7.1f} us   p50 {samples[len(samples) // 2]:7.1f} us   "
+            f"p99 {samples[int(len(samples) * 0.99)]:7.1f} us"
+        )
+    
+    legacy_overhead = results["legacy"] - results["bare"]
+    current_overhead = results["current"] - results["bare"]
+    print(f"\nMiddleware overhead per request: legacy {legacy_overhead:.1f} us, current {current_overhead:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
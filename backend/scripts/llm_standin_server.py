@@ -0,0 +1,231 @@
+"""
+Local stand-in for an OpenAI-compatible LLM API (load testing)
+
+Serves chat completions (plain, JSON mode and SSE streaming), audio
+transcriptions and a model list with configurable latency, error rates and
+rate-limit headers, so the backend can be load tested without real quota.
+
+Usage:
+    python scripts/llm_standin_server.py --port 8001 --latency lognormal --latency-ms 600
+
+Then point the backend at it with either provider:
+    LLM_PROVIDER=openai_compatible LLM_BASE_URL=http://localhost:8001/v1
+    LLM_PROVIDER=groq LLM_BASE_URL=http://localhost:8001
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+import uvicorn
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+
+REPLY = (
+    "I hear you, and it makes sense to feel this way. Take a slow breath with me. "
+    "What is one small thing that would make the next hour a little easier?"
+)
+
+# JSON-mode answer in the shape the audio analysis prompt asks for
+ANALYSIS = {"emotion": "neutral", "reply": REPLY}
+
+TRANSCRIPT = "I have had a long day and I just want to talk about it."
+
+
+class StandInConfig:
+    """Behaviour knobs for the stand-in server"""
+    
+    def __init__(self, args: argparse.Namespace):
+        self.latency = args.latency
+        self.latency_seconds = args.latency_ms / 1000
+        self.sigma = args.sigma
+        self.token_seconds = args.token_ms / 1000
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.rpm = args.rpm
+        self.tpm = args.tpm
+        self._window_start = time.monotonic()
+        self._requests = 0
+        self._tokens = 0
+    
+    def sample_latency(self) -> float:
+        """Time to first token in seconds, drawn from the configured distribution"""
+        mean = self.latency_seconds
+        if mean <= 0:
+            return 0.0
+        if self.latency == "uniform":
+            return random.uniform(0, 2 * mean)
+        if self.latency == "exponential":
+            return random.expovariate(1 / mean)
+        if self.latency == "lognormal":
+            # mu chosen so the distribution's mean equals latency-ms
+            return random.lognormvariate(math.log(mean) - self.sigma ** 2 / 2, self.sigma)
+        return mean
+    
+    def record(self, tokens: int):
+        now = time.monotonic()
+        if now - self._window_start >= 60:
+            self._window_start, self._requests, self._tokens = now, 0, 0
+        self._requests += 1
+        self._tokens += tokens
+    
+    def rate_headers(self) -> dict:
+        """x-ratelimit-* headers in Groq's format"""
+        reset = max(60 - (time.monotonic() - self._window_start), 0)
+        return {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(max(self.rpm - self._requests, 0)),
+            "x-ratelimit-reset-requests": f"{reset:.2f}s",
+            "x-ratelimit-limit-tokens": str(self.tpm),
+            "x-ratelimit-remaining-tokens": str(max(self.tpm - self._tokens, 0)),
+            "x-ratelimit-reset-tokens": f"{reset:.2f}s",
+        }
+    
+    def injected_failure(self):
+        """Randomly fail a request with a 429 or 500 (None = serve it)"""
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            headers = {**self.rate_headers(), "retry-after": "1"}
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                status_code=429,
+                headers=headers
+            )
+        if roll < self.rate_limit_rate + self.error_rate:
+            return JSONResponse(
+                {"error": {"message": "Injected upstream error", "type": "internal_server_error"}},
+                status_code=500
+            )
+        return None
+
+
+def _count_tokens(text: str) -> int:
+    return max(len(text.split()), (len(text) + 3) // 4)
+
+
+def _usage(messages: list, completion: str) -> dict:
+    prompt_tokens = sum(_count_tokens(str(m.get("content", ""))) + 4 for m in messages)
+    completion_tokens = _count_tokens(completion)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _completion_text(body: dict) -> str:
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        return json.dumps(ANALYSIS)
+    words = REPLY.split()
+    max_tokens = body.get("max_tokens")
+    if max_tokens:
+        words = words[:max(int(max_tokens * 0.75), 1)]
+    return " ".join(words)
+
+
+def create_app(config: StandInConfig) -> FastAPI:
+    """Build the stand-in app"""
+    router = APIRouter()
+    
+    @router.get("/models")
+    async def list_models():
+        models = ["llama-3.1-70b-versatile", "llama-3.3-70b-versatile", "llama-3.1-8b-instant", "whisper-large-v3"]
+        return {"object": "list", "data": [{"id": m, "object": "model", "owned_by": "standin"} for m in models]}
+    
+    @router.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        failure = config.injected_failure()
+        if failure is not None:
+            return failure
+        
+        messages = body.get("messages", [])
+        model = body.get("model", "standin")
+        text = _completion_text(body)
+        usage = _usage(messages, text)
+        config.record(usage["total_tokens"])
+        headers = config.rate_headers()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        
+        await asyncio.sleep(config.sample_latency())
+        
+        if not body.get("stream"):
+            await asyncio.sleep(config.token_seconds * usage["completion_tokens"])
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }, headers=headers)
+        
+        async def events():
+            def chunk(delta: dict, finish_reason=None, **extra) -> str:
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                    **extra,
+                }
+                return f"data: {json.dumps(payload)}\n\n"
+            
+            yield chunk({"role": "assistant", "content": ""})
+            for i, word in enumerate(text.split(" ")):
+                await asyncio.sleep(config.token_seconds)
+                yield chunk({"content": word if i == 0 else f" {word}"})
+            # Groq reports usage on the final chunk
+            yield chunk({}, "stop", x_groq={"usage": usage})
+            yield "data: [DONE]\n\n"
+        
+        return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+    
+    @router.post("/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        failure = config.injected_failure()
+        if failure is not None:
+            return failure
+        
+        config.record(0)
+        await asyncio.sleep(config.sample_latency())
+        if form.get("response_format", "json") == "text":
+            return PlainTextResponse(TRANSCRIPT, headers=config.rate_headers())
+        return JSONResponse({"text": TRANSCRIPT}, headers=config.rate_headers())
+    
+    app = FastAPI(title="LLM stand-in")
+    # /v1 for OpenAI-style clients, /openai/v1 for the Groq SDK
+    app.include_router(router, prefix="/v1")
+    app.include_router(router, prefix="/openai/v1")
+    return app
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible LLM stand-in for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal", "exponential"], default="lognormal",
+                        help="Time-to-first-token distribution")
+    parser.add_argument("--latency-ms", type=float, default=400, help="Mean time to first token")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Lognormal shape (tail heaviness)")
+    parser.add_argument("--token-ms", type=float, default=15, help="Delay per generated token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests failing with 429")
+    parser.add_argument("--rpm", type=int, default=30, help="Requests per minute reported in headers")
+    parser.add_argument("--tpm", type=int, default=6000, help="Tokens per minute reported in headers")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    uvicorn.run(create_app(StandInConfig(args)), host=args.host, port=args.port, log_level="warning")
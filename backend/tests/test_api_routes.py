@@ -33,6 +33,156 @@ def test_readiness_check(client: TestClient):
     assert "ready" in response.json()
 
 
+def test_metrics_snapshot(client: TestClient):
+    """Test operational counters endpoint"""
+    response = client.get("/health/metrics")
+    assert response.status_code == 200
+    assert "counters" in response.json()
+
+
+def test_prometheus_scrape(client: TestClient):
+    """Counters and stage histograms recorded on other threads show up summed"""
+    import threading
+    from app.core.metrics import metrics
+    
+    def worker():
+        metrics.increment("scrape_test_events")
+        metrics.observe("scrape_test_stage", 0.2)
+    
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert "moodify_scrape_test_events_total 3" in lines
+    assert 'moodify_stage_duration_seconds_bucket{stage="scrape_test_stage",le="0.1"} 0' in lines
+    assert 'moodify_stage_duration_seconds_bucket{stage="scrape_test_stage",le="0.25"} 3' in lines
+    assert 'moodify_stage_duration_seconds_count{stage="scrape_test_stage"} 3' in lines
+    assert any(line.startswith("moodify_groq_chat_rate_queue_depth ") for line in lines)
+
+
+def test_text_chat_stream_falls_back_midway(client: TestClient, monkeypatch):
+    """Streaming chat sends emotion first and recovers from a broken stream"""
+    from app.services.groq_service import groq_service
+    
+    async def broken_stream(**kwargs):
+        yield "Hel"
+        raise RuntimeError("upstream closed")
+    
+    monkeypatch.setattr(groq_service, "stream_response", broken_stream)
+    response = client.post("/chat/text/stream", json={"message": "hi", "emotion_context": "sad"})
+    assert response.status_code == 200
+    events = [line[len("event: "):] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events == ["emotion", "token", "fallback", "done"]
+
+
+def test_text_chat_session_keeps_history(client: TestClient, monkeypatch):
+    """The server appends turns so clients only send the session id"""
+    from app.services.groq_service import groq_service
+    seen = []
+    
+    async def fake_generate(emotion, user_message=None, conversation_history=None, **kwargs):
+        seen.append(conversation_history)
+        return f"reply to {user_message}"
+    
+    monkeypatch.setattr(groq_service, "generate_response", fake_generate)
+    first = client.post("/chat/text", json={"message": "hi", "emotion_context": "happy"}).json()
+    session_id = first["session_id"]
+    client.post("/chat/text", json={"message": "again", "session_id": session_id})
+    
+    assert seen[0] is None
+    assert seen[1] == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "reply to hi"},
+    ]
+
+
+def test_emotion_only_turn_stores_no_user_message(tmp_path):
+    """No-message requests store just the reply, with the emotion as metadata"""
+    import asyncio
+    from app.services.session_store import SessionStore, SQLiteSessionBackend
+    store = SessionStore(SQLiteSessionBackend(str(tmp_path / "sessions.db")))
+    
+    async def run():
+        await store.append_turn("session-1", None, "Cheer up!", "sad")
+        await store.append_turn("session-1", "thanks", "Any time.", "happy")
+        return store.backend.get("session-1"), await store.get_history("session-1")
+    
+    stored, history = asyncio.run(run())
+    assert stored[0] == {"role": "assistant", "content": "Cheer up!", "emotion": "sad"}
+    assert history == [
+        {"role": "assistant", "content": "Cheer up!"},
+        {"role": "user", "content": "thanks"},
+        {"role": "assistant", "content": "Any time."},
+    ]
+
+
+def test_chat_reuses_emotion_handles(client: TestClient, monkeypatch):
+    """Chat endpoints accept detection handles instead of re-uploading media"""
+    from app.models.ml_models.emotion_vector import EmotionVector
+    from app.services.audio_emotion_service import audio_emotion_service
+    from app.services.emotion_handles import emotion_handles
+    from app.services.groq_service import groq_service
+    
+    async def fake_generate(emotion, user_message=None, **kwargs):
+        return f"{emotion} reply"
+    
+    async def no_inference(path):
+        raise AssertionError("handle should skip inference")
+    
+    monkeypatch.setattr(groq_service, "generate_response", fake_generate)
+    monkeypatch.setattr(audio_emotion_service, "detect_emotion", no_inference)
+    audio_handle = emotion_handles.put(EmotionVector.from_dict({"sad": 0.8, "neutral": 0.2}, "audio"), "audio")
+    
+    text = client.post("/chat/text", json={"message": "hi", "emotion_handle": audio_handle}).json()
+    assert text["emotion_detected"] == "sad"
+    
+    audio = client.post("/chat/audio", data={"audio_handle": audio_handle}).json()
+    assert audio["emotion"]["emotion"] == "sad" and audio["chat_response"]["message"] == "sad reply"
+    
+    assert client.post("/chat/audio", data={"audio_handle": "emo_missing"}).status_code == 404
+    assert client.post("/chat/audio", data={"message": "no media"}).status_code == 400
+
+
+def test_short_deadline_degrades_and_reports(client: TestClient, monkeypatch):
+    """A tight client timeout skips the face branch and serves the canned reply"""
+    from app.models.ml_models.emotion_vector import EmotionVector
+    from app.services.emotion_handles import emotion_handles
+    from app.services.face_emotion_service import face_emotion_service
+    from app.services.groq_service import groq_service
+    
+    async def fake_generate(emotion, user_message=None, **kwargs):
+        return f"{emotion} reply"
+    
+    async def no_face(path):
+        raise AssertionError("face branch should be skipped")
+    
+    monkeypatch.setattr(groq_service, "generate_response", fake_generate)
+    monkeypatch.setattr(face_emotion_service, "detect_emotion", no_face)
+    audio_handle = emotion_handles.put(EmotionVector.from_dict({"sad": 0.6, "fear": 0.4}, "audio"), "audio")
+    
+    response = client.post(
+        "/chat/multimodal",
+        data={"audio_handle": audio_handle},
+        files={"image": ("face.jpg", b"not decoded", "image/jpeg")},
+        headers={"X-Request-Timeout-Ms": "3000"}
+    )
+    body = response.json()
+    assert body["emotion"]["fusion_method"] == "deadline_face_skipped"
+    assert body["chat_response"]["message"] == "sad reply"
+    assert "face_skipped" in body["chat_response"]["degradations"]
+    assert "face_skipped" in response.headers["X-Degradations"]
+    
+    late = client.post("/chat/text", json={"message": "hi"}, headers={"X-Request-Timeout-Ms": "500"}).json()
+    assert late["strategy_used"] == "fallback"
+    assert late["degradations"] == ["fallback_reply"]
+
+
 # Add more tests for your specific endpoints
 @pytest.mark.skip(reason="Requires actual audio file")
 def test_audio_emotion_detection(client: TestClient, sample_audio_path):
@@ -0,0 +1,105 @@
+"""
+Test the voice clip pipeline (no network, no model weights)
+"""
+import asyncio
+import time
+import numpy as np
+from app.services.audio_emotion_service import AudioEmotionService
+from app.services.response_generator import response_generator
+from app.models.ml_models.emotion_vector import EmotionVector
+from app.models.schemas.chat import ChatResponse
+from app.utils.acoustic_features import FEATURE_NAMES, AcousticFeatureEngine
+
+
+QUIET = {"rms_mean": 0.01, "rms_std": 0.005, "zcr_mean": 0.03, "duration": 2.0}
+
+
+def _service_with_fake_stages(monkeypatch, replies):
+    service = AudioEmotionService()
+    
+    async def transcribe(path):
+        await asyncio.sleep(0.2)
+        return "I lost my keys again and I feel so down"
+    
+    def acoustic_features(path):
+        time.sleep(0.15)
+        return QUIET
+    
+    async def detect_emotion(path):
+        await asyncio.sleep(0.15)
+        return EmotionVector.from_dict({"sad": 0.5, "neutral": 0.4, "happy": 0.1}, "audio")
+    
+    async def generate_response(emotion, user_message=None, **kwargs):
+        replies.append((emotion, user_message, kwargs.get("persona")))
+        return ChatResponse(message="Let's look together.", emotion_detected=emotion)
+    
+    service.transcribe = transcribe
+    service._acoustic_features = acoustic_features
+    service.detect_emotion = detect_emotion
+    monkeypatch.setattr(response_generator, "generate_response", generate_response)
+    return service
+
+
+def test_transcription_overlaps_local_analysis(monkeypatch):
+    """Whisper and the local acoustic/wav2vec2 stages run concurrently; the LLM only writes the reply"""
+    replies = []
+    service = _service_with_fake_stages(monkeypatch, replies)
+    
+    start = time.perf_counter()
+    result = asyncio.run(service.detect_emotion_and_respond("clip.wav"))
+    elapsed = time.perf_counter() - start
+    
+    assert elapsed < 0.3
+    assert result["emotion"]["label"] == "sad"
+    assert set(result["emotion"]["sources"]) == {"wav2vec2", "text", "acoustic"}
+    (emotion, message, persona), = replies
+    assert (emotion, message) == ("sad", "I lost my keys again and I feel so down")
+    assert "Goku" in persona and "calm/soft" in persona
+    assert {"transcription", "acoustic", "wav2vec2", "parallel", "labeling", "llm", "total"} <= set(result["timings"])
+
+
+def test_transcription_transport_error_falls_back_to_voice(monkeypatch):
+    """A raw SDK/httpx failure from Whisper labels from voice only instead of failing the request"""
+    import httpx
+    replies = []
+    service = _service_with_fake_stages(monkeypatch, replies)
+    
+    async def transcribe(path):
+        raise httpx.ConnectTimeout("whisper unreachable")
+    
+    service.transcribe = transcribe
+    result = asyncio.run(service.detect_emotion_and_respond("clip.wav"))
+    
+    assert result["transcript"] == ""
+    assert "text" not in result["emotion"]["sources"]
+
+
+def test_local_labeling_fuses_available_signals():
+    """Transcript cues can override a weak voice guess; missing signals drop out"""
+    service = AudioEmotionService()
+    voice = EmotionVector.from_dict({"neutral": 0.45, "happy": 0.35, "sad": 0.2}, "audio")
+    
+    emotion, used = service.classify_local(voice, QUIET, "I'm not happy, I feel so lonely and sad")
+    assert emotion.emotion == "sad" and emotion.source == "local"
+    assert abs(sum(used.values()) - 1) < 1e-3
+    
+    emotion, used = service.classify_local(voice, None, "")
+    assert emotion.emotion == "neutral" and used == {"wav2vec2": 1.0}
+
+
+def test_feature_engine_pitch_and_batch():
+    """One shared framing yields pitch/pacing; a batch matches clip-by-clip extraction"""
+    engine = AcousticFeatureEngine(sr=16000)
+    t = np.arange(3 * 16000) / 16000
+    # 200 Hz voice, 4 "syllables" per second
+    tone = (0.3 * np.sin(2 * np.pi * 200 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t))).astype(np.float32)
+    noise = (0.05 * np.random.default_rng(0).standard_normal(2 * 16000)).astype(np.float32)
+    
+    voice = engine.as_dict(engine.extract(tone))
+    assert abs(voice["pitch_mean"] - 200) < 5
+    assert 3.0 <= voice["speaking_rate"] <= 5.0
+    assert engine.as_dict(engine.extract(noise))["voiced_fraction"] < 0.1
+    
+    batch = engine.extract_batch([tone, noise])
+    assert batch.shape == (2, len(FEATURE_NAMES))
+    assert np.allclose(batch[1], engine.extract(noise), rtol=1e-4, atol=1e-4)
@@ -0,0 +1,49 @@
+"""
+Test vectorized emotion fusion
+"""
+import numpy as np
+from app.core.constants import EMOTION_LABELS
+from app.utils.emotion_mapping import combine_emotions
+from app.utils.fusion_engine import (
+    FusionEngine, build_label_projection, vector_from_dict, NUM_EMOTIONS
+)
+
+
+def _random_probs(rng, n):
+    probs = rng.random((n, NUM_EMOTIONS)).astype(np.float32) ** 3
+    return probs / probs.sum(axis=1, keepdims=True)
+
+
+def test_batch_matches_combine_emotions():
+    """Batch fusion keeps the label-level fusion_method semantics"""
+    rng = np.random.default_rng(0)
+    audio, face = _random_probs(rng, 500), _random_probs(rng, 500)
+    engine = FusionEngine()
+    result = engine.fuse_batch(audio, face)
+    labels = engine.labels(result.emotion_idx)
+    methods = engine.methods(result.method_idx)
+    
+    for i in range(len(audio)):
+        a_idx, f_idx = audio[i].argmax(), face[i].argmax()
+        emotion, confidence, method = combine_emotions(
+            EMOTION_LABELS[a_idx], EMOTION_LABELS[f_idx],
+            float(audio[i, a_idx]), float(face[i, f_idx])
+        )
+        assert labels[i] == emotion
+        assert methods[i] == method
+        assert np.isclose(result.confidence[i], confidence, atol=1e-5)
+
+
+def test_fused_distribution_is_normalized():
+    """Fused probabilities stay a distribution"""
+    rng = np.random.default_rng(1)
+    result = FusionEngine().fuse(_random_probs(rng, 1)[0], _random_probs(rng, 1)[0])
+    assert np.isclose(result.probabilities.sum(), 1.0, atol=1e-5)
+
+
+def test_label_projection_merges_audio_labels():
+    """HF labels are projected onto EMOTION_LABELS once"""
+    id2label = {0: "angry", 1: "calm", 2: "neutral", 3: "fearful"}
+    projection = build_label_projection(id2label)
+    probs = np.array([0.1, 0.3, 0.4, 0.2], dtype=np.float32) @ projection
+    assert np.allclose(probs, vector_from_dict({"angry": 0.1, "neutral": 0.7, "fear": 0.2}))
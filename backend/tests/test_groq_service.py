@@ -0,0 +1,159 @@
+"""
+Test Groq service request handling (no network)
+"""
+import asyncio
+from app.services.groq_service import GroqService
+from app.services.llm_providers import LLMProvider
+from app.services.response_cache import ResponseCache
+
+
+class FakeProvider(LLMProvider):
+    """Stand-in LLM provider that counts upstream calls"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    async def chat(self, messages, model, **kwargs):
+        self.calls += 1
+        return f"reply {self.calls}"
+    
+    async def open_stream(self, messages, model, **kwargs):
+        async def deltas():
+            yield await self.chat(messages, model)
+        return deltas()
+    
+    async def transcribe(self, filename, content, model):
+        return ""
+
+
+def _service_with_fake_provider():
+    provider = FakeProvider()
+    return GroqService(provider=provider), provider
+
+
+def test_cache_rotates_variants_after_filling():
+    """A key serves hits only once it holds all its variants"""
+    cache = ResponseCache(max_keys=4, variants_per_key=2, ttl_seconds=60)
+    key = cache.make_key([{"role": "user", "content": "Hey  there!"}], model="m")
+    assert cache.get(key) is None
+    cache.put(key, "a")
+    assert cache.get(key) is None
+    cache.put(key, "b")
+    assert [cache.get(key) for _ in range(3)] == ["a", "b", "a"]
+    assert cache.stats()["hits"] == 3
+
+
+def test_cache_key_normalizes_whitespace():
+    """Whitespace differences map to the same key"""
+    a = ResponseCache.make_key([{"role": "User", "content": "Hey  there! "}], model="m")
+    b = ResponseCache.make_key([{"role": "user", "content": "Hey there!"}], model="m")
+    assert a == b
+
+
+def test_cache_hit_skips_upstream():
+    """Identical no-message prompts stop hitting the network once cached"""
+    service, provider = _service_with_fake_provider()
+    
+    async def run():
+        return [await service.generate_response(emotion="happy") for _ in range(6)]
+    
+    replies = asyncio.run(run())
+    assert provider.calls == service.cache.variants_per_key
+    assert set(replies) == {f"reply {i}" for i in range(1, provider.calls + 1)}
+
+
+def test_concurrent_identical_requests_share_one_call():
+    """A burst of identical requests makes one upstream call and one cache fill"""
+    service, provider = _service_with_fake_provider()
+    
+    async def slow_chat(messages, model, **kwargs):
+        await asyncio.sleep(0.01)
+        return await FakeProvider.chat(provider, messages, model, **kwargs)
+    
+    provider.chat = slow_chat
+    
+    async def run():
+        return await asyncio.gather(*(service.generate_response(emotion="sad") for _ in range(5)))
+    
+    replies = asyncio.run(run())
+    assert provider.calls == 1
+    assert replies == ["reply 1"] * 5
+    assert service.inflight.coalesced == 4
+    assert service.inflight.in_flight() == 0
+
+
+def test_reply_pool_serves_rotating_replies_within_budget():
+    """Pooled no-message replies skip upstream; refill stops at the token budget"""
+    service, provider = _service_with_fake_provider()
+    pool = service.pool
+    pool.size, pool.max_uses, pool.reply_tokens, pool.token_budget = 2, 2, 100, 300
+    
+    async def run():
+        added = await pool.refill("happy")
+        replies = [await service.generate_quick_response("happy") for _ in range(4)]
+        return added, replies
+    
+    added, replies = asyncio.run(run())
+    assert added == 2
+    assert replies == ["reply 1", "reply 2", "reply 1", "reply 2"]
+    assert provider.calls == 2
+    assert pool.level("happy") == 0
+    
+    # Only one more reply fits in the remaining budget
+    assert asyncio.run(pool.refill("happy")) == 1
+
+
+def test_history_is_budgeted_with_rolling_summary():
+    """Old turns fold into a summary that is only recomputed when turns drop out"""
+    from app.services.history_compactor import HistoryCompactor
+    from app.utils.token_budget import message_tokens
+    calls = []
+    
+    async def summarize(previous, turns):
+        calls.append((previous, len(turns)))
+        return f"{previous or ''}+{len(turns)}"
+    
+    compactor = HistoryCompactor(summarize, token_budget=60, summary_tokens=20)
+    history = [{"role": "user", "content": f"message number {i} " * 3} for i in range(12)]
+    
+    async def run():
+        first = compactor.compact(history, "s1")
+        await asyncio.sleep(0)
+        second = compactor.compact(history, "s1")
+        longer = history + [{"role": "assistant", "content": "message number 12 " * 3}]
+        compactor.compact(longer, "s1")
+        await asyncio.sleep(0)
+        return first, second
+    
+    (recent, summary), (_, cached) = asyncio.run(run())
+    assert summary is None
+    assert sum(message_tokens(m) for m in recent) <= 40
+    assert recent[-1] == history[-1]
+    assert cached == f"+{len(history) - len(recent)}"
+    # Second pass reused the summary; the longer history only folded in one new turn
+    assert calls == [(None, len(history) - len(recent)), (cached, 1)]
+
+
+def test_openai_compatible_provider_parses_stream():
+    """SSE deltas are extracted and the stream ends at [DONE]"""
+    import httpx
+    from app.services.llm_providers import OpenAICompatibleProvider
+    
+    def handler(request):
+        events = [
+            'data: {"choices": [{"delta": {"role": "assistant", "content": ""}}]}',
+            'data: {"choices": [{"delta": {"content": "Hi"}}]}',
+            'data: {"choices": [{"delta": {"content": " there"}}]}',
+            'data: {"choices": [], "usage": {"total_tokens": 5}}',
+            "data: [DONE]",
+        ]
+        return httpx.Response(200, text="\n\n".join(events) + "\n\n")
+    
+    provider = OpenAICompatibleProvider("http://standin/v1")
+    provider._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://standin/v1")
+    
+    async def run():
+        stream = await provider.open_stream([{"role": "user", "content": "hey"}], model="m")
+        return [delta async for delta in stream]
+    
+    assert asyncio.run(run()) == ["Hi", " there"]
@@ -0,0 +1,151 @@
+"""
+Test the ASGI middleware stack
+"""
+import asyncio
+from app.api.middleware import DisconnectMiddleware
+from app.core.metrics import metrics
+
+
+def test_disconnect_cancels_handler():
+    """A client hanging up mid-request cancels the handler and answers 499 to outer layers"""
+    cancelled = []
+    
+    async def slow_app(scope, receive, send):
+        await receive()
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(scope["path"])
+            raise
+    
+    async def scenario():
+        messages = [{"type": "http.request", "body": b"clip", "more_body": False}]
+        
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.sleep(0.05)
+            return {"type": "http.disconnect"}
+        
+        sent = []
+        
+        async def send(message):
+            sent.append(message)
+        
+        before = metrics.get("cancelled_requests")
+        app = DisconnectMiddleware(slow_app)
+        await asyncio.wait_for(app({"type": "http", "method": "POST", "path": "/chat/audio"}, receive, send), 1)
+        return sent, metrics.get("cancelled_requests") - before
+    
+    sent, counted = asyncio.run(scenario())
+    assert cancelled == ["/chat/audio"]
+    assert counted == 1
+    assert sent[0]["status"] == 499
+
+
+def test_finished_response_is_not_cancelled():
+    """The disconnect that follows a complete response is not counted"""
+    async def quick_app(scope, receive, send):
+        await receive()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+    
+    async def scenario():
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+        
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            return {"type": "http.disconnect"}
+        
+        async def send(message):
+            pass
+        
+        before = metrics.get("cancelled_requests")
+        await DisconnectMiddleware(quick_app)({"type": "http", "method": "POST", "path": "/chat/text"}, receive, send)
+        await asyncio.sleep(0)
+        return metrics.get("cancelled_requests") - before
+    
+    assert asyncio.run(scenario()) == 0
+
+
+def test_errors_become_json_or_close_the_stream():
+    """Errors before the response starts become JSON; mid-stream errors end the body cleanly"""
+    from app.api.middleware import ErrorHandlingMiddleware
+    from app.core.exceptions import GroqAPIError
+    
+    async def fails_early(scope, receive, send):
+        raise GroqAPIError("upstream down")
+    
+    async def fails_midstream(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"data: 1\n\n", "more_body": True})
+        raise RuntimeError("stream broke")
+    
+    async def run(app):
+        sent = []
+        
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+        
+        async def send(message):
+            sent.append(message)
+        
+        await ErrorHandlingMiddleware(app)({"type": "http", "method": "GET", "path": "/x", "headers": []}, receive, send)
+        return sent
+    
+    early = asyncio.run(run(fails_early))
+    assert early[0]["status"] == 502 and b"upstream down" in early[1]["body"]
+    
+    midstream = asyncio.run(run(fails_midstream))
+    assert [m.get("status") for m in midstream] == [200, None, None]
+    assert midstream[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+
+
+def test_server_timing_and_slow_traces():
+    """Stages timed on the loop and in pool jobs reach Server-Timing and the slow-trace recorder"""
+    import time
+    from app.api.middleware import TracingMiddleware
+    from app.core.executors import io_executor, run_in_executor
+    from app.core.timing import StageTimer, timed
+    from app.core.tracing import SlowTraceRecorder, slow_traces
+    
+    def decode():
+        with timed("decode"):
+            time.sleep(0.01)
+    
+    async def app(scope, receive, send):
+        timer = StageTimer()
+        with timer.stage("fusion"):
+            await run_in_executor(io_executor, decode)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+    
+    async def scenario():
+        sent = []
+        
+        async def send(message):
+            sent.append(message)
+        
+        middleware = TracingMiddleware(app, server_timing=True, record_slow=True)
+        await middleware({"type": "http", "method": "POST", "path": "/chat/trace-test"}, None, send)
+        return dict(sent[0]["headers"])[b"server-timing"].decode()
+    
+    header = asyncio.run(scenario())
+    names = [entry.split(";")[0] for entry in header.split(", ")]
+    assert names == ["decode", "fusion", "total"]
+    
+    trace = next(t for t in slow_traces.snapshot() if t["path"] == "/chat/trace-test")
+    assert trace["status"] == 200 and [span["name"] for span in trace["spans"]] == ["fusion", "decode"]
+    
+    class Finished:
+        def __init__(self, duration_ms):
+            self.duration_ms = duration_ms
+        
+        def as_dict(self):
+            return self.duration_ms
+    
+    recorder = SlowTraceRecorder(capacity=2, window_seconds=60)
+    for duration in (5, 50, 1, 20):
+        recorder.offer(Finished(duration))
+    assert recorder.snapshot() == [50, 20]
@@ -0,0 +1,97 @@
+"""
+Test the stage-graph pipeline executor
+"""
+import asyncio
+import time
+import pytest
+from app.core.pipeline import Pipeline, Stage, StageCache
+
+
+def sleeper(name, delay, log, result=None):
+    """Stage body that records start/end and sleeps"""
+    async def run(pipeline_run):
+        log.append(f"start:{name}")
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            log.append(f"cancelled:{name}")
+            raise
+        log.append(f"end:{name}")
+        return result if result is not None else name
+    return run
+
+
+def test_independent_stages_overlap_and_dependents_wait():
+    """Branches run concurrently; a joining stage starts after both"""
+    log = []
+    pipeline = Pipeline("test", [
+        Stage("a", sleeper("a", 0.1, log)),
+        Stage("b", sleeper("b", 0.1, log)),
+        Stage("join", sleeper("join", 0, log), after=("a", "b")),
+    ])
+    
+    started = time.perf_counter()
+    run = asyncio.run(pipeline.run())
+    elapsed = time.perf_counter() - started
+    
+    assert elapsed < 0.18
+    assert log.index("start:join") > max(log.index("end:a"), log.index("end:b"))
+    assert run["join"] == "join"
+    assert set(run.timer.as_dict()) >= {"a", "b", "join", "total"}
+
+
+def test_failure_cancels_running_stages_and_runs_cleanup():
+    """The root failure is raised, siblings are cancelled and cleanup still runs"""
+    log = []
+    
+    async def boom(pipeline_run):
+        await asyncio.sleep(0.02)
+        raise ValueError("decode failed")
+    
+    async def cleanup(pipeline_run):
+        log.append(f"cleanup:{type(pipeline_run.error).__name__}")
+    
+    pipeline = Pipeline("test", [
+        Stage("decode", boom),
+        Stage("slow", sleeper("slow", 1, log)),
+        Stage("detect", sleeper("detect", 0, log), after=("decode",)),
+        Stage("cleanup", cleanup, cleanup=True),
+    ])
+    
+    with pytest.raises(ValueError, match="decode failed"):
+        asyncio.run(pipeline.run())
+    assert "cancelled:slow" in log
+    assert "start:detect" not in log
+    assert log[-1] == "cleanup:ValueError"
+
+
+def test_cached_stage_is_not_rerun_and_skips_respect_when():
+    """Same cache key serves the stored result; `when` False yields None"""
+    calls = []
+    
+    async def detect(pipeline_run):
+        calls.append(pipeline_run["clip"])
+        return f"emotion-of-{pipeline_run['clip']}"
+    
+    pipeline = Pipeline("test", [
+        Stage("detect", detect, cache_key=lambda r: r["clip"]),
+        Stage("face", sleeper("face", 0, []), when=lambda r: r.get("consult_face", False)),
+    ], cache=StageCache(max_entries=10))
+    
+    first = asyncio.run(pipeline.run({"clip": "x"}))
+    second = asyncio.run(pipeline.run({"clip": "x"}))
+    
+    assert calls == ["x"]
+    assert second["detect"] == first["detect"] == "emotion-of-x"
+    assert second.cached == ["detect"]
+    assert second["face"] is None and second.skipped == ["face"]
+    assert pipeline.cache.stats()["hits"] == 1
+
+
+def test_invalid_graphs_are_rejected():
+    """Unknown dependencies and cycles fail at definition time"""
+    noop = sleeper("x", 0, [])
+    with pytest.raises(ValueError, match="unknown"):
+        Pipeline("test", [Stage("a", noop, after=("missing",))])
+    with pytest.raises(ValueError, match="Cycle"):
+        Pipeline("test", [Stage("a", noop, after=("b",)), Stage("b", noop, after=("a",))])
@@ -0,0 +1,163 @@
+"""
+Test deadlines, hedging and circuit breaking for upstream calls
+"""
+import asyncio
+import time
+import pytest
+from app.core.exceptions import CircuitOpenError, UpstreamTimeoutError
+from app.core.resilience import ResilientCaller, request_deadline
+
+
+def test_hedge_wins_when_primary_is_slow():
+    """A duplicate fires after the p95 delay and the faster one is returned"""
+    caller = ResilientCaller("test_hedge", hedge_min_samples=3, hedge_min_delay_seconds=0.01)
+    for _ in range(3):
+        caller.latency.add(0.01)
+    delays = iter([1.0, 0.0])
+    
+    async def call():
+        delay = next(delays)
+        await asyncio.sleep(delay)
+        return delay
+    
+    assert asyncio.run(caller.call(call)) == 0.0
+    assert caller.stats()["hedges_fired"] == 1
+    assert caller.stats()["hedge_win_rate"] == 1.0
+
+
+def test_breaker_opens_after_failures_and_rejects():
+    """Consecutive failures open the breaker; later calls fail fast"""
+    caller = ResilientCaller("test_breaker", failure_threshold=2, reset_seconds=60)
+    calls = []
+    
+    async def failing():
+        calls.append(1)
+        raise RuntimeError("upstream 500")
+    
+    async def run():
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await caller.call(failing)
+        with pytest.raises(CircuitOpenError):
+            await caller.call(failing)
+    
+    asyncio.run(run())
+    assert len(calls) == 2
+    assert caller.stats()["breaker"] == "open"
+
+
+def test_request_budget_caps_call_without_tripping_breaker():
+    """A call cut short by the request budget times out but stays healthy"""
+    caller = ResilientCaller("test_deadline", failure_threshold=1)
+    
+    async def slow():
+        await asyncio.sleep(1.0)
+    
+    async def run():
+        request_deadline.set(time.monotonic() + 0.05)
+        with pytest.raises(UpstreamTimeoutError):
+            await caller.call(slow)
+    
+    asyncio.run(run())
+    assert caller.breaker.state == "closed"
+
+
+def test_coalesced_caller_waits_only_for_its_own_budget():
+    """A joining caller with a tighter deadline gives up on time; the shared call keeps going"""
+    from app.core.singleflight import SingleFlight
+    flight = SingleFlight("test_flight")
+    
+    async def slow():
+        await asyncio.sleep(0.2)
+        return "reply"
+    
+    async def tight_caller():
+        request_deadline.set(time.monotonic() + 0.05)
+        started = time.perf_counter()
+        with pytest.raises(UpstreamTimeoutError):
+            await flight.do("k", slow)
+        return time.perf_counter() - started
+    
+    async def run():
+        first = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        waited = await asyncio.create_task(tight_caller())
+        return waited, await first
+    
+    waited, result = asyncio.run(run())
+    assert waited < 0.15
+    assert result == "reply"
+
+
+def test_rate_limiter_serves_interactive_first_and_times_out():
+    """Queued callers are served by priority; stale waiters give up"""
+    from app.core.exceptions import RateLimitedError
+    from app.core.rate_limiter import (
+        RateLimiter, PRIORITY_INTERACTIVE, PRIORITY_PIPELINE, PRIORITY_BACKGROUND
+    )
+    limiter = RateLimiter(
+        "test_rate", requests_per_minute=600, tokens_per_minute=None,
+        max_wait_seconds={PRIORITY_INTERACTIVE: 1.0, PRIORITY_PIPELINE: 1.0, PRIORITY_BACKGROUND: 0.05}
+    )
+    limiter.requests.level = 0
+    order = []
+    
+    async def caller(name, priority):
+        try:
+            await limiter.acquire(priority=priority)
+            order.append(name)
+        except RateLimitedError:
+            order.append(f"{name} timed out")
+    
+    async def run():
+        await asyncio.gather(
+            caller("background", PRIORITY_BACKGROUND),
+            caller("pipeline", PRIORITY_PIPELINE),
+            caller("text", PRIORITY_INTERACTIVE),
+        )
+    
+    asyncio.run(run())
+    # One request refills every 0.1s; text jumps the queue, background gives up at 50ms
+    assert order == ["background timed out", "text", "pipeline"]
+
+
+def test_rate_limiter_backs_off_on_429_headers():
+    """A 429 with retry-after pauses the limiter"""
+    import httpx
+    from app.core.rate_limiter import RateLimiter, parse_reset_duration
+    limiter = RateLimiter("test_rate_429", requests_per_minute=60, tokens_per_minute=1000)
+    limiter.update_from_headers(
+        httpx.Headers({"retry-after": "2", "x-ratelimit-limit-tokens": "500", "x-ratelimit-remaining-tokens": "10"}),
+        429
+    )
+    assert not limiter.try_acquire(5)
+    assert limiter.tokens.capacity == 500
+    assert limiter.tokens.level <= 10
+    assert parse_reset_duration("2m59.5s") == 179.5
+
+
+def test_model_router_shifts_to_fast_tier_under_pressure():
+    """Large-tier latency spikes, deep queues and tight deadlines route to the fast model"""
+    from app.core.rate_limiter import RateLimiter
+    from app.services.model_router import ModelRouter, ModelTier
+    large = ModelTier("large", "big-model", ResilientCaller("test_route_large"))
+    fast = ModelTier("fast", "small-model", ResilientCaller("test_route_fast"))
+    router = ModelRouter(
+        "test_router", large, fast, RateLimiter("test_route_rate", 60),
+        latency_slo_seconds=1.0, min_samples=3, probe_every=3, long_message_tokens=100
+    )
+    
+    assert router.route(20, 200).tier == "large"
+    for _ in range(3):
+        large.caller.latency.add(2.5)
+    
+    # Slow large tier: fast, with every 3rd request probing large
+    assert [router.route(20, 200).reason for _ in range(3)] == ["latency", "latency", "probe"]
+    # Long prompts keep the large model unless the deadline rules it out
+    assert router.route(500, 200).tier == "large"
+    token = request_deadline.set(time.monotonic() + 1.0)
+    try:
+        decision = router.route(500, 200)
+    finally:
+        request_deadline.reset(token)
+    assert (decision.tier, decision.model, decision.reason, decision.max_tokens) == ("fast", "small-model", "deadline", 50)
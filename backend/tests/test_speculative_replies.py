@@ -0,0 +1,93 @@
+"""
+Test speculative reply generation for the top emotion candidates
+"""
+import asyncio
+from app.models.ml_models.emotion_vector import EmotionVector
+from app.models.schemas.chat import ChatResponse
+from app.services.speculative_replies import SpeculativeResponder
+
+
+class FakeGenerator:
+    """Streams a few tokens per emotion and remembers which streams were closed early"""
+    
+    def __init__(self):
+        self.started = []
+        self.cancelled = []
+    
+    async def stream_response(self, emotion, user_message=None, conversation_history=None, session_id=None):
+        self.started.append(emotion)
+        try:
+            for word in ("you", "are", emotion):
+                await asyncio.sleep(0.05)
+                yield "token", f"{word} "
+            yield "done", ChatResponse(message=f"you are {emotion}", emotion_detected=emotion)
+        except asyncio.CancelledError:
+            self.cancelled.append(emotion)
+            raise
+
+
+AUDIO = EmotionVector.from_dict({"sad": 0.5, "neutral": 0.4, "happy": 0.1}, "audio")
+
+
+def test_runner_up_stream_is_kept_and_leader_cancelled():
+    """Fusion picking the runner-up reuses its buffered stream; the other stream is cancelled"""
+    generator = FakeGenerator()
+    responder = SpeculativeResponder(generator, enabled=True)
+    
+    async def scenario():
+        speculation = responder.start(AUDIO, "hi")
+        # Face detection + fusion take a while; both candidates stream meanwhile
+        await asyncio.sleep(0.12)
+        response = await speculation.response("neutral")
+        await asyncio.sleep(0)
+        return speculation, response
+    
+    speculation, response = asyncio.run(scenario())
+    assert generator.started == ["sad", "neutral"]
+    assert generator.cancelled == ["sad"]
+    assert response.message == "you are neutral"
+    assert speculation.outcome == "win_second"
+    stats = responder.stats()
+    assert stats["win_rate"] == 1.0 and stats["wasted_tokens"] > 0
+
+
+def test_settled_or_missed_speculation():
+    """A settled audio label streams one candidate; a fused label outside the candidates restarts"""
+    generator = FakeGenerator()
+    responder = SpeculativeResponder(generator, enabled=True)
+    
+    async def scenario():
+        settled = responder.start(AUDIO, settled=True)
+        assert list(settled.candidates) == ["sad"]
+        assert (await settled.response("sad")).message == "you are sad"
+        
+        missed = responder.start(AUDIO)
+        events = [event async for event, _ in missed.resolve("angry")]
+        return missed, events
+    
+    missed, events = asyncio.run(scenario())
+    assert missed.outcome == "miss" and events[-1] == "done"
+    assert generator.started[-1] == "angry"
+    assert responder.stats()["miss"] == 1
+    assert SpeculativeResponder(generator).start(AUDIO) is None
+
+
+def test_stream_closed_before_resolve_cancels_candidates():
+    """A client leaving right after the emotion event does not leave candidate streams running"""
+    from app.api.routes.chat import _stream_chat_events
+    generator = FakeGenerator()
+    responder = SpeculativeResponder(generator, enabled=True)
+    
+    async def scenario():
+        speculation = responder.start(AUDIO, "hi")
+        events = _stream_chat_events({"emotion": "sad"}, "sad", "hi", "session-1", None, speculation=speculation)
+        await events.__anext__()
+        await asyncio.sleep(0.01)
+        await events.aclose()
+        await asyncio.sleep(0)
+        return speculation
+    
+    speculation = asyncio.run(scenario())
+    assert speculation.outcome == "abandoned"
+    assert sorted(generator.cancelled) == ["neutral", "sad"]
+    assert responder.stats()["abandoned"] == 1